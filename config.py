@@ -21,9 +21,77 @@ class Config:
     HEFENG_API_HOST = os.getenv("HEFENG_API_HOST")
     HEFENG_API_KEY = os.getenv("HEFENG_API_KEY")
     
+    # 高德API配置
+    AMAP_API_BASE = os.getenv("AMAP_API_BASE", "https://restapi.amap.com").rstrip("/")  # 可指向本地桩服务进行测试
+    
     HOTEL_API_KEY = os.getenv("HOTEL_API_KEY")
     TRANSPORT_API_KEY = os.getenv("TRANSPORT_API_KEY")
     
+    # HTTP客户端配置（所有外部API共享）
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))  # 连接超时（秒）
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))  # 读取超时（秒）
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))  # 429/5xx最大重试次数
+    HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))  # 指数退避基数（秒）
+    HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))  # 单次退避上限（秒）
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))  # 每个主机的连接池大小
+    
+    # 各服务商每秒请求数限额
+    AMAP_QPS = float(os.getenv("AMAP_QPS", "3"))
+    QWEATHER_QPS = float(os.getenv("QWEATHER_QPS", "5"))
+    
+    # 熔断配置（按服务商统计失败率，熔断期间直接走降级逻辑）
+    BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))  # 统计失败率的时间窗口（秒）
+    BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))  # 窗口内至少有这么多次调用才判断是否熔断
+    BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))  # 失败率达到该值时熔断
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))  # 熔断多久后放行试探请求（秒）
+    
+    # 酒店抓取浏览器池配置
+    BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))  # 常驻的无头Chrome实例数
+    BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "20"))  # 每个实例使用多少次后重建（防止内存增长）
+    BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT", "30"))  # 等待空闲实例的最长时间（秒）
+    BROWSER_MAX_WAITERS = int(os.getenv("BROWSER_MAX_WAITERS", "8"))  # 等待队列上限，超出后立即失败
+    BROWSER_DEBUGGER_ADDRESS = os.getenv("BROWSER_DEBUGGER_ADDRESS", "")  # 设置后改为连接已启动的Chrome（如127.0.0.1:9222），池大小固定为1
+    CTRIP_HOTEL_BASE = os.getenv("CTRIP_HOTEL_BASE", "https://hotels.ctrip.com")  # 携程酒店站点地址，可指向本地样例服务器
+    HOTEL_EXTRACT_MODE = os.getenv("HOTEL_EXTRACT_MODE", "dom")  # dom: 解析页面元素；json: 截获酒店列表接口的JSON响应
+    HOTEL_PREFETCH_ENABLED = os.getenv("HOTEL_PREFETCH_ENABLED", "true").lower() == "true"  # 约束确定后即在后台预搜索酒店
+    HOTEL_PREFETCH_TIMEOUT = float(os.getenv("HOTEL_PREFETCH_TIMEOUT", "60"))  # 等待后台搜索结果的最长时间（秒），超时后取消并改为直接搜索
+    
+    # 本地持久化缓存配置
+    CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache"))
+    GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(90 * 24 * 3600)))  # 地理编码成功结果保留90天
+    GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", str(24 * 3600)))  # 编码失败结果保留1天
+    ROUTE_CACHE_TTL = int(os.getenv("ROUTE_CACHE_TTL", str(7 * 24 * 3600)))  # 路线结果保留7天
+    ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "50000"))  # 超出后按LRU淘汰
+    ROUTE_CACHE_SNAP_DECIMALS = int(os.getenv("ROUTE_CACHE_SNAP_DECIMALS", "3"))  # 坐标对齐精度（3位约100米）
+    ROUTE_CACHE_REUSE_REVERSE = os.getenv("ROUTE_CACHE_REUSE_REVERSE", "false").lower() == "true"  # 是否用反向路线近似
+    HOTEL_CACHE_TTL = int(os.getenv("HOTEL_CACHE_TTL", str(3600)))  # 酒店搜索结果保留1小时（价格房态变化快）
+    HOTEL_CACHE_ADJACENT_DAYS = int(os.getenv("HOTEL_CACHE_ADJACENT_DAYS", "0"))  # 未命中时可用前后N天同样晚数的结果（标记为过期），0为不启用
+    
+    # 预计算路线矩阵配置（python -m tools.route_matrix 生成）
+    ROUTE_MATRIX_ENABLED = os.getenv("ROUTE_MATRIX_ENABLED", "true").lower() == "true"
+    ROUTE_MATRIX_DIR = os.getenv("ROUTE_MATRIX_DIR", os.path.join(CACHE_DIR, "route_matrix"))
+    
+    # 路线预测模型配置（基于历史高德查询结果训练）
+    ROUTE_MODEL_ENABLED = os.getenv("ROUTE_MODEL_ENABLED", "true").lower() == "true"  # 预测足够可靠时跳过API查询
+    ROUTE_MODEL_MIN_SAMPLES = int(os.getenv("ROUTE_MODEL_MIN_SAMPLES", "50"))  # 每种出行方式开始拟合所需的最少样本
+    ROUTE_MODEL_MAX_SPREAD = float(os.getenv("ROUTE_MODEL_MAX_SPREAD", "0.25"))  # 置信区间宽度/中位数的上限
+
+    # 按需精确查询配置（离线估算的上下界不影响决策的路段不再实时查询）
+    ROUTE_PRECISION_ON_DEMAND = os.getenv("ROUTE_PRECISION_ON_DEMAND", "true").lower() == "true"
+    ROUTE_BOUND_LOW = float(os.getenv("ROUTE_BOUND_LOW", "0.85"))  # 离线估算的下界系数
+    ROUTE_BOUND_HIGH = float(os.getenv("ROUTE_BOUND_HIGH", "1.2"))  # 离线估算的上界系数
+
+    # 酒店选址配置（综合评分的位置项按行程中每天往返首末景点的预计交通时间计算）
+    HOTEL_SCORE_LOCATION_WEIGHT = float(os.getenv("HOTEL_SCORE_LOCATION_WEIGHT", "0.5"))  # 位置权重
+    HOTEL_SCORE_PRICE_WEIGHT = float(os.getenv("HOTEL_SCORE_PRICE_WEIGHT", "0.2"))  # 价格权重（越便宜越高）
+    HOTEL_SCORE_RATING_WEIGHT = float(os.getenv("HOTEL_SCORE_RATING_WEIGHT", "0.3"))  # 评分权重
+    HOTEL_SEARCH_MAX_DISTRICTS = int(os.getenv("HOTEL_SEARCH_MAX_DISTRICTS", "3"))  # 按行程每日中心并发搜索的区域数（含王府井）
+    HOTEL_DISTRICT_MAX_KM = float(os.getenv("HOTEL_DISTRICT_MAX_KM", "5"))  # 每日中心离最近的酒店锚点超过该距离时，改用当天的景点名搜索
+
+    # 多酒店交通规划配置（默认只在联合优化时才为其余候选酒店并发生成方案）
+    TRANSPORT_PLAN_ALL_HOTELS = os.getenv("TRANSPORT_PLAN_ALL_HOTELS", "false").lower() == "true"  # 交通规划时即为所有候选酒店生成方案（多消耗高德配额）
+    TRANSPORT_PLAN_WORKERS = int(os.getenv("TRANSPORT_PLAN_WORKERS", "4"))  # 并发规划的线程数
+
     @classmethod
     def validate(cls):
         """验证必要的配置"""
@@ -0,0 +1,230 @@
+"""
+酒店综合评分
+按已聚类的每日行程评估酒店位置：每天 酒店→第一个景点、最后一个景点→酒店 的预计交通时间，
+与价格、评分加权合成综合得分。路段耗时使用与交通规划离线估算相同的 tools.subway_estimator.estimate_route
+（批量计算时用 estimate_route_matrix 一次求出所有酒店×所有天），酒店排序与之后的路段选择依据一致。
+酒店坐标优先使用搜索结果自带的经纬度，缺失时批量地理编码（走持久化缓存，同一酒店只编码一次），
+编码结果只用于本次评分，不写回共享的酒店记录。
+同时按每日行程的中心点确定酒店搜索区域，供多区域并发搜索使用。
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import config
+from tools.hotel_records import HotelRecord
+from tools.subway_estimator import estimate_route, estimate_route_matrix, haversine_km
+
+ANCHOR_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "beijing_hotel_anchors.json")
+
+# 没有坐标的酒店位置得分取中间值，不奖励也不惩罚
+NEUTRAL_LOCATION_SCORE = 0.5
+MAX_RATING = 5.0
+
+
+def hotel_api_address(hotel_name: str) -> str:
+    """酒店名称转为高德地理编码用的地址（补全城市；酒店可能分布在多个区，不再固定为东城区）"""
+    if not hotel_name.startswith("北京"):
+        return f"北京市{hotel_name}"
+    return hotel_name
+
+
+def locate_hotels(hotels: List[HotelRecord], api_key: Optional[str]) -> List[Optional[Tuple[float, float]]]:
+    """
+    酒店坐标 (lng, lat)：优先使用记录自带的经纬度，缺失的批量地理编码
+
+    编码结果只在返回值中，不修改传入的酒店记录（记录可能被多个会话共享）
+
+    返回:
+        list: 与 hotels 一一对应，无法确定坐标的为None
+    """
+    coords = [(hotel.lng, hotel.lat) if hotel.lat is not None and hotel.lng is not None else None for hotel in hotels]
+    missing = [i for i, value in enumerate(coords) if value is None]
+    if not missing or not api_key:
+        return coords
+    from tools.routeinf import geocode_addresses
+    geocoded = geocode_addresses(api_key, [hotel_api_address(hotels[i].name) for i in missing])
+    for i in missing:
+        coords[i] = geocoded.get(hotel_api_address(hotels[i].name))
+    return coords
+
+
+def leg_minutes(origin: Tuple[float, float], destination: Tuple[float, float],
+                origin_station: Optional[str] = None, destination_station: Optional[str] = None) -> float:
+    """
+    单程预计耗时（分钟）：按 estimate_route 的离线估算，步行可达时取步行时间，否则取公共交通与出租车的平均值
+    """
+    estimate = estimate_route(origin, destination, origin_station, destination_station)
+    if estimate["transit_mode"] == "步行":
+        return estimate["transit_minutes"]
+    return (estimate["transit_minutes"] + estimate["taxi_minutes"]) / 2
+
+
+def _leg_minutes_matrix(estimate: Dict[str, np.ndarray]) -> np.ndarray:
+    """leg_minutes 的批量版本，输入为 estimate_route_matrix 的结果"""
+    return np.where(estimate["walk_only"], estimate["transit_minutes"],
+                    (estimate["transit_minutes"] + estimate["taxi_minutes"]) / 2)
+
+
+def _poi_lng_lat(poi: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """景点库中的坐标 (lng, lat)，缺失时返回None"""
+    location = poi.get("location") or {}
+    if location.get("lat") is None or location.get("lng") is None:
+        return None
+    return float(location["lng"]), float(location["lat"])
+
+
+def _day_endpoints(daily_itinerary: List[Dict[str, Any]]) -> List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+    """
+    每天第一个和最后一个有坐标的景点
+
+    返回:
+        list: 每天一项 (首个景点, 末个景点)；当天没有可用景点时为None
+    """
+    endpoints = []
+    for day_plan in daily_itinerary:
+        located = [poi for poi in day_plan.get("pois", []) if _poi_lng_lat(poi)]
+        endpoints.append((located[0], located[-1]) if located else None)
+    return endpoints
+
+
+def daily_travel_matrix(hotel_coords: List[Optional[Tuple[float, float]]],
+                        endpoints: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]) -> np.ndarray:
+    """
+    所有酒店×所有天的往返预计耗时（批量估算，与逐对调用 leg_minutes 结果一致）
+
+    参数:
+        hotel_coords: 酒店坐标 (lng, lat) 列表，没有坐标的为None
+        endpoints: _day_endpoints() 的结果
+
+    返回:
+        np.ndarray: 形状 (酒店数, 天数)，酒店→首个景点 + 末个景点→酒店 的分钟数（无法计算处为nan）
+    """
+    travel = np.full((len(hotel_coords), len(endpoints)), np.nan)
+    hotels = [i for i, coords in enumerate(hotel_coords) if coords is not None]
+    days = [day for day, pois in enumerate(endpoints) if pois is not None]
+    if not hotels or not days:
+        return travel
+    hotel_points = [hotel_coords[i] for i in hotels]
+    firsts = [endpoints[day][0] for day in days]
+    lasts = [endpoints[day][1] for day in days]
+    outbound = _leg_minutes_matrix(estimate_route_matrix(
+        hotel_points, [_poi_lng_lat(poi) for poi in firsts], None, [poi.get("nearby_subway") for poi in firsts]))
+    inbound = _leg_minutes_matrix(estimate_route_matrix(
+        [_poi_lng_lat(poi) for poi in lasts], hotel_points, [poi.get("nearby_subway") for poi in lasts], None))
+    travel[np.ix_(hotels, days)] = outbound + inbound.T
+    return travel
+
+
+def _normalize_lower_better(values: np.ndarray, missing: float) -> np.ndarray:
+    """数值越小得分越高，映射到 [0, 1]；nan 取 missing，所有值相同时均为1"""
+    result = np.full(values.shape, missing)
+    known = ~np.isnan(values)
+    if known.any():
+        low, high = values[known].min(), values[known].max()
+        spread = high - low
+        result[known] = 1.0 if spread <= 0 else (high - values[known]) / spread
+    return result
+
+
+def rank_hotels(hotels: List[Any], daily_itinerary: List[Dict[str, Any]],
+                api_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    按位置、价格、评分的加权综合得分对酒店排序
+
+    参数:
+        hotels (list): 酒店搜索结果（HotelRecord 或字典）
+        daily_itinerary (list): 聚类后的每日行程（daily_candidates）
+        api_key (str, 可选): 高德 API Key，用于为缺少坐标的酒店地理编码；未提供时这些酒店位置得分取中间值
+
+    返回:
+        list[dict]: 按综合得分降序，每项包含 hotel、score（综合得分）、location_score、price_score、
+                    rating_score、daily_minutes（每天往返分钟数列表，无坐标时为None）、avg_daily_minutes
+    """
+    records = [HotelRecord.coerce(hotel) for hotel in hotels]
+    if not records:
+        return []
+    try:
+        hotel_coords = locate_hotels(records, api_key)
+    except Exception as e:
+        print(f"⚠️ 酒店地理编码失败，缺少坐标的酒店不参与位置评分: {str(e)}")
+        hotel_coords = locate_hotels(records, None)
+
+    endpoints = _day_endpoints(daily_itinerary)
+    # 没有可用景点的天不计入；没有坐标的酒店整行为nan
+    travel = daily_travel_matrix(hotel_coords, [pois for pois in endpoints if pois is not None])
+    located = np.array([coords is not None for coords in hotel_coords])
+    avg_minutes = np.full(len(records), np.nan)
+    if travel.shape[1]:
+        avg_minutes[located] = travel[located].mean(axis=1)
+
+    prices = np.array([hotel.price if hotel.price is not None else np.nan for hotel in records], dtype=float)
+    location_score = _normalize_lower_better(avg_minutes, NEUTRAL_LOCATION_SCORE)
+    price_score = _normalize_lower_better(prices, 0.0)
+    rating_score = np.clip([hotel.score / MAX_RATING for hotel in records], 0.0, 1.0)
+    total = (config.HOTEL_SCORE_LOCATION_WEIGHT * location_score
+             + config.HOTEL_SCORE_PRICE_WEIGHT * price_score
+             + config.HOTEL_SCORE_RATING_WEIGHT * rating_score)
+
+    ranking = []
+    for i, hotel in enumerate(hotels):
+        has_minutes = not np.isnan(avg_minutes[i])
+        ranking.append({
+            "hotel": hotel,
+            "score": round(float(total[i]), 4),
+            "location_score": round(float(location_score[i]), 4),
+            "price_score": round(float(price_score[i]), 4),
+            "rating_score": round(float(rating_score[i]), 4),
+            "daily_minutes": [round(float(m), 1) for m in travel[i]] if has_minutes else None,
+            "avg_daily_minutes": round(float(avg_minutes[i]), 1) if has_minutes else None,
+        })
+    ranking.sort(key=lambda item: item["score"], reverse=True)
+    return ranking
+
+
+@lru_cache(maxsize=1)
+def _load_anchors() -> Tuple[Dict[str, Any], ...]:
+    """酒店锚点（常见住宿区域及坐标）"""
+    with open(ANCHOR_FILE, "r", encoding="utf-8") as f:
+        return tuple(json.load(f))
+
+
+def search_destinations(daily_itinerary: List[Dict[str, Any]], default: str = "王府井",
+                        max_destinations: Optional[int] = None) -> List[str]:
+    """
+    按每日行程中心确定酒店搜索区域
+
+    每天的中心取当天景点坐标的平均值：离最近的酒店锚点不超过 HOTEL_DISTRICT_MAX_KM 时搜索该锚点，
+    否则（如通州环球影城、延庆八达岭）用当天离中心最近的景点名搜索。
+    默认区域始终排在第一位（可复用约束阶段发起的后台搜索），其余按覆盖的天数降序。
+
+    返回:
+        list[str]: 去重后的搜索目的地，最多 max_destinations 个（默认 HOTEL_SEARCH_MAX_DISTRICTS）
+    """
+    if max_destinations is None:
+        max_destinations = config.HOTEL_SEARCH_MAX_DISTRICTS
+    anchors = _load_anchors()
+    anchor_coords = np.array([(anchor["lat"], anchor["lng"]) for anchor in anchors], dtype=float)
+
+    day_counts: Dict[str, int] = {}
+    for day_plan in daily_itinerary:
+        located = [(poi, coords) for poi, coords in ((poi, _poi_lng_lat(poi)) for poi in day_plan.get("pois", [])) if coords]
+        if not located:
+            continue
+        coords = np.array([coords for _, coords in located])
+        center = coords.mean(axis=0)
+        anchor_km = haversine_km(center[1], center[0], anchor_coords[:, 0], anchor_coords[:, 1])
+        nearest = int(np.argmin(anchor_km))
+        if anchor_km[nearest] <= config.HOTEL_DISTRICT_MAX_KM:
+            destination = anchors[nearest]["name"]
+        else:
+            poi_km = haversine_km(center[1], center[0], coords[:, 1], coords[:, 0])
+            destination = located[int(np.argmin(poi_km))][0]["name"]
+        day_counts[destination] = day_counts.get(destination, 0) + 1
+
+    others = sorted((name for name in day_counts if name != default), key=lambda name: -day_counts[name])
+    return ([default] + others)[:max(max_destinations, 1)]
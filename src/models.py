@@ -41,6 +41,14 @@ class AgentState(TypedDict):
     daily_time_limit: int  # 每日游玩时间限制（小时）
     room_requirements: int  # 需要的房间数量
     
+    # 天气约束相关
+    weather_constraint_result: str  # 天气约束检查结果
+    weather_analysis: Dict[str, Any]  # 行程期间天气分析结果
+    weather_forecast: Dict[str, Any]  # 已获取的天气预报（含获取时间，用于复用）
+    needs_date_change: bool  # 是否需要用户重新选择日期
+    date_change_reason: str  # 需要重新选择日期的原因
+    suggested_date_windows: List[Dict[str, Any]]  # 预报范围内可行的备选日期窗口
+    
     # 新状态图的数据结构
     daily_candidates: List[Dict[str, Any]]  # 每日候选景点列表
     selected_restaurants: List[Dict[str, Any]]  # 选中的餐厅
@@ -79,13 +87,16 @@ class AgentState(TypedDict):
     
     # 酒店搜索数据
     hotel_search_results: List[Dict[str, Any]]  # 酒店搜索结果
+    hotel_index: Any  # 酒店价格索引（HotelIndex，按价格排序，联合优化时二分查找住宿费用在预算内的酒店）
+    hotel_prefetch_key: str  # 后台预搜索酒店的搜索键（team_constraints发起，hotel_selection取结果）
     hotel_selection_history: List[Dict[str, Any]]  # 酒店选择历史
     hotel_optimization_attempts: int  # 酒店优化尝试次数
-    max_hotel_optimization_attempts: int  # 最大酒店优化次数
-    excluded_hotels: List[str]  # 被排除的酒店名称列表
+    joint_optimization_result: List[Dict[str, Any]]  # 联合优化的 酒店×交通方案 评估矩阵
     
     # 交通规划数据
     transportation_plans: Dict[str, Any]  # 交通规划方案
+    route_leg_table: Dict[str, Any]  # 已查询路段表（起终点 → 路线信息），跨酒店候选复用
+    hotel_transport_plans: Dict[str, Any]  # 各候选酒店的交通方案（酒店名称 → 三种方案），联合优化时直接评估
     
     # 强度计算数据
     intensity_calculation_result: Dict[str, Any]  # 强度计算结果
\ No newline at end of file
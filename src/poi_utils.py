@@ -1,10 +1,10 @@
 import json
 import re
-import math
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from config import config
 from tools.routeinf import get_route_info
+from tools.subway_estimator import estimate_route
 
 def _remove_json_comments(raw_text: str) -> str:
     """移除 // 行内注释，便于加载包含注释的 JSON。"""
@@ -213,14 +213,6 @@ def generate_candidate_attractions(structured_info: Dict[str, Any]) -> Dict[str,
             return 1
         return int(g.get("adults") or 0) + int(g.get("children") or 0) + int(g.get("elderly") or 0)
 
-    def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        R = 6371.0
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2.0) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2.0) ** 2
-        c = 2.0 * math.atan2(math.sqrt(a), math.sqrt(1.0 - a))
-        return R * c
-
     def _fallback_route(origin: Dict[str, Any], dest: Dict[str, Any]) -> Dict[str, Any]:
         lo1 = (origin.get("location") or {}).get("lng")
         la1 = (origin.get("location") or {}).get("lat")
@@ -233,26 +225,30 @@ def generate_candidate_attractions(structured_info: Dict[str, Any]) -> Dict[str,
                 "taxi_time_min": None,
                 "taxi_cost": None,
             }
-        dist_km = _haversine_km(float(la1), float(lo1), float(la2), float(lo2))
-        taxi_speed_kmh = 30.0
-        bus_speed_kmh = 20.0
-        taxi_time_min = max(10.0, (dist_km / taxi_speed_kmh) * 60.0)
-        bus_time_min = max(15.0, (dist_km / bus_speed_kmh) * 60.0)
-        taxi_cost = 13.0 + 2.6 * dist_km
-        bus_cost = 2.0 + 0.5 * dist_km
+        estimate = estimate_route(
+            (float(lo1), float(la1)), (float(lo2), float(la2)),
+            origin.get("nearby_subway"), dest.get("nearby_subway")
+        )
         return {
-            "bus_time_min": round(bus_time_min, 1),
-            "bus_cost": round(bus_cost, 1),
-            "taxi_time_min": round(taxi_time_min, 1),
-            "taxi_cost": round(taxi_cost, 1),
+            "bus_time_min": estimate["transit_minutes"],
+            "bus_cost": float(estimate["transit_cost"]),
+            "taxi_time_min": estimate["taxi_minutes"],
+            "taxi_cost": float(estimate["taxi_cost"]),
         }
 
+    def _route_endpoint(poi: Dict[str, Any]) -> Any:
+        """优先使用景点库坐标 (lng, lat)，没有坐标时使用名称地理编码"""
+        location = poi.get("location") or {}
+        if location.get("lng") is not None and location.get("lat") is not None:
+            return float(location["lng"]), float(location["lat"])
+        return poi.get("name")
+
     def _route_between(origin: Dict[str, Any], dest: Dict[str, Any]) -> Dict[str, Any]:
         api_key = config.TRANSPORT_API_KEY
         if not api_key:
             return _fallback_route(origin, dest)
         try:
-            data = get_route_info(api_key, origin.get("name"), dest.get("name"))
+            data = get_route_info(api_key, _route_endpoint(origin), _route_endpoint(dest), origin.get("name"), dest.get("name"))
             result = {
                 "bus_time_min": data.get("公共交通最短时间"),
                 "bus_cost": _parse_cost_to_number(data.get("公共交通费用")),
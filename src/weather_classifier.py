@@ -5,7 +5,7 @@
 根据和风天气API返回的textDay信息对天气进行分类，并评估出行适宜性
 """
 
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from enum import Enum
 
 class WeatherSuitability(Enum):
@@ -124,13 +124,16 @@ class WeatherClassifier:
         
         return candidate_pois
     
-    def analyze_trip_weather(self, weather_data: List[Dict], trip_dates: List[str]) -> Dict:
+    def analyze_trip_weather(self, weather_data: Union[List[Dict], Dict], trip_dates: List[str],
+                             trip_locations: Optional[Dict[str, str]] = None) -> Dict:
         """
         分析行程期间的天气情况
         
         Args:
-            weather_data: 和风天气API返回的每日天气数据
+            weather_data: 和风天气API返回的每日天气数据，或get_weather_7d_multi返回的多地点合并结构
             trip_dates: 行程日期列表 (格式: YYYY-MM-DD)
+            trip_locations: 多地点行程中每天所在的LocationID {日期: LocationID}，
+                未指定的日期取该日第一个有预报的地点
             
         Returns:
             天气分析结果
@@ -149,7 +152,7 @@ class WeatherClassifier:
         bad_weather_days = 0
         
         # 创建日期到天气的映射
-        weather_by_date = {item["fxDate"]: item for item in weather_data}
+        weather_by_date = self._weather_by_date(weather_data, trip_locations)
         
         for date in trip_dates:
             if date in weather_by_date:
@@ -166,6 +169,8 @@ class WeatherClassifier:
                     "suitability": suitability,
                     "suitability_text": suitability.value
                 }
+                if "location" in day_weather:
+                    day_info["location"] = day_weather["location"]
                 
                 weather_analysis["daily_weather"].append(day_info)
                 
@@ -203,6 +208,27 @@ class WeatherClassifier:
         
         return weather_analysis
     
+    def _weather_by_date(self, weather_data: Union[List[Dict], Dict],
+                         trip_locations: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+        """
+        将单地点列表或多地点合并结构统一为 {日期: 当日天气}
+        
+        多地点结构中的当日天气会附带location字段，记录所用的LocationID
+        """
+        if isinstance(weather_data, list):
+            return {item["fxDate"]: item for item in weather_data}
+        
+        trip_locations = trip_locations or {}
+        weather_by_date = {}
+        for date, by_location in weather_data.get("daily", {}).items():
+            location = trip_locations.get(date)
+            if location not in by_location:
+                if location is not None or not by_location:
+                    continue
+                location = next(iter(by_location))
+            weather_by_date[date] = dict(by_location[location], location=location)
+        return weather_by_date
+    
     def check_extreme_weather_blocking(self, weather_analysis: Dict, total_trip_days: int) -> bool:
         """
         检查是否有极端天气导致不能满足约定的出行天数
@@ -288,6 +314,95 @@ class WeatherClassifier:
         # 只有在户外适宜的天气下才访问
         return weather_suitability == WeatherSuitability.OUTDOOR_SUITABLE
 
+    def suggest_date_windows(self, weather_data: Union[List[Dict], Dict], candidate_pois: List[Dict],
+                             must_visit_pois: List[Dict], trip_days: int, daily_time_budget: float,
+                             max_idle_hours: float = 5, exclude_start_date: Optional[str] = None,
+                             top_k: int = 3) -> List[Dict]:
+        """
+        在已获取的预报范围内评估所有可行的出发日期窗口
+
+        每个预报日期只分类一次，并预先算好当天可访问景点的总时长（适宜性矩阵），
+        之后每个窗口只做切片统计，依次套用极端天气、必去景点冲突、行程饱满度三项检查。
+
+        Args:
+            weather_data: 和风天气每日数据或多地点合并结构
+            candidate_pois: 候选景点列表
+            must_visit_pois: 必去景点对象列表
+            trip_days: 行程天数
+            daily_time_budget: 每日游玩时间预算（小时）
+            max_idle_hours: 每日允许的最大空闲时间，超过视为行程不够饱满
+            exclude_start_date: 需要排除的出发日期（通常是用户原定日期）
+            top_k: 返回的窗口数量
+
+        Returns:
+            按得分降序排列的可行窗口列表
+        """
+        from datetime import datetime, timedelta
+
+        weather_by_date = self._weather_by_date(weather_data)
+        forecast_dates = sorted(weather_by_date)
+        if trip_days <= 0 or len(forecast_dates) < trip_days:
+            return []
+
+        # 适宜性矩阵：每个预报日期的天气等级及当天可访问景点总时长
+        forecast = self.analyze_trip_weather(weather_data, forecast_dates)
+        day_rows = {day["date"]: day for day in forecast["daily_weather"]}
+        available_hours = {}
+        for date, day in day_rows.items():
+            available_hours[date] = sum(
+                poi.get("suggested_duration_hours", 2.0)
+                for poi in candidate_pois
+                if self.is_poi_suitable_for_weather(poi, day)
+            )
+
+        windows = []
+        for start_idx in range(len(forecast_dates) - trip_days + 1):
+            dates = forecast_dates[start_idx:start_idx + trip_days]
+            if dates[0] == exclude_start_date:
+                continue
+            # 窗口内日期必须连续且都有预报
+            first_day = datetime.strptime(dates[0], "%Y-%m-%d")
+            expected = [(first_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(trip_days)]
+            if dates != expected or any(date not in day_rows for date in dates):
+                continue
+
+            daily_weather = [day_rows[date] for date in dates]
+            counts = {suitability: 0 for suitability in WeatherSuitability}
+            for day in daily_weather:
+                counts[day["suitability"]] += 1
+            window_analysis = {
+                "daily_weather": daily_weather,
+                "extreme_weather_days": counts[WeatherSuitability.NOT_RECOMMENDED],
+                "suitable_days": counts[WeatherSuitability.OUTDOOR_SUITABLE],
+                "indoor_days": counts[WeatherSuitability.INDOOR_SUITABLE]
+            }
+
+            if self.check_extreme_weather_blocking(window_analysis, trip_days):
+                continue
+            if self.check_must_visit_weather_conflict(window_analysis, must_visit_pois):
+                continue
+            idle_hours = [daily_time_budget - available_hours[date] for date in dates]
+            if max(idle_hours) > max_idle_hours:
+                continue
+
+            # 户外天数优先，其次室内天数，极端天气扣分
+            score = (window_analysis["suitable_days"] * 2
+                     + window_analysis["indoor_days"]
+                     - window_analysis["extreme_weather_days"] * 3)
+            windows.append({
+                "start_date": dates[0],
+                "end_date": dates[-1],
+                "dates": dates,
+                "suitable_days": window_analysis["suitable_days"],
+                "indoor_days": window_analysis["indoor_days"],
+                "extreme_weather_days": window_analysis["extreme_weather_days"],
+                "weather_summary": [f"{day['date']} {day['text_day']}" for day in daily_weather],
+                "score": score
+            })
+
+        windows.sort(key=lambda w: (-w["score"], w["start_date"]))
+        return windows[:top_k]
+
 def format_weather_analysis(weather_analysis: Dict) -> str:
     """
     格式化天气分析结果为易读文本
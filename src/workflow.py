@@ -1,9 +1,15 @@
 import json
+import os
+import re
 from typing import List, Dict, Any
 from langgraph.graph import StateGraph, END
 from .models import AgentState, AgentExtraction
 from .llm_utils import create_woka_llm, create_parse_prompt, create_parser
 from .poi_utils import generate_candidate_attractions
+from .hotel_scoring import hotel_api_address, rank_hotels, search_destinations
+from config import config
+from tools.circuit_breaker import CircuitOpenError, breaker_metrics
+from tools.hotel_records import HotelIndex, HotelRecord, parse_amount
 
 # 必需的顶级字段及其子字段验证
 REQUIRED_FIELDS = {
@@ -23,6 +29,9 @@ REQUIRED_FIELDS = {
 # 最大对话轮次限制
 MAX_CONVERSATION_STEPS = 10
 
+# 天气预报复用的有效期（秒），用于重新选择日期时避免重复请求
+WEATHER_FORECAST_MAX_AGE_SECONDS = 3 * 60 * 60
+
 # 初始化状态
 def init_state(user_input: str) -> AgentState:
     return {
@@ -79,15 +88,40 @@ def init_state(user_input: str) -> AgentState:
         
         # 酒店优化相关初始化
         "hotel_optimization_attempts": 0,
-        "max_hotel_optimization_attempts": 2,  # 最多优化1次（0=初始，1=第1次优化，2=第2次优化）
-        "excluded_hotels": []
+        "joint_optimization_result": [],
+        "hotel_prefetch_key": "",
+        
+        # 交通规划路段表初始化
+        "route_leg_table": {},
+        "hotel_transport_plans": {}
     }
 
+def _match_date_window_choice(user_input: str, windows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """识别用户对备选日期的序号回复（如"1"、"方案2"、"选第1个"），未匹配返回空字典"""
+    match = re.fullmatch(r"\s*(?:选择|选)?\s*(?:第|方案)?\s*(\d{1,2})\s*(?:个方案|个|号)?\s*[。.!！]?\s*", user_input)
+    if not match:
+        return {}
+    choice = int(match.group(1))
+    if not 1 <= choice <= len(windows):
+        return {}
+    return windows[choice - 1]
+
 # 解析用户输入节点
 def parse_user_input(state: AgentState) -> AgentState:
     # 更新轮次计数器
     state["step_count"] += 1
     
+    # 上一轮给出了备选日期：用户直接回复序号时无需再调用LLM解析
+    suggested_windows = state.get("suggested_date_windows") or []
+    if suggested_windows:
+        state["suggested_date_windows"] = []
+        choice = _match_date_window_choice(state["conversation"][-1]["content"], suggested_windows)
+        if choice:
+            state["structured_info"]["start_date"] = choice["start_date"]
+            state["structured_info"]["end_date"] = choice["end_date"]
+            print(f"✅ 已选择备选日期: {choice['start_date']} 至 {choice['end_date']}")
+            return state
+    
     # 创建解析模板和解析器
     parser = create_parser(AgentExtraction)
     prompt = create_parse_prompt()
@@ -278,12 +312,28 @@ def prepare_constraints(state: AgentState) -> AgentState:
 
 # 生成追问节点
 def generate_question(state: AgentState) -> AgentState:
+    # 流程在酒店选择之前结束（如天气阻断需重新选日期），取消后台预搜索的酒店
+    if state.get("hotel_prefetch_key"):
+        from tools.hotel import cancel_hotel_search
+        cancel_hotel_search(state["hotel_prefetch_key"])
+        state["hotel_prefetch_key"] = ""
+    
     # 检查是否因为天气约束失败需要重新询问日期
     needs_date_change = state.get("needs_date_change", False)
     date_change_reason = state.get("date_change_reason", "")
     
     if needs_date_change:
-        content = f"抱歉，根据天气预报分析，{date_change_reason}。\n\n请重新选择您的出行日期，我将为您重新规划行程。请提供新的开始日期和结束日期（格式：YYYY-MM-DD）。"
+        suggested_windows = state.get("suggested_date_windows") or []
+        if suggested_windows:
+            options = "\n".join(
+                f"{i}. {window['start_date']} 至 {window['end_date']}（{'、'.join(window['weather_summary'])}）"
+                for i, window in enumerate(suggested_windows, 1)
+            )
+            content = (f"抱歉，根据天气预报分析，{date_change_reason}。\n\n"
+                       f"根据已有的天气预报，以下日期可以满足您的行程要求：\n{options}\n\n"
+                       f"请回复序号选择其中一个，或提供新的开始日期和结束日期（格式：YYYY-MM-DD）。")
+        else:
+            content = f"抱歉，根据天气预报分析，{date_change_reason}。\n\n请重新选择您的出行日期，我将为您重新规划行程。请提供新的开始日期和结束日期（格式：YYYY-MM-DD）。"
         state["conversation"].append({
             "role": "assistant",
             "content": content
@@ -362,7 +412,7 @@ def create_agent_workflow():
     workflow.add_node("budget_calculate", budget_calculate)
     workflow.add_node("budget_check", budget_check)
     workflow.add_node("final_output", final_output)
-    workflow.add_node("hotel_optimization", hotel_optimization)
+    workflow.add_node("joint_optimization", joint_optimization)
     
     # 设置入口点
     workflow.set_entry_point("parse_input")
@@ -402,7 +452,7 @@ def create_agent_workflow():
         needs_date_change = state.get("needs_date_change", False)
         
         if needs_date_change or weather_result in ["extreme_weather_blocking", "must_visit_conflict", "insufficient_fullness"]:
-            return END  # 暂时结束，等待用户重新输入日期
+            return "ask_question"  # 给出备选日期并等待用户重新选择
         else:
             return "scenic_spots_clustering"
     
@@ -411,7 +461,7 @@ def create_agent_workflow():
         check_weather_constraint_result,
         {
             "scenic_spots_clustering": "scenic_spots_clustering",
-            END: END
+            "ask_question": "ask_question"
         }
     )
     
@@ -431,6 +481,9 @@ def create_agent_workflow():
         if intensity_satisfied:
             print("✅ 强度约束满足，进入预算计算")
             return "budget_calculate"
+        elif state.get("hotel_optimization_attempts", 0) == 0:
+            print("🔄 当前酒店的交通方案均超出强度约束，进行酒店×交通方案联合优化")
+            return "joint_optimization"
         else:
             print("❌ 强度约束不满足，流程结束")
             return END
@@ -440,6 +493,7 @@ def create_agent_workflow():
         decide_after_intensity_check,
         {
             "budget_calculate": "budget_calculate",
+            "joint_optimization": "joint_optimization",
             END: END
         }
     )
@@ -451,20 +505,19 @@ def create_agent_workflow():
     def decide_after_budget_check(state: AgentState) -> str:
         budget_satisfied = state.get("budget_satisfied", False)
         hotel_optimization_attempts = state.get("hotel_optimization_attempts", 0)
-        max_hotel_optimization_attempts = state.get("max_hotel_optimization_attempts", 1)
         
         print(f"\n🔍 预算检查决策 - budget_satisfied: {budget_satisfied}")
         print(f"🔍 预算检查决策 - hotel_optimization_attempts: {hotel_optimization_attempts}")
-        print(f"🔍 预算检查决策 - max_hotel_optimization_attempts: {max_hotel_optimization_attempts}")
         
         if budget_satisfied:
             print("✅ 预算满足，输出最终结果")
             return "final_output"
-        elif hotel_optimization_attempts < max_hotel_optimization_attempts:
-            print(f"⚠️ 预算不满足，尝试优化酒店（第{hotel_optimization_attempts + 1}次，最多{max_hotel_optimization_attempts - 1}次）")
-            return "hotel_optimization"  # 直接进入酒店优化，而不是hotel_selection
+        elif hotel_optimization_attempts == 0:
+            # 联合优化一次评估所有 酒店×交通方案 组合，只需执行一次
+            print("⚠️ 预算不满足，进行酒店×交通方案联合优化")
+            return "joint_optimization"
         else:
-            print(f"❌ 预算不满足，已尝试优化{hotel_optimization_attempts}次（最多{max_hotel_optimization_attempts}次），输出现有方案")
+            print(f"❌ 预算不满足，联合优化后仍无符合预算的组合，输出现有方案")
             return "final_output"
     
     workflow.add_conditional_edges(
@@ -472,19 +525,27 @@ def create_agent_workflow():
         decide_after_budget_check,
         {
             "final_output": "final_output",
-            "hotel_optimization": "hotel_optimization"
+            "joint_optimization": "joint_optimization"
         }
     )
     
-    # 酒店优化后的流程：hotel_selection -> hotel_optimization -> transportation_planning -> intensity_calculate -> budget_calculate -> budget_check
-    # 注意：酒店优化后需要重新执行交通规划和强度计算，因为酒店位置变了
-    
-    # 酒店优化后的流程边（只在预算超限时使用）
+    # 联合优化已按选中的组合完成强度与费用计算，强度满足时直接回到预算检查
     # 正常流程：hotel_selection -> transportation_planning -> intensity_calculate -> budget_calculate -> budget_check
-    # 优化流程：hotel_optimization -> transportation_planning -> intensity_calculate -> budget_calculate -> budget_check
+    # 优化流程：budget_check / intensity_calculate -> joint_optimization -> budget_check -> final_output
+    def decide_after_joint_optimization(state: AgentState) -> str:
+        if state.get("intensity_satisfied", False):
+            return "budget_check"
+        print("❌ 没有满足强度约束的酒店×交通方案组合，流程结束")
+        return END
     
-    # 酒店优化后的流程边
-    workflow.add_edge("hotel_optimization", "transportation_planning")
+    workflow.add_conditional_edges(
+        "joint_optimization",
+        decide_after_joint_optimization,
+        {
+            "budget_check": "budget_check",
+            END: END
+        }
+    )
     
     # final_output 结束流程
     workflow.add_edge("final_output", END)
@@ -544,8 +605,92 @@ def team_constraints(state: AgentState) -> AgentState:
     state["daily_time_limit"] = daily_time_limit
     state["room_requirements"] = room_requirements
     
+    # 酒店搜索条件此时已全部确定：在后台提前搜索，与天气查询、景点聚类并行
+    if config.HOTEL_PREFETCH_ENABLED:
+        search_params = _hotel_search_params(state)
+        if search_params:
+            from tools.hotel import cancel_hotel_search, start_hotel_search
+            if state.get("hotel_prefetch_key"):
+                cancel_hotel_search(state["hotel_prefetch_key"])
+            state["hotel_prefetch_key"] = start_hotel_search(**search_params)
+            print("🏨 已在后台开始搜索酒店")
+    
     return state
 
+# 初始酒店搜索的数量
+HOTEL_SEARCH_MAX_HOTELS = 5
+
+# 初始酒店搜索的默认区域（行程聚类前即可发起后台搜索）
+HOTEL_SEARCH_DEFAULT_DESTINATION = "王府井"
+
+def _hotel_search_params(state: AgentState, destination: str = HOTEL_SEARCH_DEFAULT_DESTINATION):
+    """初始酒店搜索的参数（目的地、行程日期、房间数、成人/儿童数），缺少日期时返回None"""
+    info = state.get("structured_info", {})
+    start_date = info.get("start_date")
+    end_date = info.get("end_date")
+    if not start_date or not end_date:
+        return None
+    group = info.get("group", {})
+    return {
+        "destination": destination,
+        "checkin": start_date.replace('-', '/'),
+        "checkout": end_date.replace('-', '/'),
+        "rooms": state.get("room_requirements", 1),
+        "adults": group.get("adults", 1),
+        "children": group.get("children", 0),
+        "keyword": None,
+        "max_hotels": HOTEL_SEARCH_MAX_HOTELS
+    }
+
+def _search_hotels_in_districts(state: AgentState, destinations: List[str], prefetch_key: str = "") -> List[HotelRecord]:
+    """
+    在多个区域并发搜索酒店，合并去重后返回
+    
+    各区域的搜索在浏览器池上并行，总耗时接近单次搜索；与后台预搜索条件相同的区域直接等待其结果。
+    同名酒店只保留第一次出现的结果；部分区域失败时使用其余区域的结果，全部失败时抛出第一个异常。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from tools.hotel import await_hotel_search, cancel_hotel_search, ctrip_hotel_scraper, hotel_search_key
+    
+    params_list = [_hotel_search_params(state, destination) for destination in destinations]
+    if prefetch_key and prefetch_key not in {hotel_search_key(**params) for params in params_list}:
+        cancel_hotel_search(prefetch_key)  # 搜索条件已变化
+        prefetch_key = ""
+    
+    def _search(params):
+        if prefetch_key and prefetch_key == hotel_search_key(**params):
+            print(f"📡 等待后台酒店搜索结果（{params['destination']}）...")
+            hotels = await_hotel_search(prefetch_key)
+            if hotels is not None:
+                return hotels
+        print(f"📡 正在搜索{params['destination']}附近酒店...")
+        return ctrip_hotel_scraper(**params)
+    
+    def _safe_search(params):
+        try:
+            return _search(params), None
+        except Exception as e:
+            return None, e
+    
+    with ThreadPoolExecutor(max_workers=len(params_list)) as executor:
+        results = list(executor.map(_safe_search, params_list))
+    
+    merged, seen, errors = [], set(), []
+    for params, (hotels, error) in zip(params_list, results):
+        if error is not None:
+            print(f"⚠️ {params['destination']}附近酒店搜索失败: {str(error)}")
+            errors.append(error)
+            continue
+        for hotel in hotels:
+            if hotel["酒店名称"] not in seen:
+                seen.add(hotel["酒店名称"])
+                merged.append(hotel)
+    if errors and len(errors) == len(params_list):
+        raise errors[0]
+    if len(params_list) > 1:
+        print(f"🏨 {len(params_list)}个区域共找到 {len(merged)} 家酒店（已去重）")
+    return merged
+
 # 3. 天气过滤节点 - 按照新流程设计
 def weather_filter(state: AgentState) -> AgentState:
     """
@@ -558,8 +703,9 @@ def weather_filter(state: AgentState) -> AgentState:
     D. 检查每天的行程是否饱满
     """
     import os
+    import time
     from datetime import datetime, timedelta
-    from tools.weather import get_weather_7d
+    from tools.weather import get_weather_7d_multi
     from .weather_classifier import WeatherClassifier, format_weather_analysis
     
     candidate_pois = state.get("candidate_pois", [])
@@ -602,28 +748,35 @@ def weather_filter(state: AgentState) -> AgentState:
             state["weather_adjusted_pois"] = candidate_pois
             return state
         
-        print(f"🌤️ 正在获取北京天气数据...")
-        
-        response = get_weather_7d(location_code, api_host, api_key)
-        
-        if response.status_code != 200:
-            print(f"❌ 天气API请求失败: {response.status_code}")
-            state["weather_adjusted_pois"] = candidate_pois
-            return state
-        
-        weather_data = response.json()
-        
-        if weather_data.get("code") != "200":
-            print(f"❌ 天气API返回错误: {weather_data.get('code')}")
-            state["weather_adjusted_pois"] = candidate_pois
-            return state
+        # 上一轮（如因天气重新选择日期）已获取且未过期的预报直接复用，避免重复请求
+        cached_forecast = state.get("weather_forecast") or {}
+        cached_data = cached_forecast.get("data") or {}
+        if (cached_forecast.get("location_code") == location_code
+                and time.time() - cached_forecast.get("fetched_at", 0) < WEATHER_FORECAST_MAX_AGE_SECONDS
+                and all(date in cached_data.get("daily", {}) for date in trip_dates)):
+            print(f"♻️ 复用已获取的北京天气数据")
+            weather_data = cached_data
+        else:
+            print(f"🌤️ 正在获取北京天气数据...")
+            
+            weather_data = get_weather_7d_multi([location_code], api_host, api_key)
+            
+            if location_code in weather_data["errors"]:
+                print(f"❌ 天气API请求失败: {weather_data['errors'][location_code]}")
+                state["weather_adjusted_pois"] = candidate_pois
+                return state
+            
+            state["weather_forecast"] = {
+                "location_code": location_code,
+                "fetched_at": time.time(),
+                "data": weather_data
+            }
         
-        daily_weather = weather_data.get("daily", [])
-        print(f"✅ 获取到{len(daily_weather)}天天气数据")
+        print(f"✅ 获取到{len(weather_data['daily'])}天天气数据")
         
         # 3. 分析行程期间天气
         classifier = WeatherClassifier()
-        weather_analysis = classifier.analyze_trip_weather(daily_weather, trip_dates)
+        weather_analysis = classifier.analyze_trip_weather(weather_data, trip_dates)
         
         # 打印天气分析结果
         weather_report = format_weather_analysis(weather_analysis)
@@ -633,6 +786,30 @@ def weather_filter(state: AgentState) -> AgentState:
         
         print("\n🔍 执行新的天气约束流程...")
         
+        # 获取必去景点的POI信息
+        must_visit_poi_objects = []
+        if must_visit_pois:
+            for must_visit_name in must_visit_pois:
+                # 在候选景点中查找必去景点
+                for poi in candidate_pois:
+                    if must_visit_name in poi.get("name", "") or poi.get("name", "") in must_visit_name:
+                        must_visit_poi_objects.append(poi)
+                        break
+        
+        def _suggest_alternative_windows():
+            """在已获取的预报内评估其他出发日期，供追问节点直接给出备选"""
+            windows = classifier.suggest_date_windows(
+                weather_data, candidate_pois, must_visit_poi_objects,
+                trip_days, daily_time_budget, exclude_start_date=start_date
+            )
+            state["suggested_date_windows"] = windows
+            if windows:
+                print(f"💡 在预报范围内找到{len(windows)}个可行的备选日期:")
+                for window in windows:
+                    print(f"    {window['start_date']} 至 {window['end_date']} (户外{window['suitable_days']}天, 室内{window['indoor_days']}天)")
+            else:
+                print("💡 预报范围内没有满足约束的备选日期")
+        
         # A. 检查是否有极端天气导致不能满足约定的出行天数
         print("\n步骤A: 检查极端天气阻断...")
         is_blocked_by_extreme_weather = classifier.check_extreme_weather_blocking(weather_analysis, trip_days)
@@ -645,6 +822,7 @@ def weather_filter(state: AgentState) -> AgentState:
             # 设置需要回到意图输入环节的标记
             state["needs_date_change"] = True
             state["date_change_reason"] = "极端天气导致无法满足约定出行天数"
+            _suggest_alternative_windows()
             return state
         else:
             print("✅ 极端天气检查通过")
@@ -652,16 +830,6 @@ def weather_filter(state: AgentState) -> AgentState:
         # B. 检查必去景点是否受天气影响
         print("\n步骤B: 检查必去景点天气冲突...")
         
-        # 获取必去景点的POI信息
-        must_visit_poi_objects = []
-        if must_visit_pois:
-            for must_visit_name in must_visit_pois:
-                # 在候选景点中查找必去景点
-                for poi in candidate_pois:
-                    if must_visit_name in poi.get("name", "") or poi.get("name", "") in must_visit_name:
-                        must_visit_poi_objects.append(poi)
-                        break
-        
         has_must_visit_conflict = classifier.check_must_visit_weather_conflict(weather_analysis, must_visit_poi_objects)
         
         if has_must_visit_conflict:
@@ -673,6 +841,7 @@ def weather_filter(state: AgentState) -> AgentState:
             # 设置需要回到意图输入环节的标记
             state["needs_date_change"] = True
             state["date_change_reason"] = "必去景点受天气影响无法访问"
+            _suggest_alternative_windows()
             return state
         else:
             print("✅ 必去景点天气检查通过")
@@ -680,9 +849,10 @@ def weather_filter(state: AgentState) -> AgentState:
         # C. 根据天气约束情况，生成每日可去景点列表
         print("\n步骤C: 生成每日可去景点列表...")
         daily_available_pois = []
+        day_weather_by_date = {day["date"]: day for day in weather_analysis["daily_weather"]}
         
         for i, date in enumerate(trip_dates):
-            day_weather = weather_analysis.get(date, {})
+            day_weather = day_weather_by_date.get(date, {})
             
             # 为当天筛选适合的景点
             day_pois = []
@@ -755,6 +925,7 @@ def weather_filter(state: AgentState) -> AgentState:
             # 设置需要回到意图输入环节的标记
             state["needs_date_change"] = True
             state["date_change_reason"] = f"行程不够饱满，以下日期剩余时间过多: {', '.join(insufficient_days)}"
+            _suggest_alternative_windows()
             return state
         else:
             print("✅ 所有日期行程饱满度检查通过")
@@ -829,12 +1000,7 @@ def scenic_spots_clustering(state: AgentState) -> AgentState:
 # 2. 酒店选择节点 - hotel_selection
 def hotel_selection(state: AgentState) -> AgentState:
     """酒店选择"""
-    hotel_optimization_attempts = state.get("hotel_optimization_attempts", 0)
-    
-    if hotel_optimization_attempts > 0:
-        print("🏨 执行酒店优化选择（选择更便宜的酒店）...")
-    else:
-        print("🏨 执行酒店选择...")
+    print("🏨 执行酒店选择...")
     
     # 获取行程信息
     info = state.get("structured_info", {})
@@ -859,8 +1025,11 @@ def hotel_selection(state: AgentState) -> AgentState:
     adults = group.get("adults", 1)
     children = group.get("children", 0)
     
+    # 按每日行程中心确定搜索区域（王府井在首位，其余如通州、延庆等远郊行程的所在地）
+    destinations = search_destinations(daily_candidates, HOTEL_SEARCH_DEFAULT_DESTINATION) if daily_candidates else [HOTEL_SEARCH_DEFAULT_DESTINATION]
+    
     print(f"🏨 酒店搜索参数:")
-    print(f"  目的地: 王府井地铁站")
+    print(f"  目的地: {'、'.join(destinations)}")
     print(f"  入住日期: {checkin_date}")
     print(f"  退房日期: {checkout_date}")
     print(f"  房间数: {room_requirements}")
@@ -872,34 +1041,26 @@ def hotel_selection(state: AgentState) -> AgentState:
     print("🏨 执行初始酒店选择...")
     
     # 可配置的酒店搜索数量
-    max_hotels_config = 5  # 可以从配置文件或参数中读取
+    max_hotels_config = HOTEL_SEARCH_MAX_HOTELS
     
     try:
-        # 调用携程酒店搜索
-        from tools.hotel import ctrip_hotel_scraper
-        
-        print("📡 正在搜索王府井附近酒店...")
-        
-        hotels_data = ctrip_hotel_scraper(
-            destination="王府井",
-            checkin=checkin_date,
-            checkout=checkout_date,
-            rooms=room_requirements,
-            adults=adults,
-            children=children,
-            keyword=None,
-            max_hotels=max_hotels_config
-        )
+        # 调用携程酒店搜索：各区域并发搜索，王府井优先取team_constraints之后发起的后台搜索结果
+        prefetch_key = state.get("hotel_prefetch_key")
+        state["hotel_prefetch_key"] = ""
+        hotels_data = _search_hotels_in_districts(state, destinations, prefetch_key)
         
-        # 按评分降序排列酒店（评分高的在前）
+        # 按评分降序排列酒店（评分高的在前，评分在抓取时已解析为数值）
         if hotels_data:
-            try:
-                # 尝试将评分转换为浮点数进行排序
-                hotels_data.sort(key=lambda x: float(x['评分']), reverse=True)
-                print("✅ 酒店已按评分降序排列")
-            except (ValueError, TypeError):
-                # 如果评分格式有问题，保持原顺序
-                print("⚠️ 评分格式异常，保持原搜索顺序")
+            hotels_data.sort(key=lambda hotel: hotel.score, reverse=True)
+            print("✅ 酒店已按评分降序排列")
+        
+        # 有每日行程时按位置（每天往返首末景点的预计耗时）、价格、评分综合排序
+        hotel_ranking = []
+        if hotels_data and daily_candidates:
+            hotel_ranking = rank_hotels(hotels_data, daily_candidates, os.getenv("GAODE_API_KEY"))
+            hotels_data = [item["hotel"] for item in hotel_ranking]
+            print("✅ 酒店已按位置、价格、评分综合排序")
+        ranking_by_name = {item["hotel"]["酒店名称"]: item for item in hotel_ranking}
         
         # 显示搜索结果统计
         found_count = len(hotels_data)
@@ -915,15 +1076,22 @@ def hotel_selection(state: AgentState) -> AgentState:
             print(f"     评分: {hotel['评分']}")
             print(f"     房型: {hotel['房型']}")
             print(f"     价格: {hotel['价格']}")
+            if hotel.get("过期数据"):
+                print(f"     ⚠️ 价格来自 {hotel['数据日期']} 的缓存，仅供参考")
+            ranked = ranking_by_name.get(hotel["酒店名称"])
+            if ranked:
+                minutes = f"每天往返约{ranked['avg_daily_minutes']:.0f}分钟" if ranked["avg_daily_minutes"] is not None else "位置未知"
+                print(f"     综合得分: {ranked['score']:.2f}（{minutes}）")
             print()
         
         # 保存所有搜索结果供后续优化使用（排序后的列表）
         state["hotel_search_results"] = hotels_data
+        state["hotel_index"] = HotelIndex(hotels_data)  # 按价格排好序，优化酒店时二分查找
         
         # 初始模式：选择评分最高的酒店
         if hotels_data:
-            selected_hotel = hotels_data[0]  # 第一个就是评分最高的
-            selection_reason = "评分最高"
+            selected_hotel = hotels_data[0]  # 第一个就是综合得分（或评分）最高的
+            selection_reason = "位置、价格、评分综合最优" if hotel_ranking else "评分最高"
             selection_time = "initial"
             
             state["selected_hotels"] = [selected_hotel]
@@ -944,6 +1112,7 @@ def hotel_selection(state: AgentState) -> AgentState:
                 "selection_time": selection_time,
                 "available_options": len(hotels_data),
                 "max_hotels_requested": max_hotels_config,
+                "hotel_ranking": hotel_ranking,  # 各酒店的综合得分明细
                 "optimization_attempt": 0  # 初始选择
             })
         else:
@@ -952,12 +1121,15 @@ def hotel_selection(state: AgentState) -> AgentState:
             state["hotel_selection_history"] = []
         
     except Exception as e:
-        print(f"❌ 酒店搜索失败: {str(e)}")
-        print("💡 可能的原因:")
-        print("  1. 网络连接问题")
-        print("  2. Chrome浏览器未在调试模式运行")
-        print("  3. 携程网站结构变化")
-        print("  4. 搜索参数格式问题")
+        if isinstance(e, CircuitOpenError):
+            print(f"⚡ 携程酒店搜索近期多次失败，熔断中，跳过搜索")
+        else:
+            print(f"❌ 酒店搜索失败: {str(e)}")
+            print("💡 可能的原因:")
+            print("  1. 网络连接问题")
+            print("  2. Chrome浏览器未在调试模式运行")
+            print("  3. 携程网站结构变化")
+            print("  4. 搜索参数格式问题")
         
         # 使用备用酒店数据
         fallback_hotel = {
@@ -969,6 +1141,7 @@ def hotel_selection(state: AgentState) -> AgentState:
         
         state["selected_hotels"] = [fallback_hotel]
         state["hotel_search_results"] = [fallback_hotel]
+        state["hotel_index"] = HotelIndex([fallback_hotel])
         state["hotel_selection_history"] = [{
             "selected_hotel": fallback_hotel,
             "selection_reason": "搜索失败，使用备用",
@@ -993,6 +1166,8 @@ def transportation_planning(state: AgentState) -> AgentState:
     1. 计算每日行程的所有路线（酒店→景点、景点→景点、景点→酒店）
     2. 生成三种交通方案：最省时间、最省金钱、最舒适（全出租车）
     3. 输出详细的路线信息和总计数据
+    4. 开启TRANSPORT_PLAN_ALL_HOTELS时为其余候选酒店并发生成交通方案（hotel_transport_plans），
+       否则只在预算或强度不满足、进入联合优化时才补算
     """
     print("🚗 执行交通规划...")
     
@@ -1015,10 +1190,7 @@ def transportation_planning(state: AgentState) -> AgentState:
     hotel_name = hotel_info.get("酒店名称", "王府井地区酒店")
     
     # 为高德API添加完整地址格式（市区信息）
-    if not hotel_name.startswith("北京"):
-        hotel_address = f"北京市东城区{hotel_name}"
-    else:
-        hotel_address = hotel_name
+    hotel_address = hotel_api_address(hotel_name)
     
     print(f"🏨 基准酒店: {hotel_name}")
     print(f"🗺️  API地址: {hotel_address}")
@@ -1053,202 +1225,507 @@ def transportation_planning(state: AgentState) -> AgentState:
     
     api_key = os.getenv("GAODE_API_KEY")  # 修正：使用正确的环境变量名
     if not api_key:
-        print("⚠️ 未配置高德API密钥，使用模拟数据进行演示")
+        print("⚠️ 未配置高德API密钥，使用离线估算数据进行演示")
         print("   请在.env文件中设置 GAODE_API_KEY=你的高德API密钥")
-        return _demo_transportation_planning(state, hotel_address, daily_itinerary)
+        state = _demo_transportation_planning(state, hotel_address, daily_itinerary)
+        state["hotel_transport_plans"] = _plan_candidate_hotels(state, None, state.get("route_leg_table") or {})
+        return state
     else:
         print(f"✅ 已检测到高德API密钥，开始实际路线计算")
         print(f"   API密钥: {api_key[:8]}...{api_key[-4:] if len(api_key) > 12 else '***'}")  # 部分显示保护隐私
     
     print(f"📊 计算 {len(daily_itinerary)} 天的交通路线...")
-    print(f"⏱️  为避免API频率限制，每次请求间隔1秒")
-    
-    # 计算每日交通路线
-    daily_routes = []
-    for day_idx, day_plan in enumerate(daily_itinerary, 1):
-        day_routes = _calculate_daily_routes(api_key, hotel_address, day_plan, day_idx, hotel_name)
-        daily_routes.append(day_routes)
-    
-    # 生成三种优化方案
-    time_optimized = _generate_time_optimized_plan(daily_routes)
-    cost_optimized = _generate_cost_optimized_plan(daily_routes)
-    comfort_optimized = _generate_comfort_optimized_plan(daily_routes)
+    print(f"⏱️  按高德QPS限额({config.AMAP_QPS}次/秒)限速请求，避免触发频率限制")
+    
+    # 景点直接使用景点库坐标；只有没有坐标的酒店/景点需要地理编码，预先批量编码后逐条路线查询直接命中缓存
+    hotel_location = _hotel_coordinates(hotel_info)
+    addresses = [hotel_address] if hotel_location is None else []
+    addresses += [
+        _format_address_for_api(poi["name"])
+        for day_plan in daily_itinerary for poi in day_plan.get("pois", [])
+        if _poi_coordinates(poi) is None
+    ]
+    if addresses:
+        try:
+            from tools.routeinf import geocode_addresses
+            geocoded = geocode_addresses(api_key, addresses)
+            failed = [address for address, coords in geocoded.items() if not coords]
+            print(f"📍 批量地理编码完成: {len(geocoded)}个地址" + (f"，{len(failed)}个无法识别" if failed else ""))
+        except Exception as e:
+            print(f"⚠️ 批量地理编码失败，将在路线计算时逐个编码: {str(e)}")
+    
+    # 计算每日交通路线（所有天的路段去重后并发查询，已查询过的路段直接复用）
+    leg_table = state.get("route_leg_table") or {}
+    plans = _hotel_transport_plans(state, hotel_info, api_key, leg_table)
+    route_stats = plans["route_stats"]
+    if route_stats.get("skipped_calls"):
+        print(f"📐 按需精确查询：实时查询 {route_stats['live_calls']} 条路段，跳过 {route_stats['skipped_calls']} 条（使用离线估算）")
     
     # 输出三种方案
-    _print_transportation_plans(time_optimized, cost_optimized, comfort_optimized)
+    _print_transportation_plans(plans["time_optimized"], plans["cost_optimized"], plans["comfort_optimized"])
     
-    # 保存到状态（包含使用的酒店信息）
-    state["transportation_plans"] = {
-        "time_optimized": time_optimized,
-        "cost_optimized": cost_optimized,
-        "comfort_optimized": comfort_optimized,
-        "daily_routes": daily_routes,
-        "hotel_used": hotel_address,  # 记录使用的酒店名称
-        "hotel_info": hotel_info      # 完整的酒店信息
-    }
+    # 保存到状态（包含使用的酒店信息、路段统计）
+    state["transportation_plans"] = plans
+    
+    # 开启TRANSPORT_PLAN_ALL_HOTELS时其余候选酒店的方案也在此并发生成，联合优化直接使用
+    state["hotel_transport_plans"] = _plan_candidate_hotels(state, api_key, leg_table)
+    state["route_leg_table"] = leg_table
     
     print("✅ 交通规划完成")
     return state
 
-def _calculate_daily_routes(api_key: str, hotel_address: str, day_plan: dict, day_idx: int, hotel_name: str = None) -> dict:
+def _plan_hotels_concurrently(state: AgentState, hotels: list, api_key: str, leg_table: dict) -> dict:
     """
-    计算单日所有路线的交通信息
+    在有界线程池上并发为多家酒店生成交通方案
+    
+    各酒店共用的景点之间的路段在分发前统一查询一次并写入路段表；分发期间路段表只读，
+    每个线程新查询的酒店相关路段写入自己的覆盖层，线程全部结束后再合并回路段表，
+    因此每家酒店的方案只取决于分发前的路段表，与线程执行顺序无关。
+    实际请求速率仍由共享令牌桶按AMAP_QPS限制；某家酒店规划失败时跳过该酒店，不影响其他酒店。
     
-    Args:
-        api_key: 高德API密钥
-        hotel_address: 酒店地址
-        day_plan: 单日行程计划
-        day_idx: 日期索引
-        
     Returns:
-        dict: 包含所有路线交通信息的数据结构
+        dict: {酒店名称: 交通方案（结构同 state["transportation_plans"]）}
     """
-    from tools.routeinf import get_route_info
-    import time
+    if not hotels:
+        return {}
+    from collections import ChainMap
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if api_key:
+        _resolve_shared_legs(state.get("daily_candidates", []), api_key, leg_table)
+    
+    def _plan(hotel):
+        overlay = ChainMap({}, leg_table)  # 读取共享路段表，写入只进入本线程的第一层
+        try:
+            return hotel, _hotel_transport_plans(state, hotel, api_key, overlay), overlay.maps[0], None
+        except Exception as e:
+            return hotel, None, overlay.maps[0], e
+    
+    plan_sets = {}
+    workers = max(1, min(config.TRANSPORT_PLAN_WORKERS, len(hotels)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_plan, hotels))
+    for hotel, plans, new_legs, error in results:
+        leg_table.update(new_legs)
+        if error is not None:
+            print(f"⚠️ 酒店 {hotel.get('酒店名称', '')} 的交通规划失败: {str(error)}")
+            continue
+        plan_sets[hotel.get("酒店名称", "")] = plans
+    return plan_sets
+
+def _resolve_shared_legs(daily_itinerary: list, api_key: str, leg_table: dict) -> int:
+    """
+    实时查询路段表中还没有的景点之间的路段（与酒店无关，各酒店共用），结果写入路段表
     
-    # 如果没有提供hotel_name，从hotel_address中提取
-    if hotel_name is None:
-        hotel_name = hotel_address.replace("北京市东城区", "").replace("北京市", "")
+    Returns:
+        int: 本次查询成功的路段数
+    """
+    from tools.routeinf import get_routes_concurrently
+    pending = {}
+    for day_plan in daily_itinerary:
+        for leg in _plan_daily_legs("", day_plan, "", None)[1:-1]:
+            key = _leg_key(leg)
+            if key not in leg_table:
+                pending.setdefault(key, leg)
+    if not pending:
+        return 0
+    print(f"  🚀 分发前统一查询各酒店共用的 {len(pending)} 条景点间路段...")
+    try:
+        results = get_routes_concurrently(api_key, list(pending.values()))
+    except Exception as e:
+        print(f"  ⚠️ 景点间路段查询失败，各酒店分别处理: {str(e)}")
+        return 0
+    resolved = {key: result for key, result in zip(pending, results) if not isinstance(result, Exception)}
+    leg_table.update(resolved)
+    return len(resolved)
+
+def _plan_candidate_hotels(state: AgentState, api_key: str, leg_table: dict) -> dict:
+    """
+    当前酒店已规划完成后，为其余候选酒店并发生成交通方案（TRANSPORT_PLAN_ALL_HOTELS关闭时只返回当前酒店）
     
-    print(f"\n📅 第{day_idx}天路线计算:")
+    Returns:
+        dict: {酒店名称: 交通方案}，包含当前酒店
+    """
+    current = state.get("transportation_plans", {})
+    current_name = current.get("hotel_info", {}).get("酒店名称", "")
+    plan_sets = {current_name: current}
+    if not config.TRANSPORT_PLAN_ALL_HOTELS:
+        return plan_sets
+    others = [hotel for hotel in state.get("hotel_search_results", []) if hotel.get("酒店名称", "") != current_name]
+    if others:
+        print(f"\n🏨 并发为其余{len(others)}家候选酒店生成交通方案（{min(config.TRANSPORT_PLAN_WORKERS, len(others))}个线程）...")
+        plan_sets.update(_plan_hotels_concurrently(state, others, api_key, leg_table))
+        print(f"✅ 共{len(plan_sets)}家酒店的交通方案已就绪")
+    return plan_sets
+
+def _format_address_for_api(address: str) -> str:
+    """为高德API格式化地址，添加市区信息"""
+    if not address.startswith("北京"):
+        return f"北京市{address}"
+    return address
+
+# 无法实时查询时，没有坐标的酒店离线估算使用的默认位置（王府井，与默认的东城区酒店地址一致）
+DEFAULT_HOTEL_LOCATION = (116.4114, 39.9149)
+
+# 无法估算的路段的上下界：时间、费用均完全未知
+UNKNOWN_LEG_BOUNDS = {method: (0.0, float("inf"), 0.0, float("inf")) for method in ("公共交通", "出租车")}
+
+def _poi_coordinates(poi: dict):
+    """景点库中的坐标，按高德顺序返回 (lng, lat)，缺失时返回None"""
+    location = poi.get("location") or {}
+    if location.get("lng") is None or location.get("lat") is None:
+        return None
+    return float(location["lng"]), float(location["lat"])
+
+def _hotel_coordinates(hotel: dict):
+    """酒店搜索结果中的坐标 (lng, lat)，缺失时返回None"""
+    if hotel.get("lng") is None or hotel.get("lat") is None:
+        return None
+    return float(hotel["lng"]), float(hotel["lat"])
+
+def _poi_route_endpoint(poi: dict):
+    """路线查询端点：优先使用景点库坐标，没有坐标时退回带市区前缀的名称"""
+    return _poi_coordinates(poi) or _format_address_for_api(poi["name"])
+
+def _plan_daily_legs(hotel_address: str, day_plan: dict, hotel_name: str, hotel_endpoint) -> list:
+    """
+    列出单日需要查询的路段：酒店→第一个景点、景点之间、最后一个景点→酒店
     
+    Returns:
+        list: 路段列表，每项包含展示用的 segment/from/to 以及查询用的 origin/destination
+    """
     day_pois = day_plan.get("pois", [])
-    if not day_pois:
-        print(f"  ⚠️ 第{day_idx}天没有安排景点")
-        return {"day": day_idx, "routes": [], "poi_names": []}
-    
     poi_names = [poi["name"] for poi in day_pois]
-    print(f"  🎯 景点安排: {' → '.join(poi_names)}")
+    poi_endpoints = [_poi_route_endpoint(poi) for poi in day_pois]
+    if not poi_names:
+        return []
     
-    # 为景点地址添加北京市前缀（如果需要）
-    def format_address_for_api(address: str) -> str:
-        """为高德API格式化地址，添加市区信息"""
-        if not address.startswith("北京"):
-            return f"北京市{address}"
-        return address
+    legs = [{
+        "segment": f"{hotel_name} → {poi_names[0]}",  # 显示用户友好的名称
+        "from": hotel_address,
+        "to": poi_names[0],
+        "origin": hotel_endpoint,
+        "destination": poi_endpoints[0],
+        "origin_name": hotel_address,
+        "destination_name": poi_names[0],
+        "destination_station": day_pois[0].get("nearby_subway")
+    }]
+    for i in range(len(poi_names) - 1):
+        legs.append({
+            "segment": f"{poi_names[i]} → {poi_names[i + 1]}",
+            "from": poi_names[i],
+            "to": poi_names[i + 1],
+            "origin": poi_endpoints[i],
+            "destination": poi_endpoints[i + 1],
+            "origin_name": poi_names[i],
+            "destination_name": poi_names[i + 1],
+            "origin_station": day_pois[i].get("nearby_subway"),
+            "destination_station": day_pois[i + 1].get("nearby_subway")
+        })
+    legs.append({
+        "segment": f"{poi_names[-1]} → {hotel_name}",  # 显示用户友好的名称
+        "from": poi_names[-1],
+        "to": hotel_address,
+        "origin": poi_endpoints[-1],
+        "destination": hotel_endpoint,
+        "origin_name": poi_names[-1],
+        "destination_name": hotel_address,
+        "origin_station": day_pois[-1].get("nearby_subway")
+    })
+    return legs
+
+def _leg_key(leg: dict) -> str:
+    """路段表的键：起终点（坐标或地址）"""
+    def _endpoint_key(endpoint):
+        if isinstance(endpoint, (tuple, list)):
+            return f"{float(endpoint[0]):.6f},{float(endpoint[1]):.6f}"
+        return str(endpoint)
+    return f"{_endpoint_key(leg['origin'])}>{_endpoint_key(leg['destination'])}"
+
+def _route_decision_context(state: dict, daily_itinerary: list, hotel_info: dict) -> dict:
+    """
+    按需精确查询用的决策阈值，口径与 intensity_calculate / budget_calculate 一致
     
-    routes = []
+    Returns:
+        dict: 每日景点时长、每日时间上限、扣除门票和住宿后留给交通的预算、总人数
+    """
+    info = state.get("structured_info", {})
+    group = info.get("group", {})
+    total_people = group.get("adults", 1) + group.get("children", 0) + group.get("elderly", 0)
+    trip_days = len(daily_itinerary)
+    budget_info = info.get("budget", {})
+    budget_limit = budget_info.get("total") or (budget_info.get("per_day", 1000) * trip_days)
     
-    try:
-        # 1. 酒店到第一个景点
-        formatted_poi = format_address_for_api(poi_names[0])
-        print(f"  🚗 计算路线: {hotel_name} → {poi_names[0]}")
-        print(f"     调用API: get_route_info('{hotel_address}', '{formatted_poi}')")
-        route_info = get_route_info(api_key, hotel_address, formatted_poi)
-        time.sleep(1)  # 延时1秒，避免API请求过频
-        routes.append({
-            "segment": f"{hotel_name} → {poi_names[0]}",  # 显示用户友好的名称
-            "from": hotel_address,
-            "to": poi_names[0],
-            "route_info": route_info
-        })
-        
-        # 2. 景点之间的路线
-        for i in range(len(poi_names) - 1):
-            from_poi = poi_names[i]
-            to_poi = poi_names[i + 1]
-            formatted_from_poi = format_address_for_api(from_poi)
-            formatted_to_poi = format_address_for_api(to_poi)
-            print(f"  🚗 计算路线: {from_poi} → {to_poi}")
-            print(f"     调用API: get_route_info('{formatted_from_poi}', '{formatted_to_poi}')")
-            route_info = get_route_info(api_key, formatted_from_poi, formatted_to_poi)
-            time.sleep(1)  # 延时1秒，避免API请求过频
-            routes.append({
-                "segment": f"{from_poi} → {to_poi}",
-                "from": from_poi,
-                "to": to_poi,
-                "route_info": route_info
-            })
-        
-        # 3. 最后一个景点到酒店
-        formatted_last_poi = format_address_for_api(poi_names[-1])
-        print(f"  🚗 计算路线: {poi_names[-1]} → {hotel_name}")
-        print(f"     调用API: get_route_info('{formatted_last_poi}', '{hotel_address}')")
-        route_info = get_route_info(api_key, formatted_last_poi, hotel_address)
-        time.sleep(1)  # 延时1秒，避免API请求过频
-        routes.append({
-            "segment": f"{poi_names[-1]} → {hotel_name}",  # 显示用户友好的名称
-            "from": poi_names[-1],
-            "to": hotel_address,
-            "route_info": route_info
-        })
-        
-        print(f"  ✅ 第{day_idx}天共计算 {len(routes)} 条路线")
-        
-    except Exception as e:
-        print(f"  ❌ 第{day_idx}天路线计算失败: {str(e)}")
-        print(f"  💡 可能原因:")
-        print(f"     - API请求频率过高，建议增加延时")
-        print(f"     - 地址名称无法识别或编码失败")
-        print(f"     - 网络连接问题或API服务暂不可用")
-        print(f"     - API密钥配额不足或权限问题")
-        print(f"  🔄 使用模拟数据继续计算")
-        routes = _generate_mock_routes(hotel_address, poi_names, day_idx)
+    ticket_cost = sum(
+        _get_poi_ticket_price(poi) * total_people
+        for day_plan in daily_itinerary for poi in day_plan.get("pois", [])
+    )
+    hotel_price = _hotel_price(hotel_info, default=500)
+    hotel_cost = hotel_price * state.get("room_requirements", 1) * trip_days
     
     return {
-        "day": day_idx,
-        "routes": routes,
-        "poi_names": poi_names,
-        "date": day_plan.get("date", f"第{day_idx}天")
+        "poi_hours": [
+            sum(poi.get("suggested_duration_hours", 2.0) for poi in day_plan.get("pois", []))
+            for day_plan in daily_itinerary
+        ],
+        "daily_time_limit": state.get("daily_time_limit", 12),
+        "transport_budget": budget_limit - ticket_cost - hotel_cost,
+        "people": total_people
     }
 
-def _generate_mock_routes(hotel_address: str, poi_names: list, day_idx: int) -> list:
-    """生成模拟路线数据（用于API调用失败时）"""
-    import random
+def _route_bounds(route_info: dict, low: float = 1.0, high: float = 1.0) -> dict:
+    """
+    路段两种方式的 (分钟下界, 分钟上界, 费用下界, 费用上界)，费用按人均
     
-    routes = []
+    已查询的路段传入 low=high=1 即为精确值；离线估算的路段按系数放宽
+    """
+    bounds = {}
+    for method in ("公共交通", "出租车"):
+        minutes = route_info.get(f"{method}最短时间")
+        cost_str = route_info.get(f"{method}费用")
+        minutes = float("inf") if minutes is None else float(minutes)
+        cost = _cost_number(cost_str)
+        bounds[method] = (minutes * low, minutes * high, cost * low, cost * high)
+    return bounds
+
+def _plan_leg_bounds(bounds: dict, strategy: str, people: int) -> tuple:
+    """
+    单条路段在某一交通方案下的 (分钟下界, 分钟上界, 费用下界, 费用上界)，公共交通费用乘以人数
     
-    # 提取酒店名称（去除北京市东城区前缀）
-    hotel_name = hotel_address.replace("北京市东城区", "").replace("北京市", "")
+    方案选用的方式在上下界内无法确定时，取两种方式的并集
+    """
+    transit, taxi = bounds["公共交通"], bounds["出租车"]
+    if strategy == "comfort_optimized":
+        candidates = [taxi]
+    else:
+        i = 0 if strategy == "time_optimized" else 2
+        if transit[i + 1] <= taxi[i]:
+            candidates = [transit]
+        elif taxi[i + 1] < transit[i]:
+            candidates = [taxi]
+        else:
+            candidates = [transit, taxi]
     
-    # 酒店到第一个景点
-    routes.append({
-        "segment": f"{hotel_name} → {poi_names[0]}",  # 显示用户友好的名称
-        "from": hotel_address,
-        "to": poi_names[0],
-        "route_info": {
-            "出发地": hotel_address,
-            "目的地": poi_names[0],
-            "公共交通最短时间": round(random.uniform(20, 45), 1),
-            "公共交通费用": f"{random.randint(3, 8)}元",
-            "出租车最短时间": round(random.uniform(15, 35), 1),
-            "出租车费用": f"{random.randint(25, 60)}元"
-        }
-    })
+    def _scaled(b):
+        return (b[0], b[1], b[2] * people, b[3] * people) if b is transit else b
+    candidates = [_scaled(b) for b in candidates]
+    if strategy == "time_optimized":
+        minutes = (min(b[0] for b in candidates), min(b[1] for b in candidates))
+    else:
+        minutes = (min(b[0] for b in candidates), max(b[1] for b in candidates))
+    # 最省金钱方案按人均费用比较，多人时按总价未必选到较低的一方，费用统一取并集
+    cost = (min(b[2] for b in candidates), max(b[3] for b in candidates))
+    return minutes + cost
+
+def _select_live_legs(pending: dict, daily_legs: list, leg_table: dict, context: dict) -> tuple:
+    """
+    按需精确查询：先用离线估算给每条待查询路段算出时间/费用的上下界，
+    只有上下界跨越某个决策阈值的路段才需要实时查询，其余路段直接使用估算结果
     
-    # 景点之间的路线
-    for i in range(len(poi_names) - 1):
-        routes.append({
-            "segment": f"{poi_names[i]} → {poi_names[i+1]}",
-            "from": poi_names[i],
-            "to": poi_names[i+1],
-            "route_info": {
-                "出发地": poi_names[i],
-                "目的地": poi_names[i+1],
-                "公共交通最短时间": round(random.uniform(15, 40), 1),
-                "公共交通费用": f"{random.randint(2, 6)}元",
-                "出租车最短时间": round(random.uniform(10, 30), 1),
-                "出租车费用": f"{random.randint(20, 50)}元"
-            }
+    决策阈值：
+    1. 公共交通/出租车的选择（两种方式的时间或费用区间重叠）
+    2. 每日时间上限（任一方案当日景点时长+交通时长的区间跨越上限时，当日待查询路段全部实时查询）
+    3. 预算余量（任一方案交通总费用的区间跨越门票和住宿之外的剩余预算时，全部待查询路段实时查询）
+    
+    起终点坐标无法确定的路段不做估算（不会按默认位置猜测），直接实时查询。
+    
+    Returns:
+        tuple: (需要实时查询的路段键集合, {路段键: 离线估算的路线信息})
+    """
+    low, high = config.ROUTE_BOUND_LOW, config.ROUTE_BOUND_HIGH
+    endpoints = {key: _leg_coordinates(leg) for key, leg in pending.items()}
+    # 起终点坐标无法确定的路段（酒店/景点既无坐标也未缓存地理编码）无法估算，必须实时查询，
+    # 其上下界视为完全未知，所在天的时间约束和预算结论也随之无法确定
+    live = {key for key, coords in endpoints.items() if coords is None}
+    estimates = {key: _estimate_leg(pending[key], endpoints[key]) for key in pending if key not in live}
+    bounds = {key: _route_bounds(info, low, high) for key, info in estimates.items()}
+    bounds.update({key: UNKNOWN_LEG_BOUNDS for key in live})
+    
+    def _bounds(key):
+        return bounds[key] if key in bounds else _route_bounds(leg_table[key])
+    
+    for key, b in bounds.items():
+        transit, taxi = b["公共交通"], b["出租车"]
+        time_overlap = transit[0] <= taxi[1] and taxi[0] <= transit[1]
+        cost_overlap = transit[2] <= taxi[3] and taxi[2] <= transit[3]
+        if time_overlap or cost_overlap:
+            live.add(key)
+    
+    strategies = ("time_optimized", "cost_optimized", "comfort_optimized")
+    people = context["people"]
+    limit = context["daily_time_limit"]
+    cost_totals = {strategy: [0.0, 0.0] for strategy in strategies}
+    for legs, poi_hours in zip(daily_legs, context["poi_hours"]):
+        keys = [_leg_key(leg) for leg in legs]
+        for strategy in strategies:
+            plan_bounds = [_plan_leg_bounds(_bounds(key), strategy, people) for key in keys]
+            low_hours = poi_hours + sum(b[0] for b in plan_bounds) / 60
+            high_hours = poi_hours + sum(b[1] for b in plan_bounds) / 60
+            if low_hours <= limit < high_hours:
+                live.update(key for key in keys if key in pending)
+            cost_totals[strategy][0] += sum(b[2] for b in plan_bounds)
+            cost_totals[strategy][1] += sum(b[3] for b in plan_bounds)
+    
+    slack = context["transport_budget"]
+    if any(low_cost <= slack < high_cost for low_cost, high_cost in cost_totals.values()):
+        live.update(pending)
+    
+    return live, {key: info for key, info in estimates.items() if key not in live}
+
+def _calculate_daily_routes(api_key: str, hotel_address: str, daily_itinerary: list, hotel_name: str = None, hotel_location=None, leg_table: dict = None, decision_context: dict = None, route_stats: dict = None) -> list:
+    """
+    计算所有天的路线交通信息
+    
+    先汇总所有天需要的路段并去重，只查询路段表中还没有的路段，再从路段表组装每天的路线。
+    更换酒店重新规划时，景点之间的路段直接复用路段表，只需查询与新酒店相关的路段。
+    待查询路段一次性并发发出（同一路段的公共交通/驾车请求也并发），
+    实际请求速率由共享令牌桶按AMAP_QPS限制，总耗时约为 路段数/QPS。
+    某一天有路段查询失败时，该天整体改用离线估算数据。
+    提供decision_context时按需精确查询：离线估算的上下界不会改变方式选择、每日时间约束
+    和预算结论的路段直接使用估算结果，不发出实时查询（估算结果不写入路段表）。
+    
+    Args:
+        api_key: 高德API密钥
+        hotel_address: 酒店地址
+        daily_itinerary: 每日行程计划列表
+        hotel_name: 酒店显示名称
+        hotel_location: 酒店坐标 (lng, lat)，为None时按hotel_address地理编码
+        leg_table: 已查询路段表 {路段键: 路线信息}，新查询的路段会写入其中
+        decision_context: 决策阈值（见 _route_decision_context），为None时所有待查询路段都实时查询
+        route_stats: 传入时写入 {"total_legs", "live_calls", "skipped_calls"}
+        
+    Returns:
+        list: 每天一项，包含所有路线交通信息的数据结构
+    """
+    from tools.routeinf import get_routes_concurrently
+    
+    if leg_table is None:
+        leg_table = {}
+    
+    # 如果没有提供hotel_name，从hotel_address中提取
+    if hotel_name is None:
+        hotel_name = hotel_address.replace("北京市东城区", "").replace("北京市", "")
+    hotel_endpoint = hotel_location or hotel_address
+    
+    daily_legs = [_plan_daily_legs(hotel_address, day_plan, hotel_name, hotel_endpoint) for day_plan in daily_itinerary]
+    
+    # 汇总去重，只查询路段表中没有的路段
+    pending = {}
+    total_legs = 0
+    for legs in daily_legs:
+        for leg in legs:
+            total_legs += 1
+            key = _leg_key(leg)
+            if key not in leg_table and key not in pending:
+                pending[key] = leg
+    estimated = {}
+    if decision_context is not None and pending:
+        live, estimated = _select_live_legs(pending, daily_legs, leg_table, decision_context)
+        print(f"  📐 离线估算上下界：{len(live)} 条路段可能影响决策需实时查询，跳过 {len(estimated)} 条")
+        pending = {key: leg for key, leg in pending.items() if key in live}
+    if route_stats is not None:
+        route_stats.update({"total_legs": total_legs, "live_calls": len(pending), "skipped_calls": len(estimated)})
+    print(f"  🚀 共 {total_legs} 条路线，去重及复用后需查询 {len(pending)} 条，并发查询中...")
+    failed = {}
+    if pending:
+        try:
+            results = get_routes_concurrently(api_key, list(pending.values()))
+        except Exception as e:
+            results = [e] * len(pending)
+        for key, result in zip(pending, results):
+            if isinstance(result, Exception):
+                failed[key] = result
+            else:
+                leg_table[key] = result
+    
+    daily_routes = []
+    for day_idx, (day_plan, legs) in enumerate(zip(daily_itinerary, daily_legs), 1):
+        results = [failed.get(_leg_key(leg)) or estimated.get(_leg_key(leg)) or leg_table[_leg_key(leg)] for leg in legs]
+        poi_names = [poi["name"] for poi in day_plan.get("pois", [])]
+        
+        print(f"\n📅 第{day_idx}天路线计算:")
+        if not poi_names:
+            print(f"  ⚠️ 第{day_idx}天没有安排景点")
+            daily_routes.append({"day": day_idx, "routes": [], "poi_names": [], "date": day_plan.get("date", f"第{day_idx}天")})
+            continue
+        print(f"  🎯 景点安排: {' → '.join(poi_names)}")
+        
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and isinstance(errors[0], CircuitOpenError):
+            print(f"  ⚡ 高德服务熔断中，第{day_idx}天直接使用离线估算数据")
+            routes = _generate_mock_routes(legs)
+        elif errors:
+            print(f"  ❌ 第{day_idx}天路线计算失败: {str(errors[0])}")
+            print(f"  💡 可能原因:")
+            print(f"     - API请求频率过高，建议调低AMAP_QPS")
+            print(f"     - 地址名称无法识别或编码失败")
+            print(f"     - 网络连接问题或API服务暂不可用")
+            print(f"     - API密钥配额不足或权限问题")
+            print(f"  🔄 使用离线估算数据继续计算")
+            routes = _generate_mock_routes(legs)
+        else:
+            routes = []
+            for leg, route_info in zip(legs, results):
+                print(f"  🚗 {leg['segment']}")
+                routes.append({
+                    "segment": leg["segment"],
+                    "from": leg["from"],
+                    "to": leg["to"],
+                    "route_info": {**route_info, "出发地": leg["origin_name"], "目的地": leg["destination_name"]}
+                })
+            print(f"  ✅ 第{day_idx}天共计算 {len(routes)} 条路线")
+        
+        daily_routes.append({
+            "day": day_idx,
+            "routes": routes,
+            "poi_names": poi_names,
+            "date": day_plan.get("date", f"第{day_idx}天")
         })
     
-    # 最后一个景点到酒店
-    routes.append({
-        "segment": f"{poi_names[-1]} → {hotel_name}",  # 显示用户友好的名称
-        "from": poi_names[-1],
-        "to": hotel_address,
-        "route_info": {
-            "出发地": poi_names[-1],
-            "目的地": hotel_address,
-            "公共交通最短时间": round(random.uniform(20, 45), 1),
-            "公共交通费用": f"{random.randint(3, 8)}元",
-            "出租车最短时间": round(random.uniform(15, 35), 1),
-            "出租车费用": f"{random.randint(25, 60)}元"
-        }
-    })
+    return daily_routes
+
+def _generate_mock_routes(legs: list) -> list:
+    """
+    离线估算路线数据（用于无API或API调用失败时）
     
+    基于内置北京地铁线网 + 步行/公交/出租车计价规则，结果确定且无需网络请求
+    """
+    routes = []
+    for leg in legs:
+        routes.append({
+            "segment": leg["segment"],
+            "from": leg["from"],
+            "to": leg["to"],
+            "route_info": _estimate_leg(leg)
+        })
     return routes
 
+def _estimate_leg(leg: dict, endpoints: tuple = None) -> dict:
+    """
+    单条路段的离线估算路线信息
+    
+    未传入起终点坐标时（仅用于无法实时查询的兜底），无法确定坐标的地址按默认酒店区域（王府井）估算
+    """
+    from tools.subway_estimator import estimate_route_info
+    if endpoints is None:
+        endpoints = tuple(_endpoint_coordinates(leg[end]) or DEFAULT_HOTEL_LOCATION for end in ("origin", "destination"))
+    return estimate_route_info(
+        endpoints[0], endpoints[1],
+        leg["origin_name"], leg["destination_name"],
+        leg.get("origin_station"), leg.get("destination_station")
+    )
+
+def _endpoint_coordinates(endpoint):
+    """路段端点的坐标：坐标形式直接使用，地址只查地理编码缓存（不发请求），无法确定时返回None"""
+    from tools.routeinf import cached_coordinates
+    return cached_coordinates(endpoint)
+
+def _leg_coordinates(leg: dict):
+    """路段起终点坐标 (起点, 终点)，任一端无法确定时返回None"""
+    origin = _endpoint_coordinates(leg["origin"])
+    destination = _endpoint_coordinates(leg["destination"])
+    return (origin, destination) if origin and destination else None
+
 def _generate_time_optimized_plan(daily_routes: list) -> dict:
     """生成最省时间的交通方案"""
     plan = {
@@ -1285,7 +1762,7 @@ def _generate_time_optimized_plan(daily_routes: list) -> dict:
                 selected_cost = route_info.get("出租车费用", "0元")
             
             # 提取费用数字
-            cost_num = float(''.join(filter(str.isdigit, selected_cost.replace('元', ''))))
+            cost_num = _cost_number(selected_cost)
             
             route_plan = {
                 "segment": route["segment"],
@@ -1331,8 +1808,8 @@ def _generate_cost_optimized_plan(daily_routes: list) -> dict:
             bus_cost_str = route_info.get("公共交通费用", "999元")
             taxi_cost_str = route_info.get("出租车费用", "999元")
             
-            bus_cost = float(''.join(filter(str.isdigit, bus_cost_str.replace('元', ''))))
-            taxi_cost = float(''.join(filter(str.isdigit, taxi_cost_str.replace('元', ''))))
+            bus_cost = _cost_number(bus_cost_str)
+            taxi_cost = _cost_number(taxi_cost_str)
             
             # 选择费用最低的方式
             if bus_cost <= taxi_cost:
@@ -1392,7 +1869,7 @@ def _generate_comfort_optimized_plan(daily_routes: list) -> dict:
             selected_cost = route_info.get("出租车费用", "0元")
             
             # 提取费用数字
-            cost_num = float(''.join(filter(str.isdigit, selected_cost.replace('元', ''))))
+            cost_num = _cost_number(selected_cost)
             
             route_plan = {
                 "segment": route["segment"],
@@ -1457,23 +1934,30 @@ def _print_transportation_plans(time_plan: dict, cost_plan: dict, comfort_plan:
     
     print("="*80)
 
-def _demo_transportation_planning(state: dict, hotel_address: str, daily_itinerary: list) -> dict:
-    """演示模式的交通规划（无API时使用）"""
-    print("🎭 演示模式：生成模拟交通数据")
-    
-    # 生成模拟的每日路线
+def _estimated_daily_routes(hotel_address: str, daily_itinerary: list, hotel_name: str, hotel_endpoint) -> list:
+    """离线估算每日路线（没有景点的天跳过），结构同 _calculate_daily_routes"""
     daily_routes = []
     for day_idx, day_plan in enumerate(daily_itinerary, 1):
         day_pois = day_plan.get("pois", [])
         if day_pois:
-            poi_names = [poi["name"] for poi in day_pois]
-            routes = _generate_mock_routes(hotel_address, poi_names, day_idx)
+            legs = _plan_daily_legs(hotel_address, day_plan, hotel_name, hotel_endpoint)
             daily_routes.append({
                 "day": day_idx,
-                "routes": routes,
-                "poi_names": poi_names,
+                "routes": _generate_mock_routes(legs),
+                "poi_names": [poi["name"] for poi in day_pois],
                 "date": day_plan.get("date", f"第{day_idx}天")
             })
+    return daily_routes
+
+def _demo_transportation_planning(state: dict, hotel_address: str, daily_itinerary: list) -> dict:
+    """演示模式的交通规划（无API时使用）"""
+    print("🎭 演示模式：基于地铁线网离线估算交通数据")
+    
+    # 离线估算每日路线
+    hotel_name = hotel_address.replace("北京市东城区", "").replace("北京市", "")
+    hotel_info = state.get("selected_hotels", [{}])[0]
+    hotel_endpoint = _hotel_coordinates(hotel_info) or hotel_address
+    daily_routes = _estimated_daily_routes(hotel_address, daily_itinerary, hotel_name, hotel_endpoint)
     
     # 生成三种方案
     time_optimized = _generate_time_optimized_plan(daily_routes)
@@ -1721,13 +2205,9 @@ def budget_calculate(state: AgentState) -> AgentState:
     print(f"\n🏨 计算酒店费用...")
     hotel_info = selected_hotels[0]
     hotel_name = hotel_info.get("酒店名称", "")
-    hotel_price_str = hotel_info.get("价格", "500元/晚")
     
-    # 提取酒店价格数字
-    try:
-        hotel_price_per_night = float(''.join(filter(str.isdigit, hotel_price_str)))
-    except:
-        hotel_price_per_night = 500  # 默认价格
+    # 酒店价格（抓取时已解析为数值）
+    hotel_price_per_night = _hotel_price(hotel_info, default=500)
     
     total_hotel_cost = hotel_price_per_night * room_requirements * trip_days
     
@@ -1857,10 +2337,9 @@ def _get_poi_ticket_price(poi: dict) -> float:
             return float(price)
         elif isinstance(price, str):
             # 提取字符串中的数字
-            try:
-                return float(''.join(filter(str.isdigit, price)))
-            except:
-                pass
+            amount = parse_amount(price)
+            if amount is not None:
+                return amount
     
     # 如果没有门票价格信息，使用默认价格
     poi_name = poi.get("name", "")
@@ -1900,7 +2379,7 @@ def _calculate_transport_cost_with_people(transport_plan: dict, total_people: in
             cost_str = route.get("cost", "0元")
             
             # 提取费用数字
-            cost_per_person = float(''.join(filter(str.isdigit, cost_str.replace('元', ''))))
+            cost_per_person = _cost_number(cost_str)
             
             # 如果是公共交通，需要乘以人数；如果是出租车，不需要
             if method == "公共交通":
@@ -1918,232 +2397,201 @@ def _calculate_transport_cost_with_people(transport_plan: dict, total_people: in
     print(f"🚗 【{strategy}】交通总费用: {total_transport_cost}元")
     return total_transport_cost
 
-def _select_cheaper_hotel(state: AgentState, hotels_data: list) -> dict:
+def _hotel_price(hotel, default: float = 999.0) -> float:
+    """酒店每晚价格：HotelRecord直接取抓取时解析的数值，字典（如备用酒店）解析一次"""
+    price = HotelRecord.coerce(hotel).price
+    return price if price is not None else default
+
+def _cost_number(cost_str) -> float:
+    """费用字符串转数值，如 "35.5元" → 35.5，缺失时为0"""
+    amount = parse_amount(cost_str)
+    return amount if amount is not None else 0.0
+
+def _plan_transport_cost(transport_plan: dict, total_people: int) -> float:
+    """交通方案按人数计算的总费用（公共交通按人计费，出租车按车计费），口径同 _calculate_transport_cost_with_people"""
+    total = 0.0
+    for day_plan in transport_plan.get("daily_plans", []):
+        for route in day_plan.get("routes", []):
+            cost = _cost_number(route.get("cost", "0元"))
+            total += cost * total_people if route.get("method") == "公共交通" else cost
+    return total
+
+def _hotel_transport_plans(state: AgentState, hotel, api_key: str, leg_table: dict) -> dict:
     """
-    从候选酒店中选择更便宜的酒店
+    以指定酒店为起终点生成三种交通方案
     
-    Args:
-        state: 当前状态，包含之前选择的酒店信息
-        hotels_data: 酒店搜索结果列表
+    有API密钥时经路段表查询（景点之间的路段各酒店共用，只有酒店相关路段需要新查询），否则使用离线估算
     
     Returns:
-        dict: 选择的更便宜的酒店
+        dict: 与 state["transportation_plans"] 结构相同
     """
-    # 获取当前选择的酒店价格
-    current_hotels = state.get("selected_hotels", [])
-    if not current_hotels:
-        # 如果没有当前酒店，选择最便宜的
-        return min(hotels_data, key=lambda x: _extract_hotel_price(x.get("价格", "999元")))
-    
-    current_hotel = current_hotels[0]
-    current_hotel_name = current_hotel.get("酒店名称", "")
-    current_price = _extract_hotel_price(current_hotel.get("价格", "999元"))
-    
-    # 获取排除列表
-    excluded_hotels = state.get("excluded_hotels", [])
-    
-    print(f"🔍 当前酒店: {current_hotel_name}")
-    print(f"🔍 当前酒店价格: {current_price}元/晚")
-    print(f"🔍 排除列表: {excluded_hotels}")
-    print(f"🔍 寻找更便宜的酒店...")
-    
-    # 调试：显示所有候选酒店
-    print(f"🔍 所有候选酒店:")
-    for i, hotel in enumerate(hotels_data):
-        hotel_name = hotel.get("酒店名称", "")
-        hotel_price = _extract_hotel_price(hotel.get("价格", "999元"))
-        excluded_status = "🚫已排除" if hotel_name in excluded_hotels else "✅可用"
-        print(f"  {i+1}. {hotel_name} - {hotel_price}元/晚 {excluded_status}")
-    
-    # 筛选出比当前酒店更便宜且不在排除列表中的酒店
-    cheaper_hotels = []
-    for hotel in hotels_data:
-        hotel_name = hotel.get("酒店名称", "")
-        hotel_price = _extract_hotel_price(hotel.get("价格", "999元"))
-        
-        # 必须不在排除列表中且价格更便宜
-        if hotel_name not in excluded_hotels and hotel_price < current_price:
-            cheaper_hotels.append((hotel, hotel_price))
-            print(f"  候选: {hotel_name} - {hotel_price}元/晚 (节省{current_price - hotel_price}元)")
-        elif hotel_name in excluded_hotels:
-            print(f"  跳过(已排除): {hotel_name} - {hotel_price}元/晚")
-    
-    if cheaper_hotels:
-        # 在更便宜的酒店中选择评分最高的
-        cheaper_hotels.sort(key=lambda x: (x[1], -float(x[0].get("评分", "0"))))  # 按价格升序，评分降序
-        selected_hotel = cheaper_hotels[0][0]
-        selected_price = cheaper_hotels[0][1]
-        
-        print(f"✅ 找到更便宜的酒店: {selected_hotel['酒店名称']}")
-        print(f"   价格: {selected_price}元/晚 (节省{current_price - selected_price}元/晚)")
-        print(f"   评分: {selected_hotel['评分']}")
-        
-        return selected_hotel
+    daily_itinerary = state.get("daily_candidates", [])
+    hotel_name = hotel.get("酒店名称", "")
+    hotel_address = hotel_api_address(hotel_name)
+    hotel_location = _hotel_coordinates(hotel)
+    route_stats = {}
+    if api_key:
+        decision_context = None
+        if config.ROUTE_PRECISION_ON_DEMAND:
+            decision_context = _route_decision_context(state, daily_itinerary, hotel)
+        daily_routes = _calculate_daily_routes(api_key, hotel_address, daily_itinerary, hotel_name, hotel_location,
+                                               leg_table, decision_context, route_stats)
     else:
-        # 如果没有更便宜的酒店，选择不在排除列表中的最便宜酒店
-        available_hotels = [h for h in hotels_data if h.get("酒店名称", "") not in excluded_hotels]
-        if available_hotels:
-            cheapest_hotel = min(available_hotels, key=lambda x: _extract_hotel_price(x.get("价格", "999元")))
-            cheapest_price = _extract_hotel_price(cheapest_hotel.get("价格", "999元"))
-            
-            print(f"✅ 选择未排除的最便宜酒店: {cheapest_hotel['酒店名称']} ({cheapest_price}元/晚)")
-            if cheapest_price >= current_price:
-                print(f"⚠️ 注意：该酒店价格({cheapest_price}元)不低于当前酒店({current_price}元)")
-            return cheapest_hotel
-        else:
-            print(f"⚠️ 所有酒店都已被排除，保持当前选择")
-            return current_hotel
-
-def _extract_hotel_price(price_str: str) -> float:
-    """从价格字符串中提取数字"""
-    try:
-        return float(''.join(filter(str.isdigit, price_str)))
-    except:
-        return 999.0  # 默认价格
+        daily_routes = _estimated_daily_routes(hotel_address, daily_itinerary, hotel_name, hotel_location or hotel_address)
+    return {
+        "time_optimized": _generate_time_optimized_plan(daily_routes),
+        "cost_optimized": _generate_cost_optimized_plan(daily_routes),
+        "comfort_optimized": _generate_comfort_optimized_plan(daily_routes),
+        "daily_routes": daily_routes,
+        "route_stats": route_stats,
+        "demo_mode": not api_key,
+        "hotel_used": hotel_address,
+        "hotel_info": hotel
+    }
 
-def hotel_optimization(state: AgentState) -> AgentState:
+def _evaluate_hotel_plans(state: AgentState, hotel, plans: dict, ticket_cost: float, budget_limit: float) -> list:
     """
-    酒店优化节点 - 专门处理酒店优化，不重新执行交通规划和强度计算
+    评估一家酒店的三种交通方案：每日强度是否满足约束、总费用（门票 + 住宿 + 交通）及是否符合预算
     
-    功能：
-    1. 从已有酒店搜索结果中选择更便宜的酒店
-    2. 更新酒店选择
-    3. 重新计算预算（基于新的酒店价格）
+    Returns:
+        list: 每种方案一项，包含 hotel/plan_name/strategy/feasible/各项费用/within_budget
     """
-    print("🏨 执行酒店优化...")
-    
-    hotel_optimization_attempts = state.get("hotel_optimization_attempts", 0)
-    max_hotel_optimization_attempts = state.get("max_hotel_optimization_attempts", 1)
-    
-    print(f"🔍 当前优化次数: {hotel_optimization_attempts}")
-    print(f"🔍 最大优化次数: {max_hotel_optimization_attempts}")
+    daily_candidates = state.get("daily_candidates", [])
+    daily_time_limit = state.get("daily_time_limit", 12)
+    group = state.get("structured_info", {}).get("group", {})
+    total_people = group.get("adults", 1) + group.get("children", 0) + group.get("elderly", 0)
+    hotel_cost = _hotel_price(hotel, default=500) * state.get("room_requirements", 1) * len(daily_candidates)
+    
+    cells = []
+    for plan_name in ("time_optimized", "cost_optimized", "comfort_optimized"):
+        plan = plans[plan_name]
+        intensity = _calculate_plan_intensity_simple(daily_candidates, plan)
+        feasible = all(day["total_hours"] <= daily_time_limit for day in intensity["daily_details"])
+        transport_cost = _plan_transport_cost(plan, total_people)
+        total_cost = ticket_cost + hotel_cost + transport_cost
+        cells.append({
+            "hotel": hotel,
+            "plan_name": plan_name,
+            "strategy": plan.get("strategy", plan_name),
+            "feasible": feasible,
+            "max_daily_hours": max((day["total_hours"] for day in intensity["daily_details"]), default=0),
+            "hotel_cost": hotel_cost,
+            "transport_cost": transport_cost,
+            "total_cost": total_cost,
+            "within_budget": total_cost <= budget_limit
+        })
+    return cells
+
+def joint_optimization(state: AgentState) -> AgentState:
+    """
+    酒店×交通方案联合优化节点（预算或强度约束不满足时执行一次）
     
-    # 检查是否超过最大优化次数
-    if hotel_optimization_attempts >= max_hotel_optimization_attempts:
-        print(f"❌ 已达到最大优化次数({max_hotel_optimization_attempts})，无法继续优化")
-        return state
+    为其余候选酒店并发生成三种交通方案（交通规划节点已生成的直接使用，路段表复用），
+    一次性评估 酒店×方案 的强度约束与总费用，选出最优组合：
+    1. 强度满足且符合预算的组合中，取酒店排序（综合得分）最靠前的酒店、该酒店下总费用最低的方案
+    2. 都不符合预算时，取强度满足的组合中总费用最低的
+    住宿费用加门票已超出预算的酒店不可能符合预算，先用价格索引排除，只有第2种情况才补充评估
+    """
+    print("🧮 执行酒店×交通方案联合优化...")
     
-    # 获取已有酒店搜索结果
-    existing_results = state.get("hotel_search_results", [])
-    if not existing_results:
-        print("❌ 未找到已有酒店搜索结果，无法进行优化")
+    hotels = state.get("hotel_search_results", [])
+    daily_candidates = state.get("daily_candidates", [])
+    if not hotels or not daily_candidates:
+        print("❌ 缺少酒店候选或每日行程，无法进行联合优化")
         return state
     
-    print(f"✅ 使用{len(existing_results)}个已有酒店候选进行优化选择")
-    
-    # 将当前选择的酒店添加到排除列表
-    current_hotels = state.get("selected_hotels", [])
-    if current_hotels:
-        current_hotel_name = current_hotels[0].get("酒店名称", "")
-        if current_hotel_name and current_hotel_name not in state["excluded_hotels"]:
-            state["excluded_hotels"].append(current_hotel_name)
-            print(f"🚫 将当前酒店加入排除列表: {current_hotel_name}")
-    
-    # 显示排除列表
-    excluded_hotels = state.get("excluded_hotels", [])
-    if excluded_hotels:
-        print(f"🚫 已排除的酒店: {', '.join(excluded_hotels)}")
+    info = state.get("structured_info", {})
+    group = info.get("group", {})
+    total_people = group.get("adults", 1) + group.get("children", 0) + group.get("elderly", 0)
+    trip_days = len(daily_candidates)
+    room_requirements = state.get("room_requirements", 1)
+    budget_info = info.get("budget", {})
+    budget_limit = budget_info.get("total") or (budget_info.get("per_day", 1000) * trip_days)
+    ticket_cost = sum(
+        _get_poi_ticket_price(poi) * total_people
+        for day_plan in daily_candidates for poi in day_plan.get("pois", [])
+    )
     
-    # 确保排除列表被正确设置
-    if "excluded_hotels" not in state:
-        state["excluded_hotels"] = []
+    # 住宿费用 + 门票不超过预算的酒店（价格索引二分查找）排在前面评估
+    index = state.get("hotel_index")
+    if index is None or len(index) != len(hotels):
+        index = HotelIndex(hotels)
+        state["hotel_index"] = index
+    price_cap = (budget_limit - ticket_cost) / max(room_requirements * trip_days, 1)
+    affordable = {hotel.name for hotel in index.cheaper_than(price_cap)}
+    rank = {hotel.get("酒店名称", ""): i for i, hotel in enumerate(hotels)}
+    print(f"📊 {len(hotels)}家酒店候选，其中{len(affordable)}家住宿费用在预算内（每晚低于{price_cap:.0f}元）")
+    
+    # 交通规划节点已为候选酒店生成的方案直接使用，缺少的再并发补算
+    api_key = os.getenv("GAODE_API_KEY")
+    leg_table = state.get("route_leg_table") or {}
+    plan_sets = dict(state.get("hotel_transport_plans") or {})
+    current_plans = state.get("transportation_plans", {})
+    if current_plans:
+        plan_sets.setdefault(current_plans.get("hotel_info", {}).get("酒店名称", ""), current_plans)
+    
+    def _evaluate(candidates):
+        missing = [hotel for hotel in candidates if hotel.get("酒店名称", "") not in plan_sets]
+        if missing:
+            print(f"\n🏨 并发为{len(missing)}家酒店生成交通方案...")
+            plan_sets.update(_plan_hotels_concurrently(state, missing, api_key, leg_table))
+        cells = []
+        for hotel in candidates:
+            plans = plan_sets.get(hotel.get("酒店名称", ""))
+            if plans is not None:
+                cells.extend(_evaluate_hotel_plans(state, hotel, plans, ticket_cost, budget_limit))
+        return cells
+    
+    matrix = _evaluate([hotel for hotel in hotels if hotel.get("酒店名称") in affordable])
+    chosen = min(
+        (cell for cell in matrix if cell["feasible"] and cell["within_budget"]),
+        key=lambda cell: (rank[cell["hotel"].get("酒店名称", "")], cell["total_cost"]),
+        default=None
+    )
+    if chosen is None:
+        matrix += _evaluate([hotel for hotel in hotels if hotel.get("酒店名称") not in affordable])
+        chosen = min((cell for cell in matrix if cell["feasible"]), key=lambda cell: cell["total_cost"], default=None)
+    state["route_leg_table"] = leg_table
+    state["hotel_transport_plans"] = plan_sets
+    
+    # 输出 酒店×方案 矩阵
+    print("\n📊 酒店×交通方案评估结果:")
+    print("=" * 80)
+    print(f"{'酒店':<24} {'方案':<8} {'最长一天':<8} {'住宿':<8} {'交通':<8} {'总费用':<8} {'状态'}")
+    print("-" * 80)
+    for cell in matrix:
+        status = ("✅符合预算" if cell["within_budget"] else "❌超预算") if cell["feasible"] else "❌超强度"
+        print(f"{cell['hotel'].get('酒店名称', ''):<24} {cell['strategy']:<8} {cell['max_daily_hours']:<8.1f} "
+              f"{cell['hotel_cost']:<8.0f} {cell['transport_cost']:<8.0f} {cell['total_cost']:<8.0f} {status}")
+    print("=" * 80)
     
-    # 选择更便宜的酒店（确保排除列表被正确传递）
-    print(f"🔍 开始选择酒店，排除列表: {state['excluded_hotels']}")
-    selected_hotel = _select_cheaper_hotel(state, existing_results)
-    selection_reason = f"第{hotel_optimization_attempts + 1}次优化，选择更便宜酒店"
+    state["hotel_optimization_attempts"] = state.get("hotel_optimization_attempts", 0) + 1
+    state["joint_optimization_result"] = [
+        {**cell, "hotel": cell["hotel"].get("酒店名称", "")} for cell in matrix
+    ]
+    if chosen is None:
+        print("❌ 没有满足强度约束的酒店×交通方案组合，保持当前方案")
+        return state
     
-    # 增加优化尝试次数
-    state["hotel_optimization_attempts"] = hotel_optimization_attempts + 1
+    selected_hotel = chosen["hotel"]
+    selection_reason = "联合优化：符合预算的最优组合" if chosen["within_budget"] else "联合优化：超出预算最少的组合"
+    print(f"✅ 联合优化选择: {selected_hotel.get('酒店名称', '')} + 【{chosen['strategy']}】，总费用{chosen['total_cost']:.0f}元")
     
-    # 更新酒店选择
     state["selected_hotels"] = [selected_hotel]
-    
-    print(f"✅ 优化选择酒店: {selected_hotel['酒店名称']}")
-    print(f"   评分: {selected_hotel['评分']}")
-    print(f"   房型: {selected_hotel['房型']}")
-    print(f"   价格: {selected_hotel['价格']}")
-    print(f"   选择原因: {selection_reason}")
-    
-    # 添加酒店选择记录
-    if "hotel_selection_history" not in state:
-        state["hotel_selection_history"] = []
-    
-    state["hotel_selection_history"].append({
+    state["transportation_plans"] = plan_sets[selected_hotel.get("酒店名称", "")]
+    state.setdefault("hotel_selection_history", []).append({
         "selected_hotel": selected_hotel,
         "selection_reason": selection_reason,
-        "selection_time": f"optimization_{hotel_optimization_attempts + 1}",
-        "available_options": len(existing_results),
-        "optimization_attempt": hotel_optimization_attempts + 1
+        "selection_time": "joint_optimization",
+        "available_options": len(hotels),
+        "evaluated_combinations": len(matrix),
+        "optimization_attempt": state["hotel_optimization_attempts"]
     })
     
-    # 重要：清除之前的交通规划结果，确保使用新酒店重新规划
-    if "transportation_plans" in state:
-        old_hotel = state["transportation_plans"].get("hotel_used", "未知")
-        del state["transportation_plans"]
-        print(f"🔄 已清除之前的交通规划（酒店: {old_hotel}），将使用新酒店（{selected_hotel['酒店名称']}）重新规划")
-    
-    # 同时清除其他相关状态，确保完全重新计算
-    for key in ["valid_transport_plans", "calculated_intensity", "intensity_satisfied"]:
-        if key in state:
-            del state[key]
-            print(f"🔄 已清除{key}状态，确保重新计算")
-    
-    # 重新计算预算（基于新的酒店价格）
-    print("💰 重新计算预算...")
-    
-    # 获取基础信息
-    info = state.get("structured_info", {})
-    group = info.get("group", {})
-    total_people = group.get("adults", 1) + group.get("children", 0)
-    room_requirements = state.get("room_requirements", 1)
-    daily_candidates = state.get("daily_candidates", [])
-    trip_days = len(daily_candidates)
-    
-    # 计算新的酒店费用
-    hotel_price_per_night = _extract_hotel_price(selected_hotel.get("价格", "0元"))
-    total_hotel_cost = hotel_price_per_night * room_requirements * trip_days
-    
-    # 获取之前的费用信息
-    cost_breakdown = state.get("cost_breakdown", {})
-    ticket_cost = cost_breakdown.get("ticket_cost", 0)
-    transport_cost = cost_breakdown.get("transport_cost", 0)
-    
-    # 如果没有之前的费用信息，从推荐方案中获取
-    if ticket_cost == 0 or transport_cost == 0:
-        recommended_plan = state.get("recommended_plan", {})
-        if recommended_plan:
-            ticket_cost = recommended_plan.get("ticket_cost", 0)
-            transport_cost = recommended_plan.get("transport_cost", 0)
-            print(f"🔍 从推荐方案获取费用信息: 门票{ticket_cost}元, 交通{transport_cost}元")
-    
-    # 计算新的总费用
-    new_total_cost = ticket_cost + total_hotel_cost + transport_cost
-    
-    # 更新费用信息
-    state["calculated_cost"] = new_total_cost
-    state["cost_breakdown"]["hotel_cost"] = total_hotel_cost
-    state["cost_breakdown"]["hotel_details"] = {
-        "hotel_name": selected_hotel.get("酒店名称", ""),
-        "price_per_night": hotel_price_per_night,
-        "rooms": room_requirements,
-        "nights": trip_days
-    }
-    
-    # 检查预算是否满足
-    budget_info = info.get("budget", {})
-    budget_limit = budget_info.get("total") or (budget_info.get("per_day", 1000) * trip_days)
-    state["budget_satisfied"] = new_total_cost <= budget_limit
-    
-    print(f"💰 优化后费用:")
-    print(f"   景点门票: {ticket_cost}元")
-    print(f"   酒店住宿: {total_hotel_cost}元")
-    print(f"   交通费用: {transport_cost}元")
-    print(f"   总费用: {new_total_cost}元")
-    print(f"   预算限制: {budget_limit}元")
-    print(f"   预算状态: {'✅ 满足' if state['budget_satisfied'] else '❌ 超出'}")
-    
-    print("✅ 酒店优化完成")
+    # 按选中的组合更新强度与费用结果（不再需要新的查询）
+    intensity_calculate(state)
+    budget_calculate(state)
+    print("✅ 联合优化完成")
     return state
 
 # 6. 预算检查节点 - budget_check
@@ -2191,10 +2639,10 @@ def budget_check(state: AgentState) -> AgentState:
         print(f"❌ 预算检查未通过！超出预算: {exceed_amount}元")
         
         if hotel_optimization_attempts == 0:
-            print("💡 将尝试选择更便宜的酒店来降低成本")
+            print("💡 将联合评估所有酒店与交通方案的组合来降低成本")
             state["budget_check_result"] = "需要优化酒店"
         else:
-            print("⚠️ 已尝试酒店优化一次，但仍超出预算")
+            print("⚠️ 已进行联合优化，但仍超出预算")
             state["budget_check_result"] = "优化后仍超预算"
     
     print("✅ 预算检查完成")
@@ -2299,6 +2747,11 @@ def final_output(state: AgentState) -> AgentState:
                     method = route.get("method", "")
                     cost = route.get("cost", "")
                     print(f"      {segment}: {method} ({cost})")
+
+        route_stats = transportation_plans.get("route_stats", {})
+        if route_stats.get("skipped_calls"):
+            print(f"\n    📐 路线查询: 实时查询{route_stats['live_calls']}条，"
+                  f"离线估算足以决策而跳过{route_stats['skipped_calls']}条")
     else:
         print("  ❌ 未找到交通方案")
     
@@ -2342,6 +2795,16 @@ def final_output(state: AgentState) -> AgentState:
         print(f"  3. 多使用公共交通，减少出租车")
         print(f"  4. 调整行程天数")
     
+    # 6. 外部服务状态（熔断器）
+    service_metrics = breaker_metrics()
+    if service_metrics:
+        state_labels = {"closed": "正常", "open": "熔断中", "half_open": "试探恢复中"}
+        print(f"\n🔌 外部服务状态:")
+        for provider, snapshot in service_metrics.items():
+            print(f"  {provider}: {state_labels.get(snapshot['state'], snapshot['state'])} "
+                  f"(近期{snapshot['window_calls']}次调用，失败率{snapshot['failure_rate']:.0%}，"
+                  f"熔断{snapshot['times_opened']}次，降级跳过{snapshot['rejected']}次)")
+    
     print("\n" + "="*80)
     print("🎊 感谢使用北京旅行规划助手！祝您旅途愉快！")
     print("="*80)
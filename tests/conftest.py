@@ -0,0 +1,13 @@
+"""
+pytest公共配置：项目根目录加入导入路径，持久化缓存写入临时目录（不污染 data/cache）
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="travel-agent-cache-"))
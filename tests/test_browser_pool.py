@@ -0,0 +1,136 @@
+"""tools.browser_pool.BrowserPool：借出健康检查、标签页隔离、按使用次数重建与排队上限（使用假的 webdriver）"""
+
+import threading
+
+import pytest
+
+from tools.browser_pool import BrowserPool, BrowserPoolBusy
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.tabs += 1
+        self.driver.current_window_handle = f"tab-{self.driver.tabs}"
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    def __init__(self, number):
+        self.number = number
+        self.tabs = 0
+        self.closed_tabs = 0
+        self.alive = True
+        self.quit_called = False
+        self.current_window_handle = "home"
+        self.switch_to = FakeSwitch(self)
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def close(self):
+        self.closed_tabs += 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def drivers():
+    return []
+
+
+def _pool(drivers, **kwargs):
+    def factory():
+        drivers.append(FakeDriver(len(drivers)))
+        return drivers[-1]
+    return BrowserPool(factory=factory, **kwargs)
+
+
+def test_reuses_browser_in_a_fresh_tab(drivers):
+    pool = _pool(drivers, size=2)
+    for _ in range(3):
+        with pool.tab() as driver:
+            assert driver.current_window_handle != "home"
+    assert len(drivers) == 1
+    assert (drivers[0].tabs, drivers[0].closed_tabs) == (3, 3)
+    assert drivers[0].current_window_handle == "home"
+    assert pool.stats()["idle"] == 1
+
+
+def test_unhealthy_browser_is_replaced(drivers):
+    pool = _pool(drivers, size=1)
+    with pool.tab():
+        pass
+    drivers[0].alive = False
+    with pool.tab() as driver:
+        assert driver is drivers[1]
+    assert drivers[0].quit_called
+    assert pool.stats()["replaced"] == 1
+
+
+def test_recycled_after_max_uses(drivers):
+    pool = _pool(drivers, size=1, max_uses=2)
+    for _ in range(3):
+        with pool.tab():
+            pass
+    assert len(drivers) == 2
+    assert drivers[0].quit_called and not drivers[1].quit_called
+    assert pool.stats()["recycled"] == 1
+
+
+def test_error_inside_tab_keeps_browser(drivers):
+    pool = _pool(drivers, size=1)
+    with pytest.raises(ValueError):
+        with pool.tab():
+            raise ValueError("页面解析失败")
+    with pool.tab() as driver:
+        assert driver is drivers[0]
+
+
+def test_waits_then_rejects_when_busy(drivers):
+    pool = _pool(drivers, size=1, acquire_timeout=0.05, max_waiters=1)
+    release = threading.Event()
+    holder_ready = threading.Event()
+
+    def hold():
+        with pool.tab():
+            holder_ready.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holder_ready.wait(5)
+    with pytest.raises(BrowserPoolBusy):
+        with pool.tab():
+            pass  # 等待超时
+    release.set()
+    holder.join(5)
+    with pool.tab() as driver:
+        assert driver is drivers[0]
+    assert pool.stats()["rejected"] == 1
+
+
+def test_full_wait_queue_rejects_immediately(drivers):
+    pool = _pool(drivers, size=1, acquire_timeout=5, max_waiters=0)
+    with pool.tab():
+        with pytest.raises(BrowserPoolBusy):
+            with pool.tab():
+                pass
+
+
+def test_close_quits_idle_browsers_and_refuses_new_tabs(drivers):
+    pool = _pool(drivers, size=2)
+    with pool.tab():
+        pass
+    pool.close()
+    assert drivers[0].quit_called
+    with pytest.raises(BrowserPoolBusy):
+        with pool.tab():
+            pass
@@ -0,0 +1,85 @@
+"""tools.circuit_breaker.CircuitBreaker：按失败率熔断、半开试探与恢复"""
+
+import pytest
+
+from tools import circuit_breaker
+from tools.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = {"now": 100.0}
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: state["now"])
+    return state
+
+
+def _tripped(clock):
+    breaker = CircuitBreaker("amap", window_seconds=60, min_calls=2, failure_rate=0.5, open_seconds=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_opens_after_failure_rate_reached(clock):
+    breaker = _tripped(clock)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.snapshot()["rejected"] == 1
+    assert breaker.times_opened == 1
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = CircuitBreaker("amap", min_calls=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = _tripped(clock)
+    clock["now"] += 30
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # 试探进行中，其余调用仍被拒绝
+
+
+def test_successful_probe_closes_and_clears_history(clock):
+    breaker = _tripped(clock)
+    clock["now"] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    snapshot = breaker.snapshot()
+    assert (snapshot["window_calls"], snapshot["window_failures"]) == (1, 0)
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _tripped(clock)
+    clock["now"] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    clock["now"] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_ignored_probe_releases_the_probe_slot(clock):
+    breaker = _tripped(clock)
+    clock["now"] += 30
+    breaker.before_call()
+    breaker.record_ignored()  # 如本地浏览器池繁忙，不计入统计
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # 可以再次试探
+
+
+def test_call_records_exceptions_as_failures(clock):
+    breaker = CircuitBreaker("qweather", min_calls=1, failure_rate=1.0)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(ZeroDivisionError):
+        breaker.call(lambda: 1 / 0)
+    assert breaker.snapshot()["window_failures"] == 1
@@ -0,0 +1,72 @@
+"""src.workflow._calculate_daily_routes：跨天去重查询路段，更换酒店时复用路段表中的景点间路段"""
+
+import pytest
+
+from src import workflow
+from tools import routeinf
+
+GUGONG = {"name": "故宫", "location": {"lat": 39.916, "lng": 116.397}}
+JINGSHAN = {"name": "景山公园", "location": {"lat": 39.925, "lng": 116.396}}
+TIANTAN = {"name": "天坛", "location": {"lat": 39.882, "lng": 116.407}}
+# 第1天与第3天的景点间路段相同
+ITINERARY = [
+    {"date": "2026-11-01", "pois": [GUGONG, JINGSHAN]},
+    {"date": "2026-11-02", "pois": [TIANTAN]},
+    {"date": "2026-11-03", "pois": [GUGONG, JINGSHAN]},
+]
+WANGFUJING = (116.4108, 39.9149)
+XIDAN = (116.374, 39.9105)
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    """记录每次批量查询的路段，failing 中的路段返回异常"""
+    batches, failing = [], set()
+
+    def get_routes_concurrently(api_key, legs):
+        batches.append([workflow._leg_key(leg) for leg in legs])
+        return [
+            RuntimeError("查询失败") if (leg["from"], leg["to"]) in failing else {
+                "出发地": leg["origin_name"], "目的地": leg["destination_name"],
+                "公共交通最短时间": 20.0, "公共交通费用": "3元", "出租车最短时间": 12.0, "出租车费用": "25元",
+            }
+            for leg in legs
+        ]
+
+    monkeypatch.setattr(routeinf, "get_routes_concurrently", get_routes_concurrently)
+    return batches, failing
+
+
+def _calculate(hotel_name, location, leg_table):
+    return workflow._calculate_daily_routes("key", f"北京市{hotel_name}", ITINERARY, hotel_name, location, leg_table)
+
+
+def test_repeated_legs_are_queried_once(routes):
+    batches, _ = routes
+    leg_table = {}
+    daily_routes = _calculate("王府井酒店", WANGFUJING, leg_table)
+    assert len(batches) == 1
+    # 3天共 3 + 2 + 3 = 8 条路段；第3天与第1天完全相同
+    assert len(batches[0]) == len(set(batches[0])) == 5
+    assert [len(day["routes"]) for day in daily_routes] == [3, 2, 3]
+    assert daily_routes[2]["routes"][1]["segment"] == "故宫 → 景山公园"
+    assert len(leg_table) == 5
+
+
+def test_new_hotel_only_queries_hotel_legs(routes):
+    batches, _ = routes
+    leg_table = {}
+    _calculate("王府井酒店", WANGFUJING, leg_table)
+    daily_routes = _calculate("西单酒店", XIDAN, leg_table)
+    shared = workflow._leg_key({"origin": (116.397, 39.916), "destination": (116.396, 39.925)})
+    assert shared not in batches[1]
+    assert len(batches[1]) == 4  # 西单酒店→故宫、景山公园→西单酒店、往返天坛
+    assert daily_routes[0]["routes"][0]["segment"] == "西单酒店 → 故宫"
+
+
+def test_day_with_failed_leg_falls_back_to_estimates(routes):
+    _, failing = routes
+    failing.add(("北京市王府井酒店", "天坛"))
+    daily_routes = _calculate("王府井酒店", WANGFUJING, {})
+    assert daily_routes[1]["routes"][0]["route_info"]["估算"] is True
+    assert "估算" not in daily_routes[0]["routes"][0]["route_info"]
@@ -0,0 +1,78 @@
+"""WeatherClassifier.suggest_date_windows：按预报评估备选出发日期窗口；用户按序号选择备选窗口"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from src.weather_classifier import WeatherClassifier
+from src.workflow import _match_date_window_choice
+
+OUTDOOR_POI = {"name": "颐和园", "indoor": "否", "suggested_duration_hours": 4}
+INDOOR_POI = {"name": "国家博物馆", "indoor": "是", "suggested_duration_hours": 4}
+
+
+def _forecast(texts, start="2026-11-01"):
+    first = date.fromisoformat(start)
+    return [
+        {"fxDate": (first + timedelta(days=i)).isoformat(), "textDay": text, "tempMax": "15", "tempMin": "5"}
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_prefers_outdoor_days_and_skips_extreme_weather():
+    weather = _forecast(["暴雨", "晴", "晴", "中雨", "晴"])
+    windows = WeatherClassifier().suggest_date_windows(
+        weather, [OUTDOOR_POI, INDOOR_POI], [], trip_days=2, daily_time_budget=8, max_idle_hours=8
+    )
+    assert [w["start_date"] for w in windows] == ["2026-11-02", "2026-11-03", "2026-11-04"]
+    assert windows[0]["suitable_days"] == 2
+    assert windows[0]["score"] > windows[1]["score"]
+
+
+def test_excludes_original_start_date_and_limits_top_k():
+    weather = _forecast(["晴"] * 5)
+    windows = WeatherClassifier().suggest_date_windows(
+        weather, [OUTDOOR_POI], [], trip_days=2, daily_time_budget=8, max_idle_hours=8,
+        exclude_start_date="2026-11-01", top_k=2
+    )
+    assert [w["start_date"] for w in windows] == ["2026-11-02", "2026-11-03"]
+    assert windows[0]["dates"] == ["2026-11-02", "2026-11-03"]
+
+
+def test_rejects_windows_that_are_not_full_enough():
+    weather = _forecast(["晴", "中雨", "晴"])
+    # 中雨天只有室内景点可去，空闲时间超出上限，含这一天的窗口被排除
+    windows = WeatherClassifier().suggest_date_windows(
+        weather, [OUTDOOR_POI, INDOOR_POI], [], trip_days=1, daily_time_budget=8, max_idle_hours=2
+    )
+    assert [w["start_date"] for w in windows] == ["2026-11-01", "2026-11-03"]
+
+
+def test_returns_nothing_when_forecast_is_too_short():
+    weather = _forecast(["晴", "晴"])
+    assert WeatherClassifier().suggest_date_windows(weather, [OUTDOOR_POI], [], 3, 8) == []
+
+
+WINDOWS = [{"start_date": f"2026-11-{day:02d}"} for day in range(1, 13)]
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("1", "2026-11-01"),
+    ("方案2", "2026-11-02"),
+    ("选第3个", "2026-11-03"),
+    ("10", "2026-11-10"),
+    ("选择第12个。", "2026-11-12"),
+])
+def test_matches_window_choice(reply, expected):
+    assert _match_date_window_choice(reply, WINDOWS)["start_date"] == expected
+
+
+@pytest.mark.parametrize("reply, windows", [
+    ("0", WINDOWS),
+    ("13", WINDOWS),
+    ("方案4", WINDOWS[:3]),
+    ("100", WINDOWS),
+    ("改成11月5号出发", WINDOWS),
+])
+def test_rejects_out_of_range_or_unrelated_reply(reply, windows):
+    assert _match_date_window_choice(reply, windows) == {}
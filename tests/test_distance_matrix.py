@@ -0,0 +1,58 @@
+"""tools.routeinf.get_distance_matrix：按终点分组、每批最多100个起点的距离测量与单元格缓存"""
+
+import pytest
+
+from tools import routeinf
+from tools.kv_store import SQLiteTTLStore
+
+ORIGINS = [(116.2 + i * 0.001, 39.8) for i in range(150)]
+DESTINATIONS = [(116.4, 39.9), (116.5, 40.0)]
+
+
+@pytest.fixture
+def amap(tmp_path, monkeypatch):
+    """记录请求的距离测量接口；unreachable 中的起点返回无法计算的条目"""
+    monkeypatch.setattr(routeinf, "_route_store", SQLiteTTLStore(str(tmp_path / "routes.sqlite3"), table="routes"))
+    state = {"requests": [], "unreachable": set()}
+
+    def get_json(provider, url, params=None, **kwargs):
+        origins = params["origins"].split("|")
+        state["requests"].append((params["destination"], len(origins), params["type"]))
+        results = []
+        for i, origin in enumerate(origins, 1):
+            if origin in state["unreachable"]:
+                results.append({"origin_id": str(i), "info": "未找到路线"})
+            else:
+                results.append({"origin_id": str(i), "distance": str(i * 1000), "duration": str(i * 60)})
+        return {"status": "1", "results": results}
+
+    monkeypatch.setattr(routeinf, "get_json", get_json)
+    return state
+
+
+def test_batches_origins_per_destination(amap):
+    result = routeinf.get_distance_matrix("key", ORIGINS, DESTINATIONS)
+    assert [(count, mode) for _, count, mode in amap["requests"]] == [(100, 1), (50, 1), (100, 1), (50, 1)]
+    assert len(result["distance_km"]) == 150 and len(result["distance_km"][0]) == 2
+    assert result["distance_km"][0] == [1.0, 1.0]
+    assert result["duration_min"][120] == [21.0, 21.0]  # 第二批的第21个起点
+
+
+def test_cached_cells_are_not_requested_again(amap):
+    routeinf.get_distance_matrix("key", ORIGINS[:3], DESTINATIONS[:1])
+    amap["requests"].clear()
+    result = routeinf.get_distance_matrix("key", ORIGINS[:5], DESTINATIONS[:1])
+    assert [count for _, count, _ in amap["requests"]] == [2]
+    assert result["distance_km"][3] == [1.0]  # 新一批中的第1个起点
+
+
+def test_unreachable_cells_are_none(amap):
+    amap["unreachable"].add(f"{ORIGINS[1][0]},{ORIGINS[1][1]}")
+    result = routeinf.get_distance_matrix("key", ORIGINS[:3], DESTINATIONS[:1], mode="walking")
+    assert amap["requests"][0][2] == 3
+    assert result["duration_min"] == [[1.0], [None], [3.0]]
+
+
+def test_rejects_unknown_mode(amap):
+    with pytest.raises(ValueError):
+        routeinf.get_distance_matrix("key", ORIGINS[:1], DESTINATIONS[:1], mode="transit")
@@ -0,0 +1,64 @@
+"""tools.routeinf.geocode_addresses：持久化缓存、每批10个地址的批量编码与负缓存"""
+
+import pytest
+
+from tools import routeinf
+from tools.kv_store import SQLiteTTLStore
+
+
+@pytest.fixture
+def amap(tmp_path, monkeypatch):
+    """独立的地理编码缓存 + 记录请求的批量编码接口；failing 中的地址编码失败，down 为True时接口报错"""
+    monkeypatch.setattr(routeinf, "_geocode_store", SQLiteTTLStore(str(tmp_path / "geocode.sqlite3"), table="geocode"))
+    state = {"requests": [], "failing": set(), "down": False}
+
+    def get_json(provider, url, params=None, **kwargs):
+        batch = params["address"].split("|")
+        state["requests"].append(batch)
+        if state["down"]:
+            return {"status": "0", "info": "DAILY_QUERY_OVER_LIMIT"}
+        return {"status": "1", "geocodes": [
+            {"location": []} if address in state["failing"] else {"location": f"116.{i:03d},39.900"}
+            for i, address in enumerate(batch)
+        ]}
+
+    monkeypatch.setattr(routeinf, "get_json", get_json)
+    return state
+
+
+def test_batches_of_ten_and_cache_hits(amap):
+    addresses = [f"北京市测试地址{i}" for i in range(23)]
+    result = routeinf.geocode_addresses("key", addresses)
+    assert [len(batch) for batch in amap["requests"]] == [10, 10, 3]
+    assert result["北京市测试地址0"] == (116.0, 39.9)
+    assert all(coords for coords in result.values())
+
+    amap["requests"].clear()
+    again = routeinf.geocode_addresses("key", addresses + ["北京市测试地址99"])
+    assert amap["requests"] == [["北京市测试地址99"]]  # 已缓存的地址不再请求
+    assert again["北京市测试地址22"] == result["北京市测试地址22"]
+
+
+def test_normalized_addresses_share_one_entry(amap):
+    routeinf.geocode_addresses("key", ["北京市 王府井ＡＢＣ"])
+    amap["requests"].clear()
+    assert routeinf.geocode_addresses("key", ["北京市王府井abc"])["北京市王府井abc"] is not None
+    assert amap["requests"] == []
+
+
+def test_failed_addresses_are_negatively_cached(amap):
+    amap["failing"].add("不存在的地址")
+    result = routeinf.geocode_addresses("key", ["不存在的地址", "北京市天坛"])
+    assert result == {"不存在的地址": None, "北京市天坛": (116.001, 39.9)}
+
+    amap["requests"].clear()
+    assert routeinf.geocode_address("key", "不存在的地址") is None
+    assert amap["requests"] == []
+
+
+def test_request_errors_are_not_cached(amap):
+    amap["down"] = True
+    assert routeinf.geocode_address("key", "北京市故宫") is None
+    amap["down"] = False
+    assert routeinf.geocode_address("key", "北京市故宫") == (116.0, 39.9)
+    assert len(amap["requests"]) == 2
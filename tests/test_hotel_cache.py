@@ -0,0 +1,74 @@
+"""tools.hotel.ctrip_hotel_scraper 的搜索结果缓存：按搜索条件索引，可选使用相邻日期的结果"""
+
+import pytest
+
+from config import config
+from tools import hotel
+from tools.kv_store import SQLiteTTLStore
+
+SEARCH = ("王府井", "2026/11/01", "2026/11/03", 1, 2, 0)
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    """独立的酒店缓存 + 记录调用的抓取函数；pages[日期] 为页面上的全部酒店"""
+    monkeypatch.setattr(hotel, "_hotel_store", SQLiteTTLStore(str(tmp_path / "hotels.sqlite3"), table="hotels"))
+    monkeypatch.setattr(config, "HOTEL_CACHE_ADJACENT_DAYS", 0)
+    state = {"calls": [], "page": [{"酒店名称": f"酒店{i}", "评分": "4.5", "房型": "大床房", "价格": f"¥{300 + i}"}
+                                   for i in range(8)]}
+
+    def scrape(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5, cancel_event=None):
+        state["calls"].append((checkin, max_hotels))
+        return [dict(item) for item in state["page"][:max_hotels]]
+
+    monkeypatch.setattr(hotel, "_scrape_ctrip_hotels", scrape)
+    return state
+
+
+def _names(hotels):
+    return [item["酒店名称"] for item in hotels]
+
+
+def test_repeated_search_hits_cache(scraper):
+    first = hotel.ctrip_hotel_scraper(*SEARCH, max_hotels=5)
+    again = hotel.ctrip_hotel_scraper(*SEARCH, max_hotels=3)
+    assert len(scraper["calls"]) == 1
+    assert _names(again) == _names(first)[:3]
+
+
+def test_needs_more_hotels_than_cached(scraper):
+    hotel.ctrip_hotel_scraper(*SEARCH, max_hotels=3)
+    assert len(hotel.ctrip_hotel_scraper(*SEARCH, max_hotels=6)) == 6
+    assert scraper["calls"] == [("2026/11/01", 3), ("2026/11/01", 6)]
+
+
+def test_exhausted_list_satisfies_larger_requests(scraper):
+    scraper["page"] = scraper["page"][:2]
+    hotel.ctrip_hotel_scraper(*SEARCH, max_hotels=5)  # 页面上只有2家
+    assert len(hotel.ctrip_hotel_scraper(*SEARCH, max_hotels=10)) == 2
+    assert len(scraper["calls"]) == 1
+
+
+def test_empty_results_are_not_cached(scraper):
+    scraper["page"] = []
+    assert hotel.ctrip_hotel_scraper(*SEARCH) == []
+    hotel.ctrip_hotel_scraper(*SEARCH)
+    assert len(scraper["calls"]) == 2
+
+
+def test_other_occupancy_is_a_different_search(scraper):
+    hotel.ctrip_hotel_scraper(*SEARCH)
+    hotel.ctrip_hotel_scraper("王府井", "2026/11/01", "2026/11/03", 2, 4, 0)
+    assert len(scraper["calls"]) == 2
+
+
+def test_adjacent_dates_are_opt_in_and_marked_stale(scraper, monkeypatch):
+    hotel.ctrip_hotel_scraper("王府井", "2026/11/02", "2026/11/04", 1, 2, 0)
+    hotel.ctrip_hotel_scraper(*SEARCH)
+    assert len(scraper["calls"]) == 2
+
+    monkeypatch.setattr(config, "HOTEL_CACHE_ADJACENT_DAYS", 1)
+    stale = hotel.ctrip_hotel_scraper("王府井", "2026/10/31", "2026/11/02", 1, 2, 0)
+    assert len(scraper["calls"]) == 2
+    assert stale[0]["过期数据"] is True
+    assert stale[0]["数据日期"] == "2026/11/01-2026/11/03"
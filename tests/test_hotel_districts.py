@@ -0,0 +1,100 @@
+"""按每日行程中心确定酒店搜索区域，并在多个区域并发搜索后合并去重"""
+
+import pytest
+
+from config import config
+from src.hotel_scoring import search_destinations
+from src.workflow import HOTEL_SEARCH_MAX_HOTELS, _search_hotels_in_districts
+from tools import hotel
+
+DAILY_ITINERARY = [
+    {"pois": [
+        {"name": "故宫", "location": {"lat": 39.916, "lng": 116.397}},
+        {"name": "景山公园", "location": {"lat": 39.925, "lng": 116.396}},
+    ]},
+    {"pois": [
+        {"name": "天坛", "location": {"lat": 39.882, "lng": 116.407}},
+    ]},
+    {"pois": []},
+    {"pois": [
+        {"name": "北京环球度假区", "location": {"lat": 39.853, "lng": 116.676}},
+        {"name": "大运河森林公园", "location": {"lat": 39.877, "lng": 116.712}},
+    ]},
+]
+
+STATE = {
+    "structured_info": {"start_date": "2026-11-01", "end_date": "2026-11-03", "group": {"adults": 2, "children": 0}},
+    "room_requirements": 1,
+}
+
+
+def test_search_destinations_keeps_default_first_and_uses_poi_for_remote_days(monkeypatch):
+    monkeypatch.setattr(config, "HOTEL_DISTRICT_MAX_KM", 5)
+    # 第4天中心离所有锚点都远，用离中心最近的景点名搜索
+    assert search_destinations(DAILY_ITINERARY, max_destinations=3) == ["王府井", "前门", "大运河森林公园"]
+    assert search_destinations(DAILY_ITINERARY, max_destinations=1) == ["王府井"]
+
+
+def _hotel(name, price):
+    return {"酒店名称": name, "评分": "4.6", "房型": "大床房", "价格": f"¥{price}"}
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """按区域返回酒店列表的假抓取函数；值为异常时该区域搜索失败"""
+    state = {"results": {}, "awaited": [], "cancelled": [], "searched": []}
+
+    def scrape(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5, cancel_event=None):
+        state["searched"].append(destination)
+        result = state["results"][destination]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def await_search(key, timeout=None):
+        state["awaited"].append(key)
+        return state["results"].get("prefetch")
+
+    monkeypatch.setattr(hotel, "ctrip_hotel_scraper", scrape)
+    monkeypatch.setattr(hotel, "await_hotel_search", await_search)
+    monkeypatch.setattr(hotel, "cancel_hotel_search", state["cancelled"].append)
+    return state
+
+
+def test_merges_districts_and_drops_duplicates(searches):
+    searches["results"] = {
+        "王府井": [_hotel("王府井酒店", 800), _hotel("连锁酒店", 300)],
+        "前门": [_hotel("连锁酒店", 320), _hotel("前门酒店", 500)],
+    }
+    hotels = _search_hotels_in_districts(STATE, ["王府井", "前门"])
+    assert [h["酒店名称"] for h in hotels] == ["王府井酒店", "连锁酒店", "前门酒店"]
+    assert hotels[1]["价格"] == "¥300"  # 同名酒店保留先出现的区域的结果
+
+
+def test_failed_district_keeps_the_others(searches):
+    searches["results"] = {"王府井": [_hotel("王府井酒店", 800)], "前门": RuntimeError("页面加载超时")}
+    hotels = _search_hotels_in_districts(STATE, ["王府井", "前门"])
+    assert [h["酒店名称"] for h in hotels] == ["王府井酒店"]
+
+
+def test_all_districts_failing_raises(searches):
+    searches["results"] = {"王府井": RuntimeError("页面加载超时"), "前门": RuntimeError("验证码")}
+    with pytest.raises(RuntimeError):
+        _search_hotels_in_districts(STATE, ["王府井", "前门"])
+
+
+def test_matching_prefetch_is_awaited_instead_of_searched(searches):
+    key = hotel.hotel_search_key("王府井", "2026/11/01", "2026/11/03", 1, 2, 0, max_hotels=HOTEL_SEARCH_MAX_HOTELS)
+    searches["results"] = {"prefetch": [_hotel("预搜索酒店", 600)], "前门": [_hotel("前门酒店", 500)]}
+    hotels = _search_hotels_in_districts(STATE, ["王府井", "前门"], prefetch_key=key)
+    assert [h["酒店名称"] for h in hotels] == ["预搜索酒店", "前门酒店"]
+    assert searches["awaited"] == [key]
+    assert searches["searched"] == ["前门"]
+
+
+def test_stale_prefetch_is_cancelled(searches):
+    stale = hotel.hotel_search_key("王府井", "2026/10/01", "2026/10/03", 1, 2, 0, max_hotels=HOTEL_SEARCH_MAX_HOTELS)
+    searches["results"] = {"王府井": [_hotel("王府井酒店", 800)]}
+    _search_hotels_in_districts(STATE, ["王府井"], prefetch_key=stale)
+    assert searches["cancelled"] == [stale]
+    assert searches["awaited"] == []
@@ -0,0 +1,106 @@
+"""JSON提取模式：解析酒店列表接口响应、从DevTools网络日志截获接口数据，以及本地样例服务器"""
+
+import json
+import urllib.request
+
+import pytest
+
+from tools import hotel
+from tools.hotel import parse_hotel_list_payload
+from tools.hotel_fixture_server import PAGE_SIZE, fixture_hotels, start_fixture_server
+
+
+def test_parses_fixture_payload():
+    payload = {"data": {"hotelList": fixture_hotels(3), "hasMore": False}}
+    hotels = parse_hotel_list_payload(payload)
+    assert [h["酒店名称"] for h in hotels] == [f"北京王府井样例酒店{i:03d}" for i in (1, 2, 3)]
+    first, raw = hotels[0], fixture_hotels(1)[0]
+    assert first["价格数值"] == raw["roomInfo"][0]["priceInfo"]["price"]
+    assert first["价格"] == f"¥{first['价格数值']:g}"
+    assert first["房型"] == raw["roomInfo"][0]["summary"]["saleRoomName"]
+    assert first["评分"] == raw["hotelInfo"]["commentInfo"]["commentScore"]
+    assert (first["lat"], first["lng"]) == (raw["hotelInfo"]["positionInfo"]["coordinate"]["lat"],
+                                            raw["hotelInfo"]["positionInfo"]["coordinate"]["lng"])
+
+
+def test_accepts_alternative_field_names_and_skips_incomplete_records():
+    payload = {"response": {"hotels": [
+        {"name": "平铺字段酒店", "score": 4.7, "roomType": "标准间", "minPrice": "488", "latitude": "39.9", "lon": "116.4"},
+        {"name": "无价格酒店", "score": 4.5},
+        {"hotelName": "", "price": 300},
+        {"hotelName": "无坐标酒店", "displayPrice": 520.5},
+        "不是酒店记录",
+    ]}}
+    hotels = parse_hotel_list_payload(payload)
+    assert [h["酒店名称"] for h in hotels] == ["平铺字段酒店", "无坐标酒店"]
+    assert hotels[0] == {"酒店名称": "平铺字段酒店", "评分": "4.7", "房型": "标准间", "价格": "¥488",
+                         "价格数值": 488.0, "lat": 39.9, "lng": 116.4}
+    assert "lat" not in hotels[1] and hotels[1]["价格"] == "¥520.5"
+
+
+@pytest.mark.parametrize("payload", [{}, {"data": None}, {"data": {"hotelList": None}}, [], "error"])
+def test_payload_without_hotel_list(payload):
+    assert parse_hotel_list_payload(payload) == []
+
+
+class FakePerformanceLog:
+    """按轮次返回 performance 日志，列表接口的响应体从 bodies 读取"""
+
+    def __init__(self, rounds, bodies):
+        self.rounds = list(rounds)
+        self.bodies = bodies
+        self.scrolls = 0
+
+    def get(self, url):
+        pass
+
+    def get_log(self, kind):
+        return self.rounds.pop(0) if self.rounds else []
+
+    def execute_cdp_cmd(self, command, params):
+        return {"body": json.dumps(self.bodies[params["requestId"]])}
+
+    def execute_script(self, script, *args):
+        self.scrolls += 1
+
+
+def _events(request_id, url):
+    return [
+        {"message": json.dumps({"message": {"method": "Network.responseReceived",
+                                            "params": {"requestId": request_id, "response": {"url": url}}}})},
+        {"message": json.dumps({"message": {"method": "Network.loadingFinished",
+                                            "params": {"requestId": request_id}}})},
+    ]
+
+
+def test_collects_from_intercepted_list_responses(monkeypatch):
+    monkeypatch.setattr(hotel, "SCROLL_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(hotel, "NETWORK_IDLE_SECONDS", 0.05)
+    hotels = fixture_hotels(15)
+    bodies = {
+        "1": {"data": {"hotelList": hotels[:PAGE_SIZE]}},
+        "2": {"data": {"hotelList": hotels[PAGE_SIZE:]}},
+        "3": {"other": "ignored"},
+    }
+    driver = FakePerformanceLog(
+        [[], _events("3", "https://hotels.example/static/app.js"), _events("1", "https://hotels.example/fetchHotelList?p=0"),
+         [], _events("2", "https://hotels.example/fetchHotelList?p=1")],
+        bodies,
+    )
+    collected = hotel._collect_hotels_json(driver, "https://hotels.example/list", max_hotels=12)
+    assert [h["酒店名称"] for h in collected] == [f"北京王府井样例酒店{i:03d}" for i in range(1, 13)]
+    assert driver.scrolls == 1  # 第一页不够时滚动一次触发下一页
+
+
+def test_fixture_server_pages_hotel_list():
+    server, base_url = start_fixture_server(count=PAGE_SIZE + 5, latency=0)
+    try:
+        with urllib.request.urlopen(f"{base_url}/restapi/soa2/fetchHotelList?page=1", timeout=5) as response:
+            body = json.loads(response.read().decode("utf-8"))
+        with urllib.request.urlopen(f"{base_url}/hotels/list", timeout=5) as response:
+            page = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+    assert len(parse_hotel_list_payload(body)) == 5
+    assert body["data"]["hasMore"] is False
+    assert "hotel-card" in page and "fetchHotelList" in page
@@ -0,0 +1,110 @@
+"""tools.hotel 后台酒店预搜索：相同条件共用一个任务（引用计数），最后一个使用者取消或等待超时时才真正取消"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools import hotel, singleflight
+from tools.kv_store import SQLiteTTLStore
+
+SEARCH = ("王府井", "2026/11/01", "2026/11/03", 1, 2, 0)
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    """独立的后台任务表和线程池；假的抓取函数在 release 置位或被取消前一直等待"""
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(hotel, "_prefetches", {})
+    monkeypatch.setattr(hotel, "_prefetch_executor", executor)
+    state = {"calls": 0, "started": threading.Event(), "release": threading.Event(), "cancelled": threading.Event()}
+
+    def scrape(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5, cancel_event=None):
+        state["calls"] += 1
+        state["started"].set()
+        while not state["release"].wait(0.01):
+            if cancel_event is not None and cancel_event.is_set():
+                state["cancelled"].set()
+                raise hotel.HotelSearchCancelled("酒店搜索已取消")
+        return [{"酒店名称": "王府井酒店", "评分": "4.8", "房型": "大床房", "价格": "¥800"}]
+
+    monkeypatch.setattr(hotel, "ctrip_hotel_scraper", scrape)
+    yield state
+    state["release"].set()
+    executor.shutdown(wait=True)
+
+
+def test_same_search_shares_one_task(scraper):
+    first = hotel.start_hotel_search(*SEARCH)
+    second = hotel.start_hotel_search(*SEARCH)
+    assert first == second == hotel.hotel_search_key(*SEARCH)
+    scraper["release"].set()
+    assert hotel.await_hotel_search(first)[0]["酒店名称"] == "王府井酒店"
+    assert hotel.await_hotel_search(second)[0]["酒店名称"] == "王府井酒店"
+    assert scraper["calls"] == 1
+    assert hotel.await_hotel_search(first) is None  # 引用已全部释放
+
+
+def test_cancel_waits_for_the_last_user(scraper):
+    key = hotel.start_hotel_search(*SEARCH)
+    hotel.start_hotel_search(*SEARCH)
+    scraper["started"].wait(5)
+
+    hotel.cancel_hotel_search(key)
+    assert not scraper["cancelled"].wait(0.1)  # 另一个使用者仍在等待结果
+    hotel.cancel_hotel_search(key)
+    assert scraper["cancelled"].wait(5)
+    assert hotel.await_hotel_search(key) is None
+
+
+def test_unknown_key_is_ignored(scraper):
+    assert hotel.await_hotel_search("不存在的搜索") is None
+    hotel.cancel_hotel_search("不存在的搜索")
+    assert scraper["calls"] == 0
+
+
+def test_await_times_out_and_cancels(scraper):
+    key = hotel.start_hotel_search(*SEARCH)
+    scraper["started"].wait(5)
+    assert hotel.await_hotel_search(key, timeout=0.05) is None
+    assert scraper["cancelled"].wait(5)
+
+
+def test_joined_search_retries_when_the_prefetch_is_cancelled(tmp_path, monkeypatch):
+    """合并到后台预搜索上的会话在预搜索被取消时重新抓取，而不是随之失败"""
+    monkeypatch.setattr(hotel, "_hotel_store", SQLiteTTLStore(str(tmp_path / "hotels.sqlite3"), table="hotels"))
+    calls, started = [], threading.Event()
+
+    def scrape(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5, cancel_event=None):
+        calls.append(cancel_event)
+        started.set()
+        while cancel_event is not None and not cancel_event.wait(0.01):
+            pass
+        if cancel_event is not None:
+            raise hotel.HotelSearchCancelled("酒店搜索已取消")
+        return [{"酒店名称": "王府井酒店", "评分": "4.8", "房型": "大床房", "价格": "¥800"}]
+
+    monkeypatch.setattr(hotel, "_scrape_ctrip_hotels", scrape)
+    prefetch_cancel, results = threading.Event(), {}
+
+    def run(name, cancel_event):
+        try:
+            results[name] = hotel.ctrip_hotel_scraper(*SEARCH, cancel_event=cancel_event)
+        except hotel.HotelSearchCancelled as e:
+            results[name] = e
+
+    coalesced = singleflight.default_group.stats()["coalesced"]
+    prefetch = threading.Thread(target=run, args=("prefetch", prefetch_cancel))
+    prefetch.start()
+    started.wait(5)
+    session = threading.Thread(target=run, args=("session", None))
+    session.start()
+    while singleflight.default_group.stats()["coalesced"] == coalesced:
+        threading.Event().wait(0.01)
+
+    prefetch_cancel.set()
+    prefetch.join(5)
+    session.join(5)
+    assert isinstance(results["prefetch"], hotel.HotelSearchCancelled)
+    assert results["session"][0]["酒店名称"] == "王府井酒店"
+    assert calls == [prefetch_cancel, None]
@@ -0,0 +1,65 @@
+"""tools.hotel_records：金额解析与价格索引"""
+
+import pickle
+
+import pytest
+
+from tools.hotel_records import HotelIndex, HotelRecord, parse_amount
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("¥489.5", 489.5),
+    ("500元/晚", 500.0),
+    ("¥1,299起", 1299.0),
+    (680, 680.0),
+    (0, 0.0),
+    ("价格待定", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+def _hotel(name, price, score="4.5"):
+    return HotelRecord.from_dict({"酒店名称": name, "评分": score, "价格": price})
+
+
+@pytest.fixture
+def index():
+    return HotelIndex([
+        _hotel("贵", "¥900"),
+        _hotel("中", "¥400", "4.2"),
+        _hotel("中高分", "¥400", "4.8"),
+        _hotel("便宜", "¥200"),
+        _hotel("无价格", "暂无报价"),
+    ])
+
+
+def test_cheaper_than_is_strict_and_sorted(index):
+    assert [r.name for r in index.cheaper_than(400)] == ["便宜"]
+    assert [r.name for r in index.cheaper_than(400.01)] == ["便宜", "中高分", "中"]
+
+
+def test_cheaper_than_skips_excluded_and_unpriced(index):
+    assert [r.name for r in index.cheaper_than(10000, excluded={"中"})] == ["便宜", "中高分", "贵"]
+    assert index.cheaper_than(100) == []
+
+
+def test_cheapest_and_mapping_access(index):
+    assert index.cheapest().name == "便宜"
+    assert index.cheapest(excluded=["便宜"]).name == "中高分"
+    record = index.cheapest()
+    assert record["酒店名称"] == "便宜"
+    assert record.get("价格数值") == 200.0
+
+
+def test_record_survives_pickling():
+    """记录会随 state 进入检查点，序列化往返后字段与映射访问不变"""
+    record = HotelRecord.from_dict({"酒店名称": "王府井酒店", "评分": "4.8", "房型": "大床房", "价格": "¥800",
+                                    "lat": 39.91, "lng": 116.41, "过期数据": True})
+    restored = pickle.loads(pickle.dumps(record))
+    assert (restored.name, restored.score, restored.price) == ("王府井酒店", 4.8, 800.0)
+    assert (restored.lat, restored.lng) == (39.91, 116.41)
+    assert restored["过期数据"] is True
+    assert restored.to_dict() == record.to_dict()
@@ -0,0 +1,69 @@
+"""src.hotel_scoring：批量往返耗时与按位置/价格/评分的综合排序"""
+
+import numpy as np
+import pytest
+
+from config import config
+from src.hotel_scoring import _day_endpoints, _poi_lng_lat, daily_travel_matrix, leg_minutes, rank_hotels
+from tools.hotel_records import HotelRecord
+
+DAILY_ITINERARY = [
+    {"pois": [
+        {"name": "故宫", "location": {"lat": 39.916, "lng": 116.397}, "nearby_subway": "天安门东站"},
+        {"name": "景山公园", "location": {"lat": 39.925, "lng": 116.396}},
+    ]},
+    {"pois": [
+        {"name": "天坛", "location": {"lat": 39.882, "lng": 116.407}, "nearby_subway": "天坛东门站"},
+    ]},
+    {"pois": []},
+    {"pois": [
+        {"name": "北京环球度假区", "location": {"lat": 39.853, "lng": 116.676}},
+        {"name": "大运河森林公园", "location": {"lat": 39.877, "lng": 116.712}},
+    ]},
+]
+
+
+def _hotel(name, price, score, lat=None, lng=None):
+    return HotelRecord.from_dict({"酒店名称": name, "价格": price, "评分": score, "lat": lat, "lng": lng})
+
+
+def test_matrix_matches_pairwise_estimates():
+    hotel_coords = [(116.4108, 39.9149), None, (116.2, 40.2), (116.398, 39.917)]
+    endpoints = _day_endpoints(DAILY_ITINERARY)
+    travel = daily_travel_matrix(hotel_coords, endpoints)
+    assert travel.shape == (4, 4)
+
+    for i, hotel in enumerate(hotel_coords):
+        for day, pois in enumerate(endpoints):
+            if hotel is None or pois is None:
+                assert np.isnan(travel[i, day])
+                continue
+            first, last = pois
+            expected = (leg_minutes(hotel, _poi_lng_lat(first), None, first.get("nearby_subway"))
+                        + leg_minutes(_poi_lng_lat(last), hotel, last.get("nearby_subway"), None))
+            assert travel[i, day] == pytest.approx(expected, abs=0.1)
+
+
+def test_well_located_hotel_outranks_cheaper_distant_one(monkeypatch):
+    monkeypatch.setattr(config, "HOTEL_SCORE_LOCATION_WEIGHT", 0.5)
+    monkeypatch.setattr(config, "HOTEL_SCORE_PRICE_WEIGHT", 0.2)
+    monkeypatch.setattr(config, "HOTEL_SCORE_RATING_WEIGHT", 0.3)
+    itinerary = DAILY_ITINERARY[:2]
+    hotels = [
+        _hotel("昌平酒店", "¥200", "4.5", lat=40.2, lng=116.2),
+        _hotel("王府井酒店", "¥600", "4.5", lat=39.9149, lng=116.4108),
+    ]
+    ranking = rank_hotels(hotels, itinerary)
+    assert [item["hotel"]["酒店名称"] for item in ranking] == ["王府井酒店", "昌平酒店"]
+    best, distant = ranking
+    assert best["avg_daily_minutes"] < distant["avg_daily_minutes"]
+    assert best["price_score"] < distant["price_score"]
+
+
+def test_hotel_without_coordinates_gets_neutral_location_score():
+    hotels = [_hotel("王府井酒店", "¥600", "4.5", lat=39.9149, lng=116.4108), _hotel("无坐标酒店", "¥300", "4.5")]
+    ranking = {item["hotel"]["酒店名称"]: item for item in rank_hotels(hotels, DAILY_ITINERARY)}
+    assert ranking["无坐标酒店"]["location_score"] == 0.5
+    assert ranking["无坐标酒店"]["daily_minutes"] is None
+    assert len(ranking["王府井酒店"]["daily_minutes"]) == 3  # 没有景点的一天不计入
+
@@ -0,0 +1,69 @@
+"""tools.hotel._collect_hotels：事件驱动的增量滚动采集（使用模拟列表页的假 webdriver）"""
+
+import pytest
+
+from tools import hotel
+
+
+class FakeListPage:
+    """每次滚动到底追加一页卡片，直到 pages 用完；记录每次读取的起始位置"""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.cards = []
+        self.reads = []
+        self.scrolls = 0
+        self.resources = 0
+
+    def get(self, url):
+        self.cards.extend(self.pages.pop(0))
+
+    def find_elements(self, by, selector):
+        return [object()] * len(self.cards)
+
+    def execute_script(self, script, *args):
+        if script == hotel.READ_NEW_CARDS_JS:
+            self.reads.append(args[0])
+            return [len(self.cards), [list(card) for card in self.cards[args[0]:]]]
+        if script == hotel.SCROLL_TO_LAST_CARD_JS:
+            self.scrolls += 1
+            if self.pages:
+                self.cards.extend(self.pages.pop(0))
+                self.resources += 1
+            return None
+        if script == hotel.CARD_AND_RESOURCE_COUNT_JS:
+            return [len(self.cards), self.resources]
+        raise AssertionError(f"未预期的脚本: {script}")
+
+
+def _cards(start, count):
+    return [(f"酒店{i}", "4.6", "大床房", f"¥{300 + i}") for i in range(start, start + count)]
+
+
+@pytest.fixture(autouse=True)
+def fast_idle(monkeypatch):
+    monkeypatch.setattr(hotel, "NETWORK_IDLE_SECONDS", 0.05)
+    monkeypatch.setattr(hotel, "SCROLL_POLL_SECONDS", 0.01)
+
+
+def test_reads_only_new_cards_each_round():
+    page = FakeListPage([_cards(0, 4), _cards(4, 4), _cards(8, 4)])
+    hotels = hotel._collect_hotels(page, "https://hotels.example/list", max_hotels=10)
+    assert [h["酒店名称"] for h in hotels] == [f"酒店{i}" for i in range(10)]
+    assert page.reads == [0, 4, 8]
+    assert page.scrolls == 2  # 凑够数量后不再滚动
+
+
+def test_stops_when_list_no_longer_grows():
+    page = FakeListPage([_cards(0, 3)])
+    hotels = hotel._collect_hotels(page, "https://hotels.example/list", max_hotels=10)
+    assert len(hotels) == 3
+    assert page.scrolls == 1
+
+
+def test_skips_incomplete_and_duplicate_cards():
+    first = _cards(0, 2) + [("无价格酒店", "4.0", "双床房", None)]
+    page = FakeListPage([first, _cards(1, 3)])
+    hotels = hotel._collect_hotels(page, "https://hotels.example/list", max_hotels=10)
+    assert [h["酒店名称"] for h in hotels] == ["酒店0", "酒店1", "酒店2", "酒店3"]
+    assert hotels[0]["价格"] == "¥300"
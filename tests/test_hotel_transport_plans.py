@@ -0,0 +1,105 @@
+"""src.workflow._plan_hotels_concurrently：多酒店并发交通规划的确定性与共用路段的统一查询"""
+
+import threading
+import time
+
+import pytest
+
+from config import config
+from src import workflow
+from tools import routeinf
+from tools.hotel_records import HotelRecord
+from tools.subway_estimator import estimate_route_info
+
+DAILY_CANDIDATES = [
+    {"date": "2026-11-01", "pois": [
+        {"name": "故宫", "location": {"lat": 39.916, "lng": 116.397}, "nearby_subway": "天安门东站"},
+        {"name": "景山公园", "location": {"lat": 39.925, "lng": 116.396}},
+        {"name": "北海公园", "location": {"lat": 39.926, "lng": 116.383}},
+    ]},
+    {"date": "2026-11-02", "pois": [
+        {"name": "天坛", "location": {"lat": 39.882, "lng": 116.407}, "nearby_subway": "天坛东门站"},
+        {"name": "前门大街", "location": {"lat": 39.896, "lng": 116.398}},
+    ]},
+]
+HOTELS = [
+    HotelRecord.from_dict({"酒店名称": "王府井酒店", "价格": "¥900", "lat": 39.9149, "lng": 116.4108}),
+    HotelRecord.from_dict({"酒店名称": "西单酒店", "价格": "¥600", "lat": 39.9105, "lng": 116.374}),
+    HotelRecord.from_dict({"酒店名称": "国贸酒店", "价格": "¥800", "lat": 39.9087, "lng": 116.46}),
+]
+SHARED_LEGS = 3  # 故宫→景山公园→北海公园、天坛→前门大街
+
+
+@pytest.fixture
+def route_backend(monkeypatch):
+    """按路段返回确定结果的 get_routes_concurrently；delays[酒店坐标] 控制各线程的完成先后"""
+    monkeypatch.setattr(config, "ROUTE_PRECISION_ON_DEMAND", False)
+    monkeypatch.setattr(config, "TRANSPORT_PLAN_WORKERS", 3)
+    queried, delays, lock = [], {}, threading.Lock()
+
+    def get_routes_concurrently(api_key, legs):
+        for leg in legs:
+            time.sleep(max(delays.get(leg["origin"], 0), delays.get(leg["destination"], 0)))
+        with lock:
+            queried.extend(workflow._leg_key(leg) for leg in legs)
+        return [estimate_route_info(leg["origin"], leg["destination"], leg["origin_name"], leg["destination_name"],
+                                    leg.get("origin_station"), leg.get("destination_station")) for leg in legs]
+
+    monkeypatch.setattr(routeinf, "get_routes_concurrently", get_routes_concurrently)
+    return queried, delays
+
+
+def _state():
+    state = workflow.init_state("北京两日游")
+    state.update({"daily_candidates": DAILY_CANDIDATES, "hotel_search_results": HOTELS})
+    return state
+
+
+def _plan(delays, slow_first):
+    delays.clear()
+    for i, hotel in enumerate(HOTELS):
+        position = i if slow_first else len(HOTELS) - 1 - i
+        delays[(hotel.lng, hotel.lat)] = 0.02 * (len(HOTELS) - position)
+    leg_table = {}
+    plans = workflow._plan_hotels_concurrently(_state(), HOTELS, "key", leg_table)
+    return plans, leg_table
+
+
+def _summary(plans):
+    return {
+        name: [plans[name][strategy] for strategy in ("time_optimized", "cost_optimized", "comfort_optimized")]
+        for name in plans
+    }
+
+
+def test_plans_do_not_depend_on_worker_order(route_backend):
+    _, delays = route_backend
+    forward, forward_legs = _plan(delays, slow_first=True)
+    backward, backward_legs = _plan(delays, slow_first=False)
+    assert list(forward) == list(backward) == [hotel.name for hotel in HOTELS]
+    assert _summary(forward) == _summary(backward)
+    assert forward_legs == backward_legs
+
+
+def test_shared_legs_are_queried_once(route_backend):
+    queried, delays = route_backend
+    plans, leg_table = _plan(delays, slow_first=True)
+    assert len(plans) == len(HOTELS)
+    assert len(queried) == len(set(queried)) == len(leg_table)
+    # 每家酒店每天往返2条 + 景点间共用路段
+    assert len(queried) == len(HOTELS) * 2 * len(DAILY_CANDIDATES) + SHARED_LEGS
+    for name, hotel_plans in plans.items():
+        assert hotel_plans["route_stats"]["live_calls"] == 2 * len(DAILY_CANDIDATES)
+
+
+def test_failed_hotel_is_skipped(route_backend, monkeypatch):
+    original = workflow._hotel_transport_plans
+
+    def flaky(state, hotel, api_key, leg_table):
+        if hotel.name == "西单酒店":
+            raise RuntimeError("规划失败")
+        return original(state, hotel, api_key, leg_table)
+
+    monkeypatch.setattr(workflow, "_hotel_transport_plans", flaky)
+    plans = workflow._plan_hotels_concurrently(_state(), HOTELS, "key", {})
+    assert list(plans) == ["王府井酒店", "国贸酒店"]
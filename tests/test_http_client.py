@@ -0,0 +1,82 @@
+"""tools.http_client._send：重试与熔断统计（一次调用只向熔断器记录一个结果）"""
+
+import pytest
+import requests
+
+from tools import http_client
+from tools.circuit_breaker import CLOSED, CircuitBreaker
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.headers = {}
+        self._payload = payload if payload is not None else {"status": "1"}
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """按顺序返回预设结果（异常实例会被抛出）"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    # 与携程相同的低门槛：窗口内2次调用即可判断熔断
+    breaker = CircuitBreaker("test", min_calls=2, failure_rate=0.5, open_seconds=300)
+    monkeypatch.setattr(http_client, "get_breaker", lambda provider: breaker)
+    monkeypatch.setattr(http_client.time, "sleep", lambda seconds: None)
+    return breaker
+
+
+def _use_session(monkeypatch, outcomes):
+    session = FakeSession(outcomes)
+    monkeypatch.setattr(http_client, "get_session", lambda: session)
+    return session
+
+
+def test_retried_then_failed_call_counts_as_one_failure(monkeypatch, breaker):
+    session = _use_session(monkeypatch, [requests.ConnectionError("reset")] * 4)
+    with pytest.raises(requests.ConnectionError):
+        http_client.get_json("test", "http://example.invalid", max_retries=3)
+    assert session.calls == 4
+    snapshot = breaker.snapshot()
+    assert (snapshot["window_calls"], snapshot["window_failures"]) == (1, 1)
+    assert breaker.state == CLOSED
+
+
+def test_retried_then_successful_call_counts_as_one_success(monkeypatch, breaker):
+    session = _use_session(monkeypatch, [FakeResponse(503), FakeResponse(502), FakeResponse(200)])
+    assert http_client.get_json("test", "http://example.invalid", max_retries=3) == {"status": "1"}
+    assert session.calls == 3
+    snapshot = breaker.snapshot()
+    assert (snapshot["window_calls"], snapshot["window_failures"]) == (1, 0)
+
+
+def test_exhausted_5xx_counts_as_one_failure(monkeypatch, breaker):
+    _use_session(monkeypatch, [FakeResponse(500)] * 3)
+    response = http_client.request_get("test", "http://example.invalid", max_retries=2)
+    assert response.status_code == 500
+    assert breaker.snapshot()["window_failures"] == 1
+
+
+def test_throttled_payload_shares_retry_budget(monkeypatch, breaker):
+    throttled = FakeResponse(200, {"status": "0", "infocode": "10004"})
+    session = _use_session(monkeypatch, [FakeResponse(503), throttled, throttled, throttled])
+    monkeypatch.setattr(http_client, "get_rate_limiter", lambda provider: None)
+    payload = http_client.get_json("amap", "http://example.invalid", max_retries=3)
+    assert payload["infocode"] == "10004"
+    assert session.calls == 4
+    assert breaker.snapshot()["window_failures"] == 0
@@ -0,0 +1,92 @@
+"""src.workflow.joint_optimization：在桩酒店列表上的 酒店×交通方案 选择（无高德密钥，使用离线估算）"""
+
+import pytest
+
+from src import workflow
+from tools.hotel_records import HotelIndex, HotelRecord
+
+# 门票 (60 + 500) × 2人 = 1120元，住2晚
+DAILY_CANDIDATES = [
+    {"date": "2026-11-01", "pois": [
+        {"name": "故宫", "location": {"lat": 39.916, "lng": 116.397}, "suggested_duration_hours": 4, "ticket_price": 60},
+    ]},
+    {"date": "2026-11-02", "pois": [
+        {"name": "北京环球度假区", "location": {"lat": 39.853, "lng": 116.676}, "suggested_duration_hours": 6,
+         "ticket_price": 500},
+    ]},
+]
+
+
+def _hotels():
+    """按综合得分排序后的候选酒店"""
+    return [
+        HotelRecord.from_dict({"酒店名称": "王府井酒店", "评分": "4.9", "价格": "¥900", "lat": 39.9149, "lng": 116.4108}),
+        HotelRecord.from_dict({"酒店名称": "通州酒店", "评分": "4.5", "价格": "¥400", "lat": 39.855, "lng": 116.68}),
+        HotelRecord.from_dict({"酒店名称": "昌平酒店", "评分": "4.0", "价格": "¥200", "lat": 40.2, "lng": 116.2}),
+    ]
+
+
+def _state(budget, daily_time_limit=12):
+    hotels = _hotels()
+    state = workflow.init_state("北京两日游")
+    state.update({
+        "structured_info": {
+            "start_date": "2026-11-01", "end_date": "2026-11-03",
+            "group": {"adults": 2, "children": 0, "elderly": 0},
+            "budget": {"total": budget},
+        },
+        "daily_candidates": DAILY_CANDIDATES,
+        "selected_hotels": [hotels[0]],
+        "hotel_search_results": hotels,
+        "hotel_index": HotelIndex(hotels),
+        "room_requirements": 1,
+        "daily_time_limit": daily_time_limit,
+    })
+    return state
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.delenv("GAODE_API_KEY", raising=False)
+
+
+def _selected(state):
+    return state["selected_hotels"][0]["酒店名称"]
+
+
+def test_picks_best_ranked_hotel_when_everything_fits():
+    state = workflow.joint_optimization(_state(budget=5000))
+    assert _selected(state) == "王府井酒店"
+    assert state["budget_satisfied"] is True
+    cells = [cell for cell in state["joint_optimization_result"] if cell["hotel"] == "王府井酒店"]
+    assert state["recommended_plan"]["total_cost"] == min(cell["total_cost"] for cell in cells)
+    assert state["hotel_optimization_attempts"] == 1
+
+
+def test_prunes_hotels_whose_room_cost_exceeds_budget():
+    # 每晚价格上限 (2500 - 1120) / 2 = 690元，王府井酒店不参与评估
+    state = workflow.joint_optimization(_state(budget=2500))
+    evaluated = {cell["hotel"] for cell in state["joint_optimization_result"]}
+    assert evaluated == {"通州酒店", "昌平酒店"}
+    assert _selected(state) == "通州酒店"
+    assert state["budget_satisfied"] is True
+
+
+def test_falls_back_to_cheapest_feasible_combination_over_budget():
+    state = workflow.joint_optimization(_state(budget=1500))
+    result = state["joint_optimization_result"]
+    assert {cell["hotel"] for cell in result} == {"王府井酒店", "通州酒店", "昌平酒店"}
+    cheapest = min((cell for cell in result if cell["feasible"]), key=lambda cell: cell["total_cost"])
+    assert _selected(state) == cheapest["hotel"] == "昌平酒店"
+    assert state["budget_satisfied"] is False
+    assert state["hotel_selection_history"][-1]["selection_reason"] == "联合优化：超出预算最少的组合"
+
+
+def test_skips_combinations_over_daily_time_limit():
+    state = workflow.joint_optimization(_state(budget=1500, daily_time_limit=7))
+    chosen = _selected(state)
+    cells = [cell for cell in state["joint_optimization_result"] if cell["hotel"] == chosen]
+    assert any(cell["feasible"] for cell in cells)
+    assert all(cell["max_daily_hours"] > 7 for cell in state["joint_optimization_result"]
+               if cell["hotel"] == "昌平酒店")
+    assert chosen != "昌平酒店"
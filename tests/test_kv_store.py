@@ -0,0 +1,59 @@
+"""tools.kv_store.SQLiteTTLStore：TTL过期与LRU淘汰"""
+
+import pytest
+
+from tools import kv_store
+from tools.kv_store import SQLiteTTLStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = {"now": 1000.0}
+    monkeypatch.setattr(kv_store.time, "time", lambda: state["now"])
+    return state
+
+
+def test_values_round_trip_including_negative_cache(tmp_path):
+    store = SQLiteTTLStore(str(tmp_path / "kv.sqlite3"))
+    store.set_many({"a": [116.4, 39.9], "missing": None}, ttl=60)
+    assert store.get("a") == (True, [116.4, 39.9])
+    assert store.get("missing") == (True, None)
+    assert store.get("unknown") == (False, None)
+
+
+def test_expired_entries_are_misses_and_purged(tmp_path, clock):
+    store = SQLiteTTLStore(str(tmp_path / "kv.sqlite3"))
+    store.set("short", 1, ttl=10)
+    store.set("long", 2, ttl=100)
+    clock["now"] += 10
+    assert store.get_many(["short", "long"]) == {"long": 2}
+    assert store.purge_expired() == 1
+    assert len(store) == 1
+
+
+def test_evicts_least_recently_used_over_capacity(tmp_path, clock):
+    store = SQLiteTTLStore(str(tmp_path / "kv.sqlite3"), max_entries=2)
+    store.set("a", 1, ttl=100)
+    clock["now"] += 1
+    store.set("b", 2, ttl=100)
+    clock["now"] += 1
+    store.get("a")  # 刷新a的访问时间，b成为最久未访问
+    clock["now"] += 1
+    store.set("c", 3, ttl=100)
+    assert len(store) == 2
+    assert store.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_eviction_drops_expired_entries_first(tmp_path, clock):
+    store = SQLiteTTLStore(str(tmp_path / "kv.sqlite3"), max_entries=2)
+    store.set("old", 1, ttl=100)
+    clock["now"] += 1
+    store.set("expiring", 2, ttl=1)
+    clock["now"] += 5
+    store.set("new", 3, ttl=100)
+    assert store.get_many(["old", "expiring", "new"]) == {"old": 1, "new": 3}
+
+
+def test_rejects_invalid_table_name(tmp_path):
+    with pytest.raises(ValueError):
+        SQLiteTTLStore(str(tmp_path / "kv.sqlite3"), table="kv; DROP TABLE x")
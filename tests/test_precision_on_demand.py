@@ -0,0 +1,88 @@
+"""src.workflow._select_live_legs：只有离线估算上下界跨越决策阈值的路段才实时查询"""
+
+import pytest
+
+from config import config
+from src import workflow
+from tools import routeinf
+
+HOTEL = (116.4108, 39.9149)
+GUGONG = (116.397, 39.916)
+TIANTAN = (116.407, 39.882)
+
+# 时间、费用都明确分出高下：公共交通慢而便宜，出租车快而贵
+CLEAR = {"公共交通最短时间": 60.0, "公共交通费用": "3元", "出租车最短时间": 20.0, "出租车费用": "40元"}
+# 两种方式的时间相近，放宽上下界后区间重叠
+CLOSE = {"公共交通最短时间": 22.0, "公共交通费用": "3元", "出租车最短时间": 20.0, "出租车费用": "40元"}
+
+
+def _leg(origin, destination):
+    return {"origin": origin, "destination": destination, "origin_name": "起点", "destination_name": "终点"}
+
+
+LEGS = [_leg(HOTEL, GUGONG), _leg(GUGONG, TIANTAN), _leg(TIANTAN, HOTEL)]
+KEYS = [workflow._leg_key(leg) for leg in LEGS]
+
+
+@pytest.fixture
+def estimates(monkeypatch):
+    """按路段键指定离线估算结果，默认均为 CLEAR"""
+    monkeypatch.setattr(config, "ROUTE_BOUND_LOW", 0.8)
+    monkeypatch.setattr(config, "ROUTE_BOUND_HIGH", 1.25)
+    table = {}
+    monkeypatch.setattr(workflow, "_estimate_leg", lambda leg, endpoints=None: dict(table.get(workflow._leg_key(leg), CLEAR)))
+    return table
+
+
+def _context(poi_hours=4.0, limit=12, budget=10000, people=2):
+    return {"poi_hours": [poi_hours], "daily_time_limit": limit, "transport_budget": budget, "people": people}
+
+
+def _select(context, leg_table=None):
+    pending = dict(zip(KEYS, LEGS))
+    return workflow._select_live_legs(pending, [LEGS], leg_table or {}, context)
+
+
+def test_clear_legs_use_estimates(estimates):
+    live, estimated = _select(_context())
+    assert live == set()
+    assert set(estimated) == set(KEYS)
+
+
+def test_overlapping_modes_are_queried(estimates):
+    estimates[KEYS[1]] = CLOSE
+    live, estimated = _select(_context())
+    assert live == {KEYS[1]}
+    assert set(estimated) == {KEYS[0], KEYS[2]}
+
+
+def test_day_straddling_time_limit_is_queried(estimates):
+    # 景点9小时 + 交通 1～2小时（出租车 3×20分钟 放宽到 48～75分钟），上限10小时落在区间内
+    live, _ = _select(_context(poi_hours=9, limit=10))
+    assert live == set(KEYS)
+
+
+def test_budget_straddling_transport_cost_is_queried(estimates):
+    # 舒适方案出租车 3×40元 放宽到 96～150元
+    live, _ = _select(_context(budget=120))
+    assert live == set(KEYS)
+    live, _ = _select(_context(budget=200))
+    assert live == set()
+
+
+def test_known_legs_count_towards_day_bounds(estimates):
+    # 已查询的路段按精确值计入当天时长：景点8小时 + 已知路段55分钟 + 两条估算路段32～50分钟，跨越9.6小时上限
+    pending = dict(zip(KEYS[:2], LEGS[:2]))
+    leg_table = {KEYS[2]: {"公共交通最短时间": 90.0, "公共交通费用": "5元", "出租车最短时间": 55.0, "出租车费用": "90元"}}
+    live, _ = workflow._select_live_legs(pending, [LEGS], leg_table, _context(poi_hours=8, limit=9.6))
+    assert live == set(KEYS[:2])
+
+
+def test_legs_without_coordinates_are_queried(estimates, monkeypatch):
+    monkeypatch.setattr(routeinf, "cached_coordinates", lambda place: routeinf.as_coordinates(place))
+    hotel_leg = _leg("北京市未编码酒店", GUGONG)
+    pending = {workflow._leg_key(hotel_leg): hotel_leg, KEYS[1]: LEGS[1]}
+    live, estimated = workflow._select_live_legs(pending, [[hotel_leg, LEGS[1]]], {}, _context())
+    # 酒店没有坐标时不按默认位置猜测，该路段上下界完全未知，当天时长和预算结论都无法确定
+    assert live == set(pending)
+    assert estimated == {}
@@ -0,0 +1,73 @@
+"""tools.http_client.RateLimiter：令牌桶限速"""
+
+import threading
+import time
+
+from tools import http_client
+from tools.http_client import RateLimiter
+
+
+class FakeClock:
+    """可手动推进的 time.monotonic / time.sleep"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _use_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(http_client.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_is_served_without_waiting(monkeypatch):
+    clock = _use_clock(monkeypatch)
+    limiter = RateLimiter(2, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+
+def test_waits_for_next_token_when_bucket_is_empty(monkeypatch):
+    clock = _use_clock(monkeypatch)
+    limiter = RateLimiter(4)
+    for _ in range(4):
+        limiter.acquire()
+    limiter.acquire()
+    assert sum(clock.sleeps) == 0.25
+    assert clock.now == 0.25
+
+
+def test_tokens_refill_over_time_up_to_capacity(monkeypatch):
+    clock = _use_clock(monkeypatch)
+    limiter = RateLimiter(1, burst=2)
+    limiter.acquire()
+    limiter.acquire()
+    clock.now += 100  # 长时间空闲也只能攒满容量
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert sum(clock.sleeps) == 1.0
+
+
+def test_limits_concurrent_callers_to_rate():
+    limiter = RateLimiter(20, burst=1)
+    limiter.acquire()  # 清空初始令牌
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 6个令牌按每秒20个发放，至少需要约0.3秒
+    assert time.monotonic() - start >= 0.25
@@ -0,0 +1,76 @@
+"""tools.routeinf 路线缓存：按对齐后的起终点坐标 + 出行方式索引，只缓存高德正常返回的结果"""
+
+import pytest
+
+from config import config
+from tools import routeinf
+from tools.kv_store import SQLiteTTLStore
+
+ORIGIN, DESTINATION = (116.3974, 39.9158), (116.4071, 39.8822)
+
+
+@pytest.fixture
+def amap(tmp_path, monkeypatch):
+    """独立的路线缓存 + 记录请求的高德路线接口；responses[mode] 可替换返回结果"""
+    monkeypatch.setattr(routeinf, "_route_store", SQLiteTTLStore(str(tmp_path / "routes.sqlite3"), table="routes"))
+    monkeypatch.setattr(config, "ROUTE_CACHE_SNAP_DECIMALS", 3)
+    monkeypatch.setattr(config, "ROUTE_CACHE_REUSE_REVERSE", False)
+    state = {"requests": [], "responses": {
+        "transit": {"status": "1", "route": {"transits": [{"duration": "1500", "cost": "4"}]}},
+        "driving": {"status": "1", "route": {"paths": [{"duration": "900"}], "taxi_cost": "30"}},
+    }}
+
+    def get_json(provider, url, params=None, **kwargs):
+        mode = "transit" if "transit" in url else "driving"
+        state["requests"].append((mode, params["origin"], params["destination"]))
+        return state["responses"][mode]
+
+    monkeypatch.setattr(routeinf, "get_json", get_json)
+    return state
+
+
+def test_nearby_endpoints_share_cached_routes(amap):
+    first = routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    assert len(amap["requests"]) == 2
+    # 3位小数对齐（约100米），附近的点命中同一条缓存
+    again = routeinf.get_route_info("key", (116.3971, 39.9161), (116.4068, 39.8819))
+    assert len(amap["requests"]) == 2
+    assert (again["公共交通最短时间"], again["出租车费用"]) == (first["公共交通最短时间"], first["出租车费用"]) == (25.0, "30元")
+
+
+def test_cache_key_snaps_coordinates_and_includes_mode():
+    assert routeinf._route_cache_key("transit", ORIGIN, DESTINATION) == "transit:116.397,39.916>116.407,39.882"
+    assert routeinf._route_cache_key("driving", ORIGIN, DESTINATION).startswith("driving:")
+
+
+def test_failed_queries_are_not_cached(amap):
+    amap["responses"]["transit"] = {"status": "0", "info": "CUQPS_HAS_EXCEEDED_THE_LIMIT"}
+    result = routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    assert result["公共交通最短时间"] is None and result["出租车最短时间"] == 15.0
+
+    amap["requests"].clear()
+    amap["responses"]["transit"] = {"status": "1", "route": {"transits": [{"duration": "1500", "cost": "4"}]}}
+    assert routeinf.get_route_info("key", ORIGIN, DESTINATION)["公共交通最短时间"] == 25.0
+    assert [mode for mode, _, _ in amap["requests"]] == ["transit"]
+
+
+def test_no_route_answers_are_cached(amap):
+    amap["responses"]["transit"] = {"status": "1", "route": {"transits": []}}
+    assert routeinf.get_route_info("key", ORIGIN, DESTINATION)["公共交通最短时间"] is None
+    amap["requests"].clear()
+    assert routeinf.get_route_info("key", ORIGIN, DESTINATION)["公共交通费用"] is None
+    assert amap["requests"] == []
+
+
+def test_reverse_direction_reuse_is_opt_in(amap, monkeypatch, tmp_path):
+    routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    amap["requests"].clear()
+    routeinf.get_route_info("key", DESTINATION, ORIGIN)
+    assert len(amap["requests"]) == 2
+
+    monkeypatch.setattr(routeinf, "_route_store", SQLiteTTLStore(str(tmp_path / "reverse.sqlite3"), table="routes"))
+    monkeypatch.setattr(config, "ROUTE_CACHE_REUSE_REVERSE", True)
+    routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    amap["requests"].clear()
+    routeinf.get_route_info("key", DESTINATION, ORIGIN)
+    assert amap["requests"] == []
@@ -0,0 +1,62 @@
+"""tools.routeinf.get_routes_concurrently：并发查询多条路段，结果顺序与输入一致，失败的路段返回异常对象"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from tools import routeinf
+from tools.kv_store import SQLiteTTLStore
+
+LEGS = [
+    {"origin": (116.301, 39.901), "destination": (116.311, 39.911), "origin_name": "甲", "destination_name": "乙"},
+    {"origin": (116.321, 39.921), "destination": (116.331, 39.931), "origin_name": "丙", "destination_name": "丁"},
+    {"origin": (116.341, 39.941), "destination": (116.351, 39.951), "origin_name": "戊", "destination_name": "己"},
+]
+
+
+@pytest.fixture
+def amap(tmp_path, monkeypatch):
+    """越靠前的路段返回越慢；记录同时进行中的请求数"""
+    monkeypatch.setattr(routeinf, "_route_store", SQLiteTTLStore(str(tmp_path / "routes.sqlite3"), table="routes"))
+    state = {"in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+    delays = {f"{leg['origin'][0]},{leg['origin'][1]}": 0.05 * (len(LEGS) - i) for i, leg in enumerate(LEGS)}
+
+    def get_json(provider, url, params=None, **kwargs):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(delays.get(params["origin"], 0))
+        with lock:
+            state["in_flight"] -= 1
+        minutes = str(int(float(params["origin"].split(",")[0]) * 1000) % 100 * 60)
+        if "transit" in url:
+            return {"status": "1", "route": {"transits": [{"duration": minutes, "cost": "3"}]}}
+        return {"status": "1", "route": {"paths": [{"duration": minutes}], "taxi_cost": "20"}}
+
+    monkeypatch.setattr(routeinf, "get_json", get_json)
+    monkeypatch.setattr(routeinf, "geocode_addresses", lambda api_key, addresses: {address: None for address in addresses})
+    return state
+
+
+def test_results_keep_input_order(amap):
+    results = routeinf.get_routes_concurrently("key", LEGS)
+    assert [(r["出发地"], r["目的地"]) for r in results] == [("甲", "乙"), ("丙", "丁"), ("戊", "己")]
+    assert [r["公共交通最短时间"] for r in results] == [1.0, 21.0, 41.0]
+    assert amap["peak"] > 2  # 各路段及同一路段的公交/驾车请求同时发出
+
+
+def test_failed_leg_is_returned_as_exception(amap):
+    legs = [LEGS[0], {"origin": "无法编码的地址", "destination": (116.4, 39.9)}, LEGS[2]]
+    results = routeinf.get_routes_concurrently("key", legs)
+    assert isinstance(results[1], ValueError)
+    assert results[0]["出发地"] == "甲" and results[2]["出发地"] == "戊"
+
+
+def test_works_inside_a_running_event_loop(amap):
+    async def caller():
+        return routeinf.get_routes_concurrently("key", LEGS[:1])
+
+    assert asyncio.run(caller())[0]["目的地"] == "乙"
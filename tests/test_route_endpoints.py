@@ -0,0 +1,61 @@
+"""景点路段按景点库坐标查询：坐标端点不再地理编码，只有酒店等地址需要编码"""
+
+import pytest
+
+from src import workflow
+from tools import routeinf
+
+GUGONG = (116.397, 39.916)
+TIANTAN = (116.407, 39.882)
+
+
+@pytest.fixture
+def amap(monkeypatch):
+    """记录地理编码与路线请求的高德接口（测试缓存目录下没有路线矩阵和已拟合的预测模型）"""
+    calls = {"geocode": [], "routes": []}
+
+    def geocode_addresses(api_key, addresses):
+        calls["geocode"].append(list(addresses))
+        return {address: (116.4108, 39.9149) for address in addresses}
+
+    def get_json(provider, url, params=None, **kwargs):
+        mode = "transit" if "transit" in url else "driving"
+        calls["routes"].append((mode, params["origin"], params["destination"]))
+        if mode == "transit":
+            return {"status": "1", "route": {"transits": [{"duration": "1500", "cost": "4"}]}}
+        return {"status": "1", "route": {"paths": [{"duration": "900"}], "taxi_cost": "30"}}
+
+    monkeypatch.setattr(routeinf, "geocode_addresses", geocode_addresses)
+    monkeypatch.setattr(routeinf, "get_json", get_json)
+    return calls
+
+
+@pytest.mark.parametrize("place, expected", [
+    ((116.397, 39.916), GUGONG),
+    ([116.397, 39.916], GUGONG),
+    ("116.397,39.916", GUGONG),
+    ("北京市东城区王府井", None),
+    ("故宫,天坛", None),
+])
+def test_as_coordinates(place, expected):
+    assert routeinf.as_coordinates(place) == expected
+
+
+def test_coordinate_endpoints_skip_geocoding(amap):
+    result = routeinf.get_route_info("key", GUGONG, "116.407,39.882", "故宫", "天坛")
+    assert amap["geocode"] == []
+    assert amap["routes"] == [("transit", "116.397,39.916", "116.407,39.882"), ("driving", "116.397,39.916", "116.407,39.882")]
+    assert result["出发地"] == "故宫" and result["目的地"] == "天坛"
+    assert result["公共交通费用"] == "4元" and result["出租车最短时间"] == 15.0
+
+
+def test_only_address_endpoints_are_geocoded(amap):
+    result = routeinf.get_route_info("key", "北京市王府井酒店", TIANTAN, destination_name="天坛")
+    assert amap["geocode"] == [["北京市王府井酒店"]]
+    assert [origin for _, origin, _ in amap["routes"]] == ["116.4108,39.9149"] * 2
+    assert result["出发地"] == "北京市王府井酒店"
+
+
+def test_poi_route_endpoint_prefers_catalog_coordinates():
+    assert workflow._poi_route_endpoint({"name": "故宫", "location": {"lng": 116.397, "lat": 39.916}}) == GUGONG
+    assert workflow._poi_route_endpoint({"name": "南锣鼓巷", "location": {}}) == "北京市南锣鼓巷"
@@ -0,0 +1,84 @@
+"""tools.routeinf.get_route_info 的查找顺序：预计算路线矩阵 → 预测模型（路线缓存未命中时）→ 路线缓存 / 实时查询"""
+
+import pytest
+
+from config import config
+from tools import routeinf
+from tools.kv_store import SQLiteTTLStore
+
+ORIGIN, DESTINATION = (116.397, 39.916), (116.407, 39.882)
+PREDICTION = {
+    "transit": {"minutes": (28.0, 30.0, 33.0), "cost": (3.0, 4.0, 4.0)},
+    "driving": {"minutes": (14.0, 16.0, 18.0), "cost": (25.0, 28.0, 31.0)},
+}
+
+
+class FakeMatrix:
+    def __init__(self, cells):
+        self.cells = cells
+
+    def lookup(self, origin, destination):
+        return self.cells.get((origin, destination))
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """可控的路线矩阵、预测模型与高德接口，记录各来源的调用"""
+    monkeypatch.setattr(config, "ROUTE_MATRIX_ENABLED", True)
+    monkeypatch.setattr(config, "ROUTE_MODEL_ENABLED", True)
+    monkeypatch.setattr(routeinf, "_route_store", SQLiteTTLStore(str(tmp_path / "routes.sqlite3"), table="routes"))
+    state = {"matrix": FakeMatrix({}), "prediction": PREDICTION, "model_calls": 0, "requests": []}
+
+    def confident_estimate(origin, destination):
+        state["model_calls"] += 1
+        return state["prediction"]
+
+    def get_json(provider, url, params=None, **kwargs):
+        state["requests"].append(url)
+        if "transit" in url:
+            return {"status": "1", "route": {"transits": [{"duration": "2400", "cost": "5"}]}}
+        return {"status": "1", "route": {"paths": [{"duration": "1200"}], "taxi_cost": "35"}}
+
+    monkeypatch.setattr(routeinf, "get_route_matrix", lambda: state["matrix"])
+    monkeypatch.setattr(routeinf, "confident_estimate", confident_estimate)
+    monkeypatch.setattr(routeinf, "get_json", get_json)
+    return state
+
+
+def _times(result):
+    return result["公共交通最短时间"], result["公共交通费用"], result["出租车最短时间"], result["出租车费用"]
+
+
+def test_matrix_hit_wins(sources):
+    sources["matrix"] = FakeMatrix({(ORIGIN, DESTINATION): ((35.0, "4"), (22.0, "33"))})
+    result = routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    assert _times(result) == (35.0, "4元", 22.0, "33元")
+    assert "估算" not in result
+    assert sources["model_calls"] == 0 and sources["requests"] == []
+
+
+def test_confident_prediction_is_used_when_nothing_is_cached(sources):
+    result = routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    assert _times(result) == (30.0, "4元", 16.0, "28元")
+    assert result["估算"] is True
+    assert sources["requests"] == []
+
+
+def test_cached_routes_beat_the_model(sources):
+    sources["prediction"] = None
+    routeinf.get_route_info("key", ORIGIN, DESTINATION)  # 实时查询并写入缓存
+    assert len(sources["requests"]) == 2
+
+    sources["prediction"] = PREDICTION
+    sources["model_calls"] = 0
+    result = routeinf.get_route_info("key", ORIGIN, DESTINATION)
+    assert _times(result) == (40.0, "5元", 20.0, "35元")
+    assert sources["model_calls"] == 0 and len(sources["requests"]) == 2
+
+
+def test_disabled_matrix_and_model_go_live(sources, monkeypatch):
+    sources["matrix"] = FakeMatrix({(ORIGIN, DESTINATION): ((35.0, "4"), (22.0, "33"))})
+    monkeypatch.setattr(config, "ROUTE_MATRIX_ENABLED", False)
+    monkeypatch.setattr(config, "ROUTE_MODEL_ENABLED", False)
+    assert _times(routeinf.get_route_info("key", ORIGIN, DESTINATION)) == (40.0, "5元", 20.0, "35元")
+    assert sources["model_calls"] == 0 and len(sources["requests"]) == 2
@@ -0,0 +1,135 @@
+"""tools.route_matrix：可断点续跑的路线矩阵预计算与 PENDING/NO_ROUTE 标记"""
+
+import os
+
+import numpy as np
+import pytest
+
+from config import config
+from tools import route_matrix, routeinf
+from tools.route_matrix import NO_ROUTE, PENDING, RouteMatrix
+
+POIS = [
+    {"name": "故宫", "location": {"lng": 116.397, "lat": 39.916}},
+    {"name": "天坛", "location": {"lng": 116.407, "lat": 39.882}},
+    {"name": "颐和园", "location": {"lng": 116.275, "lat": 39.999}},
+]
+ANCHORS = [{"name": "王府井", "lng": 116.411, "lat": 39.915}]
+NO_ROUTE_PAIR = ((116.407, 39.882), (116.275, 39.999))  # 天坛 → 颐和园 高德无公交方案
+
+
+@pytest.fixture
+def matrix_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ROUTE_MATRIX_DIR", str(tmp_path / "route_matrix"))
+    return tmp_path / "route_matrix"
+
+
+@pytest.fixture
+def fake_leg(monkeypatch):
+    """按起终点返回固定结果的 get_leg，记录每次调用；failing 中的路段抛出异常"""
+    calls, failing = [], set()
+
+    def get_leg(api_key, mode, origin, destination, before_fetch=None):
+        calls.append((mode, origin, destination))
+        if (origin, destination) in failing:
+            raise RuntimeError("高德返回错误")
+        if mode == "transit" and (origin, destination) == NO_ROUTE_PAIR:
+            return None, None
+        return 30.0 if mode == "transit" else 20.0, "4" if mode == "transit" else "25"
+
+    monkeypatch.setattr(routeinf, "get_leg", get_leg)
+    return calls, failing
+
+
+def _cells(calls):
+    return {(origin, destination) for _, origin, destination in calls}
+
+
+def test_resumes_from_where_the_previous_run_stopped(matrix_dir, fake_leg):
+    calls, _ = fake_leg
+    # 3个景点互相6条 + 景点↔锚点6条，锚点之间不需要
+    first = route_matrix.warmup("key", POIS, ANCHORS, qps=1000, workers=2, limit=5)
+    assert (first["total"], first["done"], first["remaining"], first["complete"]) == (12, 5, 7, False)
+    assert not os.path.exists(matrix_dir / "CURRENT")
+
+    first_cells = _cells(calls)
+    calls.clear()
+    second = route_matrix.warmup("key", POIS, ANCHORS, qps=1000, workers=2)
+    assert (second["done"], second["remaining"], second["complete"]) == (7, 0, True)
+    assert not first_cells & _cells(calls)  # 已完成的路段不再查询
+    assert (matrix_dir / "CURRENT").read_text() == second["version"]
+
+    calls.clear()
+    third = route_matrix.warmup("key", POIS, ANCHORS, qps=1000)
+    assert third["done"] == 0 and calls == []
+
+
+def test_lookup_distinguishes_no_route_from_pending(matrix_dir, fake_leg):
+    result = route_matrix.warmup("key", POIS, ANCHORS, qps=1000)
+    matrix = RouteMatrix(result["directory"])
+    assert matrix.lookup((116.397, 39.916), (116.407, 39.882)) == ((30.0, "4"), (20.0, "25"))
+    assert matrix.lookup(*NO_ROUTE_PAIR) == ((None, None), (20.0, "25"))
+    assert int(matrix.arrays["transit_minutes"][1, 2]) == NO_ROUTE
+    assert matrix.lookup((116.397, 39.916), (116.397, 39.916)) is None  # 同一点
+    assert matrix.lookup((116.0, 40.5), (116.397, 39.916)) is None  # 不在景点库
+
+
+def test_failed_cells_stay_pending_and_are_retried(matrix_dir, fake_leg):
+    calls, failing = fake_leg
+    failed_cell = ((116.397, 39.916), (116.275, 39.999))
+    failing.add(failed_cell)
+    first = route_matrix.warmup("key", POIS, ANCHORS, qps=1000)
+    assert (first["remaining"], first["complete"]) == (1, False)
+    matrix = RouteMatrix(first["directory"])
+    assert matrix.lookup(*failed_cell) is None
+    assert np.count_nonzero(matrix.arrays["transit_minutes"] == PENDING) == 4 + 1  # 对角线 + 失败路段
+
+    failing.clear()
+    calls.clear()
+    second = route_matrix.warmup("key", POIS, ANCHORS, qps=1000)
+    assert second["complete"] and _cells(calls) == {failed_cell}
+
+
+def test_follower_of_failed_query_sees_the_failure(monkeypatch):
+    """合并到其他调用上的 get_leg 同样得知查询失败，不会被当作"没有可用方案"写成 NO_ROUTE"""
+    import threading
+
+    started, release = threading.Event(), threading.Event()
+
+    def failing_fetch(api_key, origin, destination):
+        started.set()
+        release.wait(5)
+        return None  # 高德返回错误
+
+    monkeypatch.setattr(routeinf, "_fetch_transit", failing_fetch)
+    origin, destination = (116.3001, 39.9001), (116.3501, 39.9501)
+    errors = []
+
+    def call():
+        try:
+            routeinf.get_leg("key", "transit", origin, destination)
+        except routeinf.RouteQueryError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while routeinf.singleflight.default_group.stats()["coalesced"] == 0:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert len(errors) == 2
+
+
+def test_get_leg_ignores_reverse_direction_cache(monkeypatch):
+    monkeypatch.setattr(config, "ROUTE_CACHE_REUSE_REVERSE", True)
+    origin, destination = (116.3101, 39.9101), (116.3601, 39.9601)
+    routeinf._get_route_store().set(routeinf._route_cache_key("driving", destination, origin), [15.0, "30"], 3600)
+    monkeypatch.setattr(routeinf, "_fetch_driving", lambda api_key, o, d: (22.0, "41"))
+
+    # 规划时可用反方向近似，预热只保存实测结果
+    assert routeinf._cached_leg("driving", origin, destination, lambda: (22.0, "41")) == (15.0, "30")
+    assert routeinf.get_leg("key", "driving", origin, destination) == (22.0, "41")
@@ -0,0 +1,81 @@
+"""tools.route_model：区对编码、离线拟合与 confident_estimate 的回退条件"""
+
+import pytest
+
+from config import config
+from tools import route_model
+from tools.route_model import BEIJING_DISTRICTS, TravelTimeModel, confident_estimate, district_of
+
+ORIGIN, DESTINATION = (116.397, 39.916), (116.275, 39.999)  # 故宫 → 颐和园
+
+
+def _prediction(minutes, cost):
+    return {"minutes": minutes, "cost": cost}
+
+
+@pytest.fixture
+def predictions(monkeypatch):
+    """替换进程内模型的预测结果"""
+    result = {}
+
+    class FakeModel:
+        def predict_modes(self, modes, origin, destination):
+            return {mode: result.get(mode) for mode in modes}
+
+    monkeypatch.setattr(route_model, "_model", FakeModel())
+    monkeypatch.setattr(config, "ROUTE_MODEL_MAX_SPREAD", 0.25)
+    return result
+
+
+def test_confident_when_narrow_and_separated(predictions):
+    predictions["transit"] = _prediction((48.0, 50.0, 54.0), (4.0, 5.0, 5.0))
+    predictions["driving"] = _prediction((30.0, 32.0, 35.0), (40.0, 45.0, 50.0))
+    assert confident_estimate(ORIGIN, DESTINATION) == predictions
+
+
+def test_falls_back_when_spread_too_large(predictions):
+    predictions["transit"] = _prediction((30.0, 50.0, 80.0), (4.0, 5.0, 5.0))  # (80 - 30) / 50 = 1.0
+    predictions["driving"] = _prediction((30.0, 32.0, 35.0), (40.0, 45.0, 50.0))
+    assert confident_estimate(ORIGIN, DESTINATION) is None
+
+
+@pytest.mark.parametrize("transit, driving", [
+    (_prediction((34.0, 36.0, 38.0), (4.0, 5.0, 5.0)), _prediction((30.0, 32.0, 35.0), (40.0, 45.0, 50.0))),
+    (_prediction((48.0, 50.0, 54.0), (4.0, 5.0, 6.0)), _prediction((30.0, 32.0, 35.0), (6.0, 8.0, 9.0))),
+], ids=["minutes-overlap", "cost-overlap"])
+def test_falls_back_when_modes_overlap(predictions, transit, driving):
+    predictions.update(transit=transit, driving=driving)
+    assert confident_estimate(ORIGIN, DESTINATION) is None
+
+
+def test_falls_back_without_fitted_model(predictions):
+    predictions["driving"] = _prediction((30.0, 32.0, 35.0), (40.0, 45.0, 50.0))
+    assert confident_estimate(ORIGIN, DESTINATION) is None
+
+
+def test_district_of_nearest_seat():
+    names = [district[0] for district in BEIJING_DISTRICTS]
+    assert names[district_of(116.397, 39.916)] == "东城区"  # 故宫
+    assert names[district_of(116.275, 39.999)] == "海淀区"  # 颐和园
+    assert names[district_of(116.676, 39.853)] == "通州区"  # 环球度假区
+
+
+def test_prediction_never_fits_and_fitted_models_are_reloaded(tmp_path, monkeypatch):
+    def observations(model):
+        for i in range(30):
+            origin = (116.30 + i * 0.005, 39.90)
+            destination = (116.40, 39.92 + i * 0.003)
+            model.record("driving", origin, destination, 20.0 + i, 30.0 + i)
+
+    model = TravelTimeModel(str(tmp_path / "obs.sqlite3"), min_samples=20, model_path=str(tmp_path / "model.pkl"))
+    observations(model)
+    fits = []
+    monkeypatch.setattr(model, "fit", lambda mode: fits.append(mode))
+    assert model.predict("driving", ORIGIN, DESTINATION) is None
+    assert fits == []  # 查询路径上不拟合
+    monkeypatch.undo()
+
+    assert model.fit_all() == {"transit": False, "driving": True}
+    reloaded = TravelTimeModel(str(tmp_path / "obs.sqlite3"), min_samples=20, model_path=str(tmp_path / "model.pkl"))
+    assert reloaded.predict("driving", ORIGIN, DESTINATION) == model.predict("driving", ORIGIN, DESTINATION)
+    assert reloaded.predict("transit", ORIGIN, DESTINATION) is None
@@ -0,0 +1,71 @@
+"""tools.singleflight.SingleFlight：并发相同请求合并为一次调用"""
+
+import threading
+
+import pytest
+
+from tools.singleflight import SingleFlight
+
+
+def _run_coalesced(group, fn, waiters=3):
+    """领头调用阻塞在 fn 中时，再发起 waiters 个相同key的调用；返回每个调用的 (结果, 异常)"""
+    started, release = threading.Event(), threading.Event()
+    outcomes = [None] * (waiters + 1)
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def call(i, target):
+        try:
+            outcomes[i] = (group.do("key", target), None)
+        except Exception as e:
+            outcomes[i] = (None, e)
+
+    threads = [threading.Thread(target=call, args=(0, leader_fn))]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call, args=(i, fn)) for i in range(1, waiters + 1)]
+    for thread in threads[1:]:
+        thread.start()
+    while group.stats()["coalesced"] < waiters:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {"status": "1"}
+
+    outcomes = _run_coalesced(group, fn)
+    assert calls == [1]
+    assert all(outcome == ({"status": "1"}, None) for outcome in outcomes)
+    assert group.stats() == {"executed": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_error_is_propagated_to_every_waiter():
+    group = SingleFlight()
+    error = RuntimeError("高德服务不可用")
+
+    def fn():
+        raise error
+
+    outcomes = _run_coalesced(group, fn)
+    assert all(result is None and raised is error for result, raised in outcomes)
+    assert group.stats()["in_flight"] == 0
+
+
+def test_failed_key_can_be_retried():
+    group = SingleFlight()
+    with pytest.raises(ValueError):
+        group.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert group.do("key", lambda: 42) == 42
+    assert group.stats()["executed"] == 2
@@ -0,0 +1,67 @@
+"""tools.subway_estimator：票价规则、地铁线网最短路径与确定性的离线路线估算"""
+
+import pytest
+
+from tools.subway_estimator import (
+    bus_fare, estimate_route, estimate_route_info, get_subway_network, subway_fare, taxi_fare,
+)
+
+TIANANMEN_EAST = (116.4017, 39.9073)
+XIZHIMEN = (116.3555, 39.9405)
+
+
+@pytest.mark.parametrize("km, fare", [(5, 3), (6, 3), (6.1, 4), (12, 4), (20, 5), (30, 6), (32, 6), (40, 7), (52.1, 8)])
+def test_subway_fare(km, fare):
+    assert subway_fare(km) == fare
+
+
+@pytest.mark.parametrize("km, fare", [(8, 2), (10, 2), (12, 3), (21, 5)])
+def test_bus_fare(km, fare):
+    assert bus_fare(km) == fare
+
+
+@pytest.mark.parametrize("km, fare", [(2, 13), (3, 13), (10, 29), (20, 58)])
+def test_taxi_fare(km, fare):
+    assert taxi_fare(km) == fare
+
+
+def test_network_shortest_paths():
+    network = get_subway_network()
+    a, b = network.station_index["天安门东"], network.station_index["西直门"]
+    assert network.time_min[a, a] == 0
+    assert 0 < network.time_min[a, b] < float("inf")
+    assert network.time_min[a, b] == pytest.approx(network.time_min[b, a])
+    assert 0 < network.ride_km[a, b] < 15
+
+
+@pytest.mark.parametrize("hint, name", [
+    ("天安门东站", "天安门东"),
+    ("环球度假区站（7号线/八通线）", "环球度假区"),
+    ("西直门(2号线)", "西直门"),
+    ("不存在的站", None),
+    (None, None),
+])
+def test_matches_station_hints(hint, name):
+    network = get_subway_network()
+    assert network._match_station(hint) == (network.station_index[name] if name else None)
+
+
+def test_short_trip_walks():
+    estimate = estimate_route((116.397, 39.916), (116.399, 39.921))
+    assert estimate["transit_mode"] == "步行"
+    assert estimate["transit_cost"] == 0
+
+
+def test_trip_along_the_subway_rides_it():
+    estimate = estimate_route(TIANANMEN_EAST, XIZHIMEN)
+    assert estimate["transit_mode"] == "地铁"
+    assert estimate["transit_cost"] == 4
+    assert estimate == estimate_route(TIANANMEN_EAST, XIZHIMEN)  # 结果确定
+    assert estimate["taxi_cost"] == taxi_fare(estimate["road_km"])
+
+
+def test_route_info_has_get_route_info_shape():
+    info = estimate_route_info(TIANANMEN_EAST, XIZHIMEN, "天安门", "西直门")
+    assert info["出发地"] == "天安门" and info["目的地"] == "西直门"
+    assert info["公共交通费用"] == "4元"
+    assert info["估算"] is True
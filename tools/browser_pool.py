@@ -0,0 +1,224 @@
+"""
+Chrome浏览器池
+酒店抓取不再每次新建 webdriver 并连接同一个调试端口，而是从池中借用常驻的无头Chrome：
+- 借出时做健康检查，失效的实例直接重建
+- 每次借出在新标签页中进行，归还时关闭该标签页，会话之间互不影响
+- 每个实例使用 BROWSER_MAX_USES 次后重建
+- 实例都在使用中时排队等待，等待队列有上限，超出或等待超时抛出 BrowserPoolBusy
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from config import config
+
+
+class BrowserPoolBusy(RuntimeError):
+    """浏览器池等待队列已满或等待超时"""
+
+
+class _Browser:
+    __slots__ = ("driver", "uses")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+def create_chrome_driver():
+    """新建无头Chrome；配置了 BROWSER_DEBUGGER_ADDRESS 时改为连接已启动的Chrome"""
+    options = Options()
+    # 仅在按JSON响应提取酒店数据时记录DevTools网络事件；dom模式下不开启，
+    # 否则无人读取的performance日志会在常驻实例中一直累积
+    if config.HOTEL_EXTRACT_MODE == "json":
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if config.BROWSER_DEBUGGER_ADDRESS:
+        options.debugger_address = config.BROWSER_DEBUGGER_ADDRESS
+    else:
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--window-size=1366,2000")
+    return webdriver.Chrome(options=options)
+
+
+class BrowserPool:
+    """
+    固定上限的浏览器池（线程安全）
+
+    用法:
+        with pool.tab() as driver:
+            driver.get(url)
+    """
+
+    def __init__(self, size: int, max_uses: int = 0, acquire_timeout: float = 30, max_waiters: int = 8,
+                 factory: Callable[[], Any] = create_chrome_driver, owns_browser: bool = True):
+        """
+        参数:
+            size (int): 最多同时存在的实例数
+            max_uses (int): 每个实例借出多少次后重建，0为不限
+            acquire_timeout (float): 等待空闲实例的最长时间（秒）
+            max_waiters (int): 同时等待的请求数上限
+            factory (callable): 创建 webdriver 的函数
+            owns_browser (bool): 为False时（连接外部Chrome）废弃实例只丢弃连接，不关闭浏览器
+        """
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+        self.max_waiters = max_waiters
+        self._factory = factory
+        self._owns_browser = owns_browser
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._created = 0
+        self._waiting = 0
+        self._closed = False
+        self.recycled = 0  # 达到使用次数后重建的实例数
+        self.replaced = 0  # 健康检查失败后重建的实例数
+        self.rejected = 0  # 因队列已满或超时被拒绝的请求数
+
+    def _checkout(self) -> _Browser:
+        with self._cond:
+            if self._closed:
+                raise BrowserPoolBusy("浏览器池已关闭")
+            if not self._idle and self._created >= self.size and self._waiting >= self.max_waiters:
+                self.rejected += 1
+                raise BrowserPoolBusy(f"浏览器池繁忙（{self._waiting}个请求排队中）")
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.acquire_timeout
+                while True:
+                    if self._idle:
+                        browser = self._idle.popleft()
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        browser = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise BrowserPoolBusy(f"等待空闲浏览器超时（{self.acquire_timeout:g}秒）")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        if browser is not None and self._healthy(browser):
+            return browser
+        if browser is not None:
+            self._quit(browser)
+            with self._cond:
+                self.replaced += 1
+        try:
+            return _Browser(self._factory())
+        except BaseException:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, browser: _Browser, broken: bool) -> None:
+        browser.uses += 1
+        expired = self.max_uses and browser.uses >= self.max_uses
+        if broken or expired or self._closed:
+            self._quit(browser)
+            with self._cond:
+                self._created -= 1
+                if expired and not broken:
+                    self.recycled += 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(browser)
+            self._cond.notify()
+
+    @staticmethod
+    def _healthy(browser: _Browser) -> bool:
+        try:
+            browser.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, browser: _Browser) -> None:
+        if not self._owns_browser:
+            return
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def tab(self):
+        """借出一个浏览器并在新标签页中使用，退出时关闭标签页并归还"""
+        browser = self._checkout()
+        driver = browser.driver
+        broken = False
+        try:
+            home = driver.current_window_handle
+            driver.switch_to.new_window("tab")
+        except Exception:
+            self._checkin(browser, broken=True)
+            raise
+        try:
+            yield driver
+        finally:
+            try:
+                driver.close()
+                driver.switch_to.window(home)
+            except Exception:
+                broken = True
+            self._checkin(browser, broken)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "in_use": self._created - len(self._idle),
+                "waiting": self._waiting,
+                "recycled": self.recycled,
+                "replaced": self.replaced,
+                "rejected": self.rejected,
+            }
+
+    def close(self) -> None:
+        """关闭所有空闲实例，使用中的实例在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for browser in idle:
+            self._quit(browser)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """进程内共享的浏览器池（按config创建，进程退出时关闭）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                attached = bool(config.BROWSER_DEBUGGER_ADDRESS)
+                _pool = BrowserPool(
+                    size=1 if attached else config.BROWSER_POOL_SIZE,  # 多个连接共用一个调试端口会互相干扰
+                    max_uses=0 if attached else config.BROWSER_MAX_USES,
+                    acquire_timeout=config.BROWSER_ACQUIRE_TIMEOUT,
+                    max_waiters=config.BROWSER_MAX_WAITERS,
+                    owns_browser=not attached,
+                )
+                atexit.register(_pool.close)
+    return _pool
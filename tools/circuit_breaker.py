@@ -0,0 +1,167 @@
+"""
+按服务商的熔断器
+高德、和风天气、携程等外部服务故障时，请求往往要等到超时才失败。熔断器统计时间窗口内的失败率，
+失败率过高时熔断：熔断期间调用立即抛出 CircuitOpenError，由调用方直接走离线估算/备用数据；
+熔断一段时间后进入半开状态，只放行一个试探请求，成功则恢复，失败则继续熔断。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+from config import config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 抓取类服务单次调用代价高（浏览器等待可达20秒），更少的失败即熔断，熔断时间也更长
+PROVIDER_OVERRIDES = {
+    "ctrip": {"min_calls": 2, "open_seconds": 300},
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """服务商处于熔断状态，调用未发出"""
+
+
+class CircuitBreaker:
+    """
+    失败率熔断器（线程安全）
+
+    - before_call(): 调用前检查，熔断中抛出 CircuitOpenError
+    - record_success() / record_failure() / record_ignored(): 记录调用结果，每次放行的调用都必须记录其一
+    - call(): 包装一次调用，抛出异常即视为失败
+    """
+
+    def __init__(self, name: str, window_seconds: float = 60, min_calls: int = 5,
+                 failure_rate: float = 0.5, open_seconds: float = 30):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (时间, 是否成功)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0  # 累计熔断次数
+        self.rejected = 0  # 熔断期间直接拒绝的调用数
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def before_call(self) -> None:
+        """放行则直接返回；熔断中（或半开状态已有试探请求在进行）抛出 CircuitOpenError"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} 服务熔断中，暂停调用")
+
+    def record_success(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                # 试探成功：恢复并清空旧的失败记录
+                self._state = CLOSED
+                self._probing = False
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for _, ok in self._outcomes if not ok)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._open(now)
+
+    def record_ignored(self) -> None:
+        """放行的调用因与服务无关的原因未完成（如本地资源不足），不计入统计"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._probing = False
+        self.times_opened += 1
+        print(f"⚡ {self.name} 服务失败率过高，熔断{self.open_seconds:g}秒，期间直接使用降级数据")
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """执行 fn，抛出异常计为失败"""
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态与窗口内的统计"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self._current_state(now),
+                "window_calls": calls,
+                "window_failures": failures,
+                "failure_rate": round(failures / calls, 2) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """获取服务商对应的熔断器（进程内共享）"""
+    with _breakers_lock:
+        if provider not in _breakers:
+            settings = {
+                "window_seconds": config.BREAKER_WINDOW_SECONDS,
+                "min_calls": config.BREAKER_MIN_CALLS,
+                "failure_rate": config.BREAKER_FAILURE_RATE,
+                "open_seconds": config.BREAKER_OPEN_SECONDS,
+            }
+            settings.update(PROVIDER_OVERRIDES.get(provider, {}))
+            _breakers[provider] = CircuitBreaker(provider, **settings)
+        return _breakers[provider]
+
+
+def breaker_metrics() -> Dict[str, Dict[str, Any]]:
+    """已使用过的各服务商熔断器的状态快照 {服务商: snapshot}"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
@@ -1,14 +1,280 @@
 from typing import Dict, Any, List
+import json
+import os
+import threading
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from config import config
+from tools import singleflight
+from tools.browser_pool import BrowserPoolBusy, get_browser_pool
+from tools.circuit_breaker import get_breaker
+from tools.hotel_records import HotelRecord
+from tools.kv_store import SQLiteTTLStore
 
+_hotel_store = None
+_hotel_store_lock = threading.Lock()
 
-def ctrip_hotel_scraper(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5):
+# 后台预搜索：搜索键 -> [Future, 取消事件, 引用数]
+_prefetches = {}
+_prefetch_lock = threading.Lock()
+_prefetch_executor = None
+
+
+class HotelSearchCancelled(RuntimeError):
+    """后台酒店搜索已被取消"""
+
+# 携程列表页使用的日期格式
+DATE_FORMAT = "%Y/%m/%d"
+
+# 列表页滚动加载：等待新卡片的最长时间、轮询间隔，以及判定网络空闲（已到底）的静默时长（秒）
+SCROLL_WAIT_TIMEOUT = 8
+SCROLL_POLL_SECONDS = 0.1
+NETWORK_IDLE_SECONDS = 0.8
+
+# 读取第 arguments[0] 张之后的卡片：返回 [卡片总数, [[名称, 评分, 房型, 价格], ...]]
+READ_NEW_CARDS_JS = """
+const cards = document.querySelectorAll('div.hotel-card');
+const text = (card, selector) => {
+    const element = card.querySelector(selector);
+    return element ? element.innerText.trim() : null;
+};
+const rows = [];
+for (let i = arguments[0]; i < cards.length; i++) {
+    const card = cards[i];
+    rows.push([text(card, '.hotelName'), text(card, '.comment-score .score'),
+               text(card, '.room-name'), text(card, '.room-price .sale')]);
+}
+return [cards.length, rows];
+"""
+
+SCROLL_TO_LAST_CARD_JS = """
+const cards = document.querySelectorAll('div.hotel-card');
+if (cards.length) { cards[cards.length - 1].scrollIntoView({block: 'end'}); }
+window.scrollBy(0, 200);
+"""
+
+# 酒店列表接口地址中的关键字（JSON提取模式据此识别要截获的响应）
+HOTEL_LIST_URL_KEYWORDS = ("fetchHotelList", "hotelList", "HotelList")
+
+# 接口JSON中酒店字段的候选键名，按顺序在酒店记录内逐层查找
+HOTEL_FIELD_KEYS = {
+    "name": ("hotelName", "name"),
+    "score": ("commentScore", "score"),
+    "room": ("saleRoomName", "roomName", "roomType"),
+    "price": ("price", "salePrice", "minPrice", "displayPrice"),
+    "lat": ("lat", "latitude"),
+    "lng": ("lng", "lon", "longitude"),
+}
+
+# 当前卡片数与已发出的资源请求数（资源请求数不再变化即视为网络空闲）
+CARD_AND_RESOURCE_COUNT_JS = """
+return [document.querySelectorAll('div.hotel-card').length,
+        performance.getEntriesByType('resource').length];
+"""
+
+
+def _get_hotel_store():
+    """酒店搜索结果持久化缓存（按搜索条件索引）"""
+    global _hotel_store
+    if _hotel_store is None:
+        with _hotel_store_lock:
+            if _hotel_store is None:
+                _hotel_store = SQLiteTTLStore(os.path.join(config.CACHE_DIR, "hotels.sqlite3"), table="hotels")
+    return _hotel_store
+
+
+def _search_key(destination, checkin, checkout, rooms, adults, children, keyword):
+    """酒店缓存键：目的地、入住/退房日期、房间数、成人数、儿童数、关键词"""
+    return f"{destination}|{checkin}|{checkout}|{rooms}|{adults}|{children}|{keyword or ''}"
+
+
+def _usable(entry, max_hotels):
+    """缓存的结果是否足够：抓取数量不少于本次需要，或当时页面上的酒店已全部抓完"""
+    return entry["max_hotels"] >= max_hotels or len(entry["hotels"]) < entry["max_hotels"]
+
+
+def _adjacent_stays(checkin, checkout, days):
+    """前后days天内、入住晚数相同的日期组合，按偏移从近到远排列；日期无法解析时返回空列表"""
+    try:
+        start = datetime.strptime(checkin, DATE_FORMAT)
+        end = datetime.strptime(checkout, DATE_FORMAT)
+    except ValueError:
+        return []
+    stays = []
+    for offset in range(1, days + 1):
+        for delta in (offset, -offset):
+            shift = timedelta(days=delta)
+            stays.append(((start + shift).strftime(DATE_FORMAT), (end + shift).strftime(DATE_FORMAT)))
+    return stays
+
+
+def _cached_hotels(destination, checkin, checkout, rooms, adults, children, keyword, max_hotels):
+    """
+    读取酒店缓存
+
+    返回:
+        list[dict] | None: 命中时返回酒店列表；相邻日期的结果每项带 "过期数据": True 和 "数据日期"
+    """
+    store = _get_hotel_store()
+    found, entry = store.get(_search_key(destination, checkin, checkout, rooms, adults, children, keyword))
+    if found and _usable(entry, max_hotels):
+        return [dict(hotel) for hotel in entry["hotels"][:max_hotels]]
+
+    for stay_in, stay_out in _adjacent_stays(checkin, checkout, config.HOTEL_CACHE_ADJACENT_DAYS):
+        found, entry = store.get(_search_key(destination, stay_in, stay_out, rooms, adults, children, keyword))
+        if found and _usable(entry, max_hotels):
+            print(f"🗂️ 使用相邻日期 {stay_in}-{stay_out} 的酒店缓存（价格房态可能已变化）")
+            return [
+                {**hotel, "过期数据": True, "数据日期": f"{stay_in}-{stay_out}"}
+                for hotel in entry["hotels"][:max_hotels]
+            ]
+    return None
+
+
+
+def _get_prefetch_executor():
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(max_workers=max(1, config.BROWSER_POOL_SIZE),
+                                                    thread_name_prefix="hotel-prefetch")
+    return _prefetch_executor
+
+
+def hotel_search_key(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5):
+    """后台搜索的键（搜索条件 + 酒店数量），可用于判断已发起的预搜索是否与当前条件一致"""
+    return f"{_search_key(destination, checkin, checkout, rooms, adults, children, keyword)}|{max_hotels}"
+
+
+def start_hotel_search(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5):
+    """
+    在后台发起酒店搜索（参数同 ctrip_hotel_scraper），立即返回搜索键
+
+    搜索条件在规划早期就已确定时提前发起，抓取与天气查询、景点聚类等步骤并行；
+    之后用 await_hotel_search 取结果，流程提前结束时用 cancel_hotel_search 取消。
+    相同条件重复发起时共用同一个后台任务。
+    """
+    key = hotel_search_key(destination, checkin, checkout, rooms, adults, children, keyword, max_hotels)
+    executor = _get_prefetch_executor()
+    with _prefetch_lock:
+        if key in _prefetches:
+            _prefetches[key][2] += 1
+            return key
+        cancel_event = threading.Event()
+        future = executor.submit(ctrip_hotel_scraper, destination, checkin, checkout, rooms, adults, children,
+                                 keyword, max_hotels, cancel_event=cancel_event)
+        _prefetches[key] = [future, cancel_event, 1]
+    return key
+
+
+def _release_prefetch(key):
+    """减少一次引用，返回 (Future, 取消事件, 是否为最后一个引用)；不存在时返回None"""
+    with _prefetch_lock:
+        entry = _prefetches.get(key)
+        if entry is None:
+            return None
+        entry[2] -= 1
+        last = entry[2] <= 0
+        if last:
+            del _prefetches[key]
+        return entry[0], entry[1], last
+
+
+def await_hotel_search(key, timeout=None):
+    """
+    等待后台酒店搜索的结果
+
+    参数:
+        key (str): start_hotel_search 返回的搜索键
+        timeout (float, 可选): 最长等待秒数，默认 HOTEL_PREFETCH_TIMEOUT
+
+    返回:
+        list[dict] | None: 搜索结果；没有对应的后台任务（未发起或已取消）或等待超时时返回None，
+                           调用方应改为直接搜索（超时的后台任务在没有其他使用者时被取消）
+
+    异常:
+        与 ctrip_hotel_scraper 相同（后台任务中的异常在此抛出）
+    """
+    released = _release_prefetch(key)
+    if released is None:
+        return None
+    future, cancel_event, last = released
+    try:
+        return list(future.result(timeout=config.HOTEL_PREFETCH_TIMEOUT if timeout is None else timeout))
+    except FutureTimeoutError:
+        print("⚠️ 等待后台酒店搜索超时，改为直接搜索")
+        if last:
+            cancel_event.set()
+            future.cancel()
+        return None
+
+
+def cancel_hotel_search(key):
+    """取消后台酒店搜索：未开始的任务直接取消，进行中的抓取在下一次滚动前停止（有其他使用者时不取消）"""
+    released = _release_prefetch(key)
+    if released is None:
+        return
+    future, cancel_event, last = released
+    if last:
+        cancel_event.set()
+        future.cancel()
+
+
+def ctrip_hotel_scraper(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5,
+                        cancel_event=None):
+    """
+       从携程酒店列表页获取酒店数据（参数与返回值同 _scrape_ctrip_hotels）
+
+       相同搜索条件的结果缓存HOTEL_CACHE_TTL秒（持久化到CACHE_DIR），命中时不再打开浏览器；
+       开启HOTEL_CACHE_ADJACENT_DAYS后，精确日期未命中时可返回相邻日期的结果（标记为过期数据）。
+       多个会话同时发起完全相同的搜索时只打开一次页面，其余请求共享抓取结果；
+       携程连续抓取失败时熔断，熔断期间直接抛出 CircuitOpenError，不再等待页面加载
+       """
+    cached = _cached_hotels(destination, checkin, checkout, rooms, adults, children, keyword, max_hotels)
+    if cached is not None:
+        print(f"🗂️ 命中酒店搜索缓存，共 {len(cached)} 家")
+        return [HotelRecord.from_dict(hotel) for hotel in cached]
+
+    search_key = _search_key(destination, checkin, checkout, rooms, adults, children, keyword)
+
+    def _scrape_and_store():
+        breaker = get_breaker("ctrip")
+        breaker.before_call()
+        try:
+            hotels = _scrape_ctrip_hotels(destination, checkin, checkout, rooms, adults, children, keyword, max_hotels,
+                                          cancel_event)
+        except (BrowserPoolBusy, HotelSearchCancelled):
+            breaker.record_ignored()  # 本地浏览器池繁忙或搜索被取消，与携程服务状态无关
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        if hotels:  # 空结果可能是页面异常，不缓存
+            _get_hotel_store().set(search_key, {"hotels": hotels, "max_hotels": max_hotels}, config.HOTEL_CACHE_TTL)
+        return hotels
+
+    # 取消事件只属于发起抓取的那次调用：合并到别人的抓取上、而该抓取被其发起方（后台预搜索）取消时，
+    # 本次调用并未取消，重新发起（此时会成为新的抓取发起方，或搭上其他进行中的抓取）
+    while True:
+        try:
+            hotels = singleflight.do(f"hotel:{search_key}|{max_hotels}", _scrape_and_store)
+            break
+        except HotelSearchCancelled:
+            if cancel_event is not None and cancel_event.is_set():
+                raise
+            print("🔁 共享的酒店搜索被其他会话取消，重新搜索")
+    return [HotelRecord.from_dict(hotel) for hotel in hotels]
+
+
+def _scrape_ctrip_hotels(destination, checkin, checkout, rooms, adults, children, keyword=None, max_hotels=5,
+                         cancel_event=None):
     """
        从携程酒店列表页获取酒店数据
 
@@ -21,6 +287,7 @@ def ctrip_hotel_scraper(destination, checkin, checkout, rooms, adults, children,
            children (int): 儿童数
            keyword (str, 可选): 地址或酒店的进一步描述
            max_hotels (int): 需要抓取的酒店数量，默认 5
+           cancel_event (threading.Event, 可选): 置位后停止抓取并抛出 HotelSearchCancelled
 
        返回：
            list[dict]: 酒店数据字典列表，包含：
@@ -29,12 +296,8 @@ def ctrip_hotel_scraper(destination, checkin, checkout, rooms, adults, children,
                - 房型
                - 价格
        """
-    chrome_options = Options()
-    chrome_options.debugger_address = "127.0.0.1:9222"
-    driver = webdriver.Chrome(options=chrome_options)
-
     url = (
-        f"https://hotels.ctrip.com/hotels/list?"
+        f"{config.CTRIP_HOTEL_BASE}/hotels/list?"
         f"city=1&provinceId=0&checkin={checkin}&checkout={checkout}"
         f"&optionId=1&optionType=City&directSearch=1"
         f"&optionName={destination}&display={destination}"
@@ -44,51 +307,219 @@ def ctrip_hotel_scraper(destination, checkin, checkout, rooms, adults, children,
     if keyword:
         url += f"&keyword={keyword}"
 
+    # 从浏览器池借用常驻Chrome，在独立标签页中抓取，结束后标签页关闭、浏览器归还
+    _check_cancelled(cancel_event)
+    with get_browser_pool().tab() as driver:
+        if config.HOTEL_EXTRACT_MODE == "json":
+            hotels = _collect_hotels_json(driver, url, max_hotels, cancel_event)
+            if hotels:
+                return hotels
+            print("⚠️ 未截获到酒店列表接口数据，改用页面解析")
+        return _collect_hotels(driver, url, max_hotels, cancel_event)
+
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise HotelSearchCancelled("酒店搜索已取消")
+
+
+def _collect_hotels(driver, url, max_hotels, cancel_event=None):
+    """
+    打开酒店列表页并采集酒店，直到采集到 max_hotels 家或列表不再增长
+
+    事件驱动：每轮只用一次脚本调用读取上一轮之后新追加的卡片，然后滚动到最后一张卡片，
+    等待新卡片出现（或网络空闲、确认已到底）再进入下一轮，不再固定等待
+    """
     driver.get(url)
     wait = WebDriverWait(driver, 20)
     wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.hotel-card")))
 
     hotels_data = []
     seen_hotels = set()
-
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    scroll_position = 0
+    processed = 0  # 已处理的卡片数（列表只在末尾追加）
 
     while len(hotels_data) < max_hotels:
-        # 每次小幅度下滑，比如 500px
-        scroll_position += 500
-        driver.execute_script(f"window.scrollTo(0, {scroll_position});")
-        time.sleep(1.5)  # 给页面时间加载
-
-        hotels = driver.find_elements(By.CSS_SELECTOR, "div.hotel-card")
-        for hotel in hotels:
-            try:
-                name = hotel.find_element(By.CSS_SELECTOR, ".hotelName").text
-                if name in seen_hotels:
-                    continue
-                seen_hotels.add(name)
-
-                score = hotel.find_element(By.CSS_SELECTOR, ".comment-score .score").text
-                room_type = hotel.find_element(By.CSS_SELECTOR, ".room-name").text
-                price = hotel.find_element(By.CSS_SELECTOR, ".room-price .sale").text
-
-                hotels_data.append({
-                    "酒店名称": name,
-                    "评分": score,
-                    "房型": room_type,
-                    "价格": price
-                })
-                print(f"采集到第 {len(hotels_data)} 条：{name}")
-
-                if len(hotels_data) >= max_hotels:
-                    break
-            except Exception:
+        _check_cancelled(cancel_event)
+        card_count, cards = driver.execute_script(READ_NEW_CARDS_JS, processed)
+        processed = card_count
+        for name, score, room_type, price in cards:
+            if not all((name, score, room_type, price)) or name in seen_hotels:
                 continue
+            seen_hotels.add(name)
+            hotels_data.append({
+                "酒店名称": name,
+                "评分": score,
+                "房型": room_type,
+                "价格": price
+            })
+            print(f"采集到第 {len(hotels_data)} 条：{name}")
+            if len(hotels_data) >= max_hotels:
+                break
 
-        # 检查是否到底
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if scroll_position >= new_height:
+        if len(hotels_data) >= max_hotels or not _wait_for_more_cards(driver, card_count):
             break
 
     return hotels_data
-import json
\ No newline at end of file
+
+
+def _wait_for_more_cards(driver, card_count):
+    """
+    滚动到最后一张卡片并等待列表增长
+
+    返回:
+        bool: 出现了新卡片返回True；网络空闲后仍没有新卡片（已到底）或等待超时返回False
+    """
+    driver.execute_script(SCROLL_TO_LAST_CARD_JS)
+    state = {"resources": -1, "changed_at": time.monotonic()}
+
+    def _grown_or_idle(drv):
+        count, resources = drv.execute_script(CARD_AND_RESOURCE_COUNT_JS)
+        if count > card_count:
+            return "grown"
+        now = time.monotonic()
+        if resources != state["resources"]:
+            state["resources"], state["changed_at"] = resources, now
+        elif now - state["changed_at"] >= NETWORK_IDLE_SECONDS:
+            return "idle"
+        return False
+
+    try:
+        result = WebDriverWait(driver, SCROLL_WAIT_TIMEOUT, poll_frequency=SCROLL_POLL_SECONDS).until(_grown_or_idle)
+    except TimeoutException:
+        return False
+    return result == "grown"
+
+
+def _collect_hotels_json(driver, url, max_hotels, cancel_event=None):
+    """
+    JSON提取模式：通过DevTools网络日志截获列表页的酒店列表接口响应，批量解析结构化酒店记录
+
+    比逐个读取页面元素快，且不受页面样式调整影响；需要浏览器开启performance日志（见 browser_pool）。
+    需要更多酒店时滚动页面触发下一页请求，等到新响应到达或网络空闲为止。
+
+    返回:
+        list[dict]: 酒店列表，除 酒店名称/评分/房型/价格 外还包含 价格数值、lat、lng；未截获到数据时为空列表
+    """
+    driver.get_log("performance")  # 丢弃之前页面的网络事件
+    driver.get(url)
+
+    hotels_data = []
+    seen_hotels = set()
+    list_requests = set()
+    deadline = time.monotonic() + SCROLL_WAIT_TIMEOUT
+    quiet_since = time.monotonic()
+
+    while len(hotels_data) < max_hotels and time.monotonic() < deadline:
+        _check_cancelled(cancel_event)
+        events = driver.get_log("performance")
+        received = 0
+        for entry in events:
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            if message.get("method") == "Network.responseReceived":
+                response_url = params.get("response", {}).get("url", "")
+                if any(keyword in response_url for keyword in HOTEL_LIST_URL_KEYWORDS):
+                    list_requests.add(params["requestId"])
+            elif message.get("method") == "Network.loadingFinished" and params.get("requestId") in list_requests:
+                list_requests.discard(params["requestId"])
+                try:
+                    body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+                    payload = json.loads(body["body"])
+                except Exception:
+                    continue
+                received += 1
+                for hotel in parse_hotel_list_payload(payload):
+                    if hotel["酒店名称"] in seen_hotels:
+                        continue
+                    seen_hotels.add(hotel["酒店名称"])
+                    hotels_data.append(hotel)
+                    print(f"采集到第 {len(hotels_data)} 条：{hotel['酒店名称']}")
+                    if len(hotels_data) >= max_hotels:
+                        break
+
+        now = time.monotonic()
+        if received:
+            # 拿到一页数据后滚动触发下一页，重新计时
+            if len(hotels_data) < max_hotels:
+                driver.execute_script(SCROLL_TO_LAST_CARD_JS)
+            deadline = now + SCROLL_WAIT_TIMEOUT
+        if events:
+            quiet_since = now
+        elif hotels_data and now - quiet_since >= NETWORK_IDLE_SECONDS:
+            break  # 网络空闲且没有新的列表数据：已到底
+        time.sleep(SCROLL_POLL_SECONDS)
+
+    return hotels_data[:max_hotels]
+
+
+def _find_field(node, keys, max_depth=5):
+    """在嵌套的dict/list中按层（由浅到深）查找第一个键名属于keys的标量值"""
+    level = [node]
+    for _ in range(max_depth):
+        next_level = []
+        for item in level:
+            children = item.values() if isinstance(item, dict) else item
+            if isinstance(item, dict):
+                for key in keys:
+                    value = item.get(key)
+                    if value not in (None, "") and not isinstance(value, (dict, list)):
+                        return value
+            next_level.extend(child for child in children if isinstance(child, (dict, list)))
+        level = next_level
+        if not level:
+            break
+    return None
+
+
+def _find_hotel_list(node, max_depth=4):
+    """在接口响应中找到酒店列表（键名为 hotelList/hotels 的列表）"""
+    if max_depth < 0:
+        return None
+    if isinstance(node, dict):
+        for key in ("hotelList", "hotels"):
+            if isinstance(node.get(key), list):
+                return node[key]
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = _find_hotel_list(child, max_depth - 1)
+        if found is not None:
+            return found
+    return None
+
+
+def parse_hotel_list_payload(payload):
+    """
+    解析酒店列表接口的JSON响应
+
+    返回:
+        list[dict]: 每项包含 酒店名称、评分、房型、价格（如 "¥489"）、价格数值，有坐标时包含 lat、lng；
+                    缺少名称或价格的记录跳过
+    """
+    hotels = []
+    for record in _find_hotel_list(payload) or []:
+        if not isinstance(record, dict):
+            continue
+        fields = {field: _find_field(record, keys) for field, keys in HOTEL_FIELD_KEYS.items()}
+        try:
+            price = float(fields["price"])
+        except (TypeError, ValueError):
+            continue
+        if not fields["name"]:
+            continue
+        hotel = {
+            "酒店名称": str(fields["name"]),
+            "评分": str(fields["score"] or ""),
+            "房型": str(fields["room"] or ""),
+            "价格": f"¥{price:g}",
+            "价格数值": price,
+        }
+        try:
+            hotel["lat"], hotel["lng"] = float(fields["lat"]), float(fields["lng"])
+        except (TypeError, ValueError):
+            pass
+        hotels.append(hotel)
+    return hotels
@@ -0,0 +1,149 @@
+"""
+携程酒店列表页的本地样例服务器
+模拟列表页的滚动加载：页面首屏请求第一页酒店列表接口（JSON），滚动到底部后再请求下一页，
+前端按返回的JSON渲染 div.hotel-card，页面结构与线上抓取用到的选择器一致。
+用于离线调试、对比 dom/json 两种提取模式的耗时。
+
+用法:
+    python -m tools.hotel_fixture_server --port 8765            # 只启动服务器
+    python -m tools.hotel_fixture_server --benchmark --runs 3   # 启动服务器并对比两种提取模式（需要本机Chrome）
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config import config
+
+PAGE_SIZE = 10
+
+LIST_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>酒店列表（样例）</title>
+<style>div.hotel-card { height: 240px; border-bottom: 1px solid #ddd; }</style></head>
+<body><div id="list"></div>
+<script>
+let page = 0, loading = false, done = false;
+function card(h) {
+  const info = h.hotelInfo, room = h.roomInfo[0];
+  return `<div class="hotel-card"><span class="hotelName">${info.nameInfo.name}</span>
+    <div class="comment-score"><span class="score">${info.commentInfo.commentScore}</span></div>
+    <div class="room-name">${room.summary.saleRoomName}</div>
+    <div class="room-price"><span class="sale">¥${room.priceInfo.price}</span></div></div>`;
+}
+async function load() {
+  if (loading || done) return;
+  loading = true;
+  const res = await fetch(`/restapi/soa2/fetchHotelList?page=${page}`);
+  const data = await res.json();
+  document.getElementById('list').insertAdjacentHTML('beforeend', data.data.hotelList.map(card).join(''));
+  done = !data.data.hasMore;
+  page += 1;
+  loading = false;
+}
+window.addEventListener('scroll', () => {
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 300) load();
+});
+load();
+</script></body></html>
+"""
+
+
+def fixture_hotels(count, seed=7):
+    """生成固定的样例酒店（王府井周边），结构参照携程列表接口"""
+    rng = random.Random(seed)
+    hotels = []
+    for i in range(count):
+        hotels.append({
+            "hotelInfo": {
+                "summary": {"hotelId": 100000 + i},
+                "nameInfo": {"name": f"北京王府井样例酒店{i + 1:03d}"},
+                "commentInfo": {"commentScore": f"{rng.uniform(3.8, 4.9):.1f}"},
+                "positionInfo": {"coordinate": {"lat": round(39.9149 + rng.uniform(-0.03, 0.03), 6),
+                                                "lng": round(116.4114 + rng.uniform(-0.04, 0.04), 6)}},
+            },
+            "roomInfo": [{
+                "summary": {"saleRoomName": rng.choice(["高级大床房", "豪华双床房", "商务大床房", "标准间"])},
+                "priceInfo": {"price": round(rng.uniform(280, 1200), 1)},
+            }],
+        })
+    return hotels
+
+
+def make_handler(hotels, latency):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path == "/hotels/list":
+                self._send(200, "text/html; charset=utf-8", LIST_PAGE.encode("utf-8"))
+            elif parsed.path == "/restapi/soa2/fetchHotelList":
+                time.sleep(latency)  # 模拟接口耗时
+                page = int(parse_qs(parsed.query).get("page", ["0"])[0])
+                items = hotels[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+                body = {"data": {"hotelList": items, "hasMore": (page + 1) * PAGE_SIZE < len(hotels)}}
+                self._send(200, "application/json; charset=utf-8", json.dumps(body, ensure_ascii=False).encode("utf-8"))
+            else:
+                self._send(404, "text/plain", b"not found")
+
+        def _send(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_fixture_server(port=0, count=60, latency=0.2):
+    """在后台线程启动样例服务器，返回 (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fixture_hotels(count), latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def benchmark(base_url, runs, max_hotels):
+    """分别用dom/json模式抓取样例页面，输出平均耗时"""
+    from tools import hotel
+
+    config.CTRIP_HOTEL_BASE = base_url
+    for mode in ("dom", "json"):
+        config.HOTEL_EXTRACT_MODE = mode
+        durations = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            hotels = hotel._scrape_ctrip_hotels("王府井", "2025/01/01", "2025/01/02", 1, 2, 0, max_hotels=max_hotels)
+            durations.append(time.perf_counter() - started)
+        print(f"📊 {mode}: 采集{len(hotels)}家，平均 {sum(durations) / len(durations):.2f}秒（{runs}次）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="携程酒店列表页本地样例服务器")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--hotels", type=int, default=60, help="样例酒店数量")
+    parser.add_argument("--latency", type=float, default=0.2, help="列表接口的模拟耗时（秒）")
+    parser.add_argument("--benchmark", action="store_true", help="对比dom/json两种提取模式")
+    parser.add_argument("--runs", type=int, default=3, help="基准测试每种模式的运行次数")
+    parser.add_argument("--max-hotels", type=int, default=5, help="基准测试每次抓取的酒店数")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_fixture_server(args.port, args.hotels, args.latency)
+    print(f"🏨 样例服务器已启动: {base_url}/hotels/list")
+    if args.benchmark:
+        benchmark(base_url, args.runs, args.max_hotels)
+        server.shutdown()
+        return
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+酒店记录与价格索引
+抓取结果在抓取时解析一次：价格、评分转为数值，之后的排序、筛选、预算计算不再反复解析字符串。
+HotelRecord 仍可按原来的中文键读取（hotel["酒店名称"]、hotel.get("价格")），与已有代码兼容。
+"""
+
+import re
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, List, Optional
+
+_AMOUNT_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def parse_amount(text: Any) -> Optional[float]:
+    """
+    从金额字符串中解析数值，如 "¥489.5" → 489.5、"500元/晚" → 500.0、"¥1,299起" → 1299.0
+
+    返回:
+        float | None: 取第一个数字（千分位逗号忽略）；没有数字时返回None
+    """
+    if isinstance(text, (int, float)):
+        return float(text)
+    if not text:
+        return None
+    match = _AMOUNT_PATTERN.search(str(text).replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def parse_score(text: Any) -> float:
+    """解析评分，无法解析时为0"""
+    value = parse_amount(text)
+    return value if value is not None else 0.0
+
+
+# 中文键与属性的对应关系
+_KEY_ATTRS = {"酒店名称": "name", "评分": "score_text", "房型": "room_type", "价格": "price_text"}
+
+
+class HotelRecord(Mapping):
+    """
+    一条酒店搜索结果
+
+    数值字段 price（每晚价格，无法解析时为None）、score 在创建时解析；
+    同时实现只读映射接口，按中文键读取原始字段（酒店名称/评分/房型/价格/价格数值/lat/lng 及其他附加字段）
+    """
+
+    __slots__ = ("name", "score_text", "room_type", "price_text", "score", "price", "lat", "lng", "extra")
+
+    def __init__(self, name: str, score_text: str = "", room_type: str = "", price_text: str = "",
+                 lat: Optional[float] = None, lng: Optional[float] = None,
+                 price: Optional[float] = None, extra: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.score_text = score_text
+        self.room_type = room_type
+        self.price_text = price_text
+        self.score = parse_score(score_text)
+        self.price = price if price is not None else parse_amount(price_text)
+        self.lat = lat
+        self.lng = lng
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HotelRecord":
+        """由抓取/缓存得到的字典创建"""
+        known = {"酒店名称", "评分", "房型", "价格", "价格数值", "lat", "lng"}
+        return cls(
+            name=data.get("酒店名称", ""),
+            score_text=str(data.get("评分", "") or ""),
+            room_type=data.get("房型", ""),
+            price_text=data.get("价格", ""),
+            lat=data.get("lat"),
+            lng=data.get("lng"),
+            price=data.get("价格数值"),
+            extra={key: value for key, value in data.items() if key not in known},
+        )
+
+    @classmethod
+    def coerce(cls, hotel: Any) -> "HotelRecord":
+        """已是 HotelRecord 时原样返回，字典（如备用酒店）转换为 HotelRecord"""
+        return hotel if isinstance(hotel, cls) else cls.from_dict(hotel or {})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def _fields(self) -> Dict[str, Any]:
+        fields = {"酒店名称": self.name, "评分": self.score_text, "房型": self.room_type, "价格": self.price_text}
+        if self.price is not None:
+            fields["价格数值"] = self.price
+        if self.lat is not None and self.lng is not None:
+            fields["lat"], fields["lng"] = self.lat, self.lng
+        fields.update(self.extra)
+        return fields
+
+    def __getitem__(self, key):
+        attr = _KEY_ATTRS.get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        return self._fields()[key]
+
+    def __iter__(self):
+        return iter(self._fields())
+
+    def __len__(self):
+        return len(self._fields())
+
+    def __repr__(self):
+        return f"HotelRecord({self.name!r}, price={self.price}, score={self.score})"
+
+
+class HotelIndex:
+    """
+    按价格升序（同价时评分降序）排好的酒店索引，每次搜索只排序一次
+
+    cheaper_than() 用二分查找定位价格上限，不再逐个重新解析价格字符串
+    """
+
+    def __init__(self, hotels: Iterable[Any]):
+        records = [HotelRecord.coerce(hotel) for hotel in hotels]
+        # 没有价格的酒店排在最后
+        self.records: List[HotelRecord] = sorted(
+            records, key=lambda r: (r.price is None, r.price or 0.0, -r.score)
+        )
+        self._prices = [r.price if r.price is not None else float("inf") for r in self.records]
+
+    def __len__(self):
+        return len(self.records)
+
+    def cheapest(self, excluded: Iterable[str] = ()) -> Optional[HotelRecord]:
+        """未排除的最便宜酒店（同价取评分高者）"""
+        excluded = set(excluded)
+        return next((r for r in self.records if r.name not in excluded), None)
+
+    def cheaper_than(self, price: float, excluded: Iterable[str] = ()) -> List[HotelRecord]:
+        """价格严格低于price且未排除的酒店，按价格升序、评分降序"""
+        excluded = set(excluded)
+        end = bisect_left(self._prices, price)
+        return [r for r in self.records[:end] if r.name not in excluded]
@@ -0,0 +1,208 @@
+"""
+共享HTTP客户端
+所有外部API（高德、和风天气等）共用一个带连接池的Session，
+统一处理连接/读取超时、429/5xx的指数退避重试、按服务商的请求限速，以及按服务商熔断
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import config
+from tools.circuit_breaker import OPEN, CircuitOpenError, get_breaker
+
+# 需要退避重试的HTTP状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 高德在HTTP 200中通过infocode返回的限流错误
+# 10004: 访问过于频繁, 10019/10020/10021: 并发量超限
+AMAP_THROTTLE_INFOCODES = {"10004", "10019", "10020", "10021"}
+
+
+class RateLimiter:
+    """令牌桶限速器（线程安全），按服务商的QPS限额发放请求许可"""
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        self.rate = max(float(rate_per_second), 0.001)
+        self.capacity = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """获取一个令牌，不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# 各服务商的QPS限额，未列出的服务商不限速
+PROVIDER_RATE_LIMITS = {
+    "amap": config.AMAP_QPS,
+    "qweather": config.QWEATHER_QPS,
+}
+
+_session = None
+_session_lock = threading.Lock()
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """获取共享Session（keep-alive连接池）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=config.HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Accept-Encoding": "gzip, deflate"})
+                _session = session
+    return _session
+
+
+def get_rate_limiter(provider: str) -> Optional[RateLimiter]:
+    """获取服务商对应的限速器，未配置限额时返回None"""
+    rate = PROVIDER_RATE_LIMITS.get(provider)
+    if not rate:
+        return None
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(rate)
+        return _limiters[provider]
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """计算第attempt次重试前的等待时间：优先遵循Retry-After，否则使用带抖动的指数退避"""
+    if retry_after:
+        try:
+            return min(float(retry_after), config.HTTP_BACKOFF_MAX)
+        except ValueError:
+            pass
+    ceiling = min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _is_throttled_payload(provider: str, payload: Any) -> bool:
+    """判断HTTP 200的响应体是否为服务商的限流错误"""
+    if provider == "amap" and isinstance(payload, dict):
+        return payload.get("status") == "0" and str(payload.get("infocode")) in AMAP_THROTTLE_INFOCODES
+    return False
+
+
+def request_get(provider: str, url: str, params: Optional[Dict[str, Any]] = None,
+                headers: Optional[Dict[str, str]] = None, timeout=None,
+                max_retries: Optional[int] = None) -> requests.Response:
+    """
+    发送GET请求
+
+    参数:
+        provider (str): 服务商标识（如 "amap"、"qweather"），用于限速
+        url (str): 请求地址
+        params (dict, 可选): 查询参数
+        headers (dict, 可选): 额外请求头
+        timeout (tuple, 可选): (连接超时, 读取超时)，默认取config
+        max_retries (int, 可选): 最大重试次数，默认取config
+
+    返回:
+        requests.Response: 最后一次请求的响应（重试用尽时可能为429/5xx）
+
+    异常:
+        requests.RequestException: 网络错误且重试用尽
+        CircuitOpenError: 服务商处于熔断状态（调用前已熔断时请求未发出；重试过程中熔断时停止重试）
+    """
+    return _send(provider, url, params, headers, timeout, max_retries, parse_json=False)[0]
+
+
+def get_json(provider: str, url: str, params: Optional[Dict[str, Any]] = None,
+             headers: Optional[Dict[str, str]] = None, timeout=None,
+             max_retries: Optional[int] = None) -> Dict[str, Any]:
+    """
+    发送GET请求并解析JSON，服务商在响应体中返回的限流错误同样按退避重试
+
+    HTTP层的429/5xx/网络错误与响应体中的限流错误共用同一个重试次数上限（参数同 request_get）
+    """
+    return _send(provider, url, params, headers, timeout, max_retries, parse_json=True)[1]
+
+
+def _send(provider: str, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]],
+          timeout, max_retries: Optional[int], parse_json: bool):
+    """
+    带限速、熔断和退避重试的GET请求，返回 (响应, 解析后的JSON或None)
+
+    parse_json为True时解析响应体，服务商的限流错误与HTTP层错误消耗同一份重试次数，
+    每次重试（无论原因）都重新获取限速令牌，单次调用最多发出 max_retries + 1 个请求
+    """
+    if timeout is None:
+        timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+    if max_retries is None:
+        max_retries = config.HTTP_MAX_RETRIES
+    limiter = get_rate_limiter(provider)
+    breaker = get_breaker(provider)
+    session = get_session()
+
+    # 熔断中不发出请求（也不等待限速令牌），由调用方立即降级。
+    # 熔断器只记录整次调用的最终结果：重试过程中的单次失败不计入失败率，
+    # 否则一次慢请求的多次重试就可能让min_calls较小的服务商（如携程）熔断
+    breaker.before_call()
+
+    def _finish(response):
+        # 5xx计为服务故障；429/限流说明服务可用，只是需要退避，不计入失败率
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    attempt = 0
+    while True:
+        if attempt and breaker.state == OPEN:
+            # 重试期间其他调用已触发熔断，不再继续重试
+            breaker.record_failure()
+            raise CircuitOpenError(f"{provider} 服务熔断中，停止重试")
+        if limiter:
+            limiter.acquire()
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                breaker.record_failure()
+                raise
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+            continue
+        except Exception:
+            breaker.record_failure()
+            raise
+
+        if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+            time.sleep(_backoff_delay(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+            continue
+        if not parse_json:
+            _finish(response)
+            return response, None
+
+        try:
+            payload = response.json()
+        except ValueError:
+            breaker.record_failure()
+            raise
+        if _is_throttled_payload(provider, payload) and attempt < max_retries:
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+            continue
+        _finish(response)
+        return response, payload
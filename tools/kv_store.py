@@ -0,0 +1,124 @@
+"""
+本地持久化键值缓存
+基于SQLite，支持按条目设置TTL、LRU淘汰，供地理编码、路线、酒店等查询结果跨会话复用
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class SQLiteTTLStore:
+    """
+    SQLite键值存储
+
+    - 值以JSON保存，None同样可以缓存（用于负缓存）
+    - 每个条目有独立的过期时间，过期条目读取时视为未命中
+    - 设置max_entries后，超出上限时按最近访问时间淘汰（LRU）
+    """
+
+    def __init__(self, path: str, table: str = "kv", max_entries: Optional[int] = None):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"非法的表名: {table}")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            (是否命中, 值)；命中的值可能为None（负缓存）
+        """
+        found = self.get_many([key])
+        if key in found:
+            return True, found[key]
+        return False, None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量读取，只返回命中且未过期的条目，并刷新其访问时间"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        result = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, now)
+                ).fetchall()
+                for key, value in rows:
+                    result[key] = json.loads(value)
+            if result:
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in result]
+                )
+        return result
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """写入单个条目，ttl单位为秒"""
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: float) -> None:
+        """批量写入，所有条目使用相同的ttl"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, json.dumps(value, ensure_ascii=False), now + ttl, now) for key, value in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """删除所有已过期条目，返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _evict(self) -> None:
+        """超出容量时先清理过期条目，再按最近访问时间淘汰（调用方需持有锁）"""
+        if not self.max_entries:
+            return
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
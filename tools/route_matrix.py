@@ -0,0 +1,284 @@
+"""
+景点路线矩阵预计算
+对固定的景点库，预先查询所有 景点×景点、景点×酒店锚点 的公共交通/驾车时间与费用，
+以紧凑的矩阵（uint16分钟、float32元）按景点库版本保存在磁盘上；
+规划时以内存映射方式加载，命中矩阵的路段不再需要实时查询。
+
+用法（建议每晚运行一次，可随时中断，再次运行会从断点继续；结束后同时离线拟合路线预测模型）：
+    python -m tools.route_matrix --qps 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import config
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_POI_FILE = os.path.join(DATA_DIR, "beijing_poi.json")
+DEFAULT_ANCHOR_FILE = os.path.join(DATA_DIR, "beijing_hotel_anchors.json")
+
+MODES = ("transit", "driving")
+
+# 分钟矩阵的特殊值
+PENDING = np.iinfo(np.uint16).max  # 尚未查询
+NO_ROUTE = PENDING - 1  # 已查询但高德没有可用方案
+MAX_MINUTES = NO_ROUTE - 1
+
+# 每完成多少个路段落盘一次（中断后最多丢失这么多路段的进度）
+FLUSH_EVERY = 50
+
+
+def point_key(coords: Tuple[float, float]) -> str:
+    """矩阵点的键：坐标按路线缓存相同的精度对齐"""
+    digits = config.ROUTE_CACHE_SNAP_DECIMALS
+    return f"{round(coords[0], digits):.{digits}f},{round(coords[1], digits):.{digits}f}"
+
+
+def catalog_version(points: List[Dict[str, Any]]) -> str:
+    """景点库版本：由所有矩阵点的名称、坐标和类型计算，景点库变化后自动生成新矩阵"""
+    digest = hashlib.sha1()
+    for point in points:
+        digest.update(f"{point['name']}|{point['key']}|{point['kind']}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def build_points(pois: List[Dict[str, Any]], anchors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """整理矩阵点：景点在前、酒店锚点在后，坐标相同的点只保留一个"""
+    points, seen = [], set()
+    for kind, items in (("poi", pois), ("anchor", anchors)):
+        for item in items:
+            location = item.get("location") or item
+            if location.get("lng") is None or location.get("lat") is None:
+                continue
+            coords = (float(location["lng"]), float(location["lat"]))
+            key = point_key(coords)
+            if key in seen:
+                continue
+            seen.add(key)
+            points.append({"name": item["name"], "lng": coords[0], "lat": coords[1], "key": key, "kind": kind})
+    return points
+
+
+def _matrix_paths(directory: str) -> Dict[str, str]:
+    return {
+        f"{mode}_{field}": os.path.join(directory, f"{mode}_{field}.npy")
+        for mode in MODES for field in ("minutes", "cost")
+    }
+
+
+class RouteMatrix:
+    """
+    已加载的路线矩阵（内存映射，只读）
+
+    lookup() 按起终点坐标查询，两种出行方式都已查询时返回结果，否则返回None
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self.index = {point["key"]: i for i, point in enumerate(self.manifest["points"])}
+        self.arrays = {name: np.load(path, mmap_mode="r") for name, path in _matrix_paths(directory).items()}
+
+    def lookup(self, origin: Tuple[float, float], destination: Tuple[float, float]):
+        """
+        返回:
+            ((公交分钟, 公交费用字符串), (出租车分钟, 出租车费用字符串))，未命中时返回None
+        """
+        i = self.index.get(point_key(origin))
+        j = self.index.get(point_key(destination))
+        if i is None or j is None or i == j:
+            return None
+        result = []
+        for mode in MODES:
+            minutes = int(self.arrays[f"{mode}_minutes"][i, j])
+            if minutes == PENDING:
+                return None
+            if minutes == NO_ROUTE:
+                result.append((None, None))
+            else:
+                result.append((float(minutes), f"{float(self.arrays[f'{mode}_cost'][i, j]):g}"))
+        return tuple(result)
+
+
+_matrix: Optional[RouteMatrix] = None
+_matrix_loaded = False
+_matrix_lock = threading.Lock()
+
+
+def get_route_matrix() -> Optional[RouteMatrix]:
+    """加载当前版本的路线矩阵（进程内只加载一次），未生成过矩阵时返回None"""
+    global _matrix, _matrix_loaded
+    if not _matrix_loaded:
+        with _matrix_lock:
+            if not _matrix_loaded:
+                current = os.path.join(config.ROUTE_MATRIX_DIR, "CURRENT")
+                if os.path.exists(current):
+                    with open(current, "r", encoding="utf-8") as f:
+                        version = f.read().strip()
+                    try:
+                        _matrix = RouteMatrix(os.path.join(config.ROUTE_MATRIX_DIR, version))
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"⚠️ 路线矩阵加载失败: {e}")
+                _matrix_loaded = True
+    return _matrix
+
+
+def _open_matrices(directory: str, size: int) -> Dict[str, np.ndarray]:
+    """打开（或新建）可写的矩阵文件；新建时分钟矩阵全部标记为未查询"""
+    arrays = {}
+    for name, path in _matrix_paths(directory).items():
+        if os.path.exists(path):
+            arrays[name] = np.load(path, mmap_mode="r+")
+            continue
+        dtype = np.uint16 if name.endswith("minutes") else np.float32
+        array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(size, size))
+        array[:] = PENDING if dtype == np.uint16 else np.nan
+        arrays[name] = array
+    return arrays
+
+
+def warmup(api_key: str, pois: List[Dict[str, Any]], anchors: List[Dict[str, Any]],
+           qps: float, workers: int = 4, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    预计算路线矩阵
+
+    参数:
+        api_key (str): 高德 API Key
+        pois (list): 景点列表（含 location）
+        anchors (list): 酒店锚点列表（含 lat/lng）
+        qps (float): 本任务的请求预算（次/秒），与全局 AMAP_QPS 限额同时生效
+        workers (int): 并发线程数
+        limit (int, 可选): 本次最多查询的路段数（用于分批运行）
+
+    返回:
+        dict: {"version", "directory", "total", "done", "remaining", "complete"}
+    """
+    from tools.http_client import RateLimiter
+    from tools.routeinf import get_leg
+
+    points = build_points(pois, anchors)
+    version = catalog_version(points)
+    directory = os.path.join(config.ROUTE_MATRIX_DIR, version)
+    os.makedirs(directory, exist_ok=True)
+
+    manifest_path = os.path.join(directory, "manifest.json")
+    manifest = {"version": version, "points": points, "created_at": time.time(), "complete": False}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    arrays = _open_matrices(directory, len(points))
+
+    # 待查询路段：景点↔景点、景点↔锚点（锚点之间不需要），已有结果的跳过
+    kinds = [point["kind"] for point in points]
+    pending = [
+        (i, j) for i in range(len(points)) for j in range(len(points))
+        if i != j and not (kinds[i] == "anchor" and kinds[j] == "anchor")
+        and any(arrays[f"{mode}_minutes"][i, j] == PENDING for mode in MODES)
+    ]
+    total = sum(
+        1 for i in range(len(points)) for j in range(len(points))
+        if i != j and not (kinds[i] == "anchor" and kinds[j] == "anchor")
+    )
+    batch = pending[:limit] if limit else pending
+    print(f"🗺️ 路线矩阵 {version}: {len(points)}个点，共{total}条路段，待查询{len(pending)}条，本次{len(batch)}条")
+
+    limiter = RateLimiter(qps)
+    lock = threading.Lock()
+    done = 0
+
+    def _compute(cell):
+        i, j = cell
+        origin = (points[i]["lng"], points[i]["lat"])
+        destination = (points[j]["lng"], points[j]["lat"])
+        values = {}
+        for mode in MODES:
+            # 只有真正发出请求时才消耗本任务的QPS预算，路线缓存命中不计
+            try:
+                values[mode] = get_leg(api_key, mode, origin, destination, before_fetch=limiter.acquire)
+            except Exception as e:
+                print(f"   ⚠️ {points[i]['name']} → {points[j]['name']} 查询失败: {e}")
+                return cell, None
+        return cell, values
+
+    def _store(cell, values):
+        i, j = cell
+        for mode, (minutes, cost) in values.items():
+            if minutes is None:  # 高德没有可用方案
+                arrays[f"{mode}_minutes"][i, j] = NO_ROUTE
+            else:
+                arrays[f"{mode}_minutes"][i, j] = min(int(round(minutes)), MAX_MINUTES)
+                arrays[f"{mode}_cost"][i, j] = float(cost)
+
+    def _flush():
+        for array in arrays.values():
+            array.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for cell, values in executor.map(_compute, batch):
+            if values is None:
+                continue  # 保持未查询状态，下次运行重试
+            with lock:
+                _store(cell, values)
+                done += 1
+                if done % FLUSH_EVERY == 0:
+                    _flush()
+                    print(f"   进度: {done}/{len(batch)}")
+    _flush()
+
+    remaining = len(pending) - done
+    manifest["complete"] = remaining == 0
+    manifest["updated_at"] = time.time()
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    if manifest["complete"]:
+        with open(os.path.join(config.ROUTE_MATRIX_DIR, "CURRENT"), "w", encoding="utf-8") as f:
+            f.write(version)
+        print(f"✅ 路线矩阵 {version} 已完成并设为当前版本")
+    else:
+        print(f"⏸️ 本次完成{done}条，剩余{remaining}条，再次运行将从断点继续")
+
+    return {"version": version, "directory": directory, "total": total, "done": done,
+            "remaining": remaining, "complete": manifest["complete"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预计算景点间的路线矩阵")
+    parser.add_argument("--qps", type=float, default=config.AMAP_QPS, help="本任务的请求预算（次/秒）")
+    parser.add_argument("--workers", type=int, default=4, help="并发线程数")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多查询的路段数")
+    parser.add_argument("--poi-file", default=DEFAULT_POI_FILE, help="景点库文件")
+    parser.add_argument("--anchor-file", default=DEFAULT_ANCHOR_FILE, help="酒店锚点文件")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from src.poi_utils import load_poi_data
+
+    load_dotenv()
+    api_key = os.getenv("GAODE_API_KEY")
+    if not api_key:
+        parser.error("未配置高德API密钥，请在.env文件中设置 GAODE_API_KEY")
+
+    pois = load_poi_data(args.poi_file)
+    with open(args.anchor_file, "r", encoding="utf-8") as f:
+        anchors = json.load(f)
+    warmup(api_key, pois, anchors, qps=args.qps, workers=args.workers, limit=args.limit)
+
+    # 预热时离线拟合路线预测模型并保存到CACHE_DIR，规划进程启动时加载，查询路径上不拟合
+    if config.ROUTE_MODEL_ENABLED:
+        from tools.route_model import get_travel_time_model
+        fitted = get_travel_time_model().fit_all()
+        print(f"📈 路线预测模型拟合: {fitted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+基于历史路线观测的出行时间/费用预测
+每次高德返回的路线结果都记录到本地SQLite，积累到一定样本后用分位数梯度提升回归
+拟合 (起点, 终点, 出行方式) → (分钟, 费用)，给出带置信区间的快速估算。
+拟合只在离线任务中进行（python -m tools.route_matrix 预热结束后调用 fit_all），
+模型保存到CACHE_DIR，规划进程启动时加载，查询路径上从不拟合。
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import config
+from tools.subway_estimator import MAX_ACCESS_WALK_KM, estimate_route, get_subway_network, haversine_km
+
+MODES = ("transit", "driving")
+TARGETS = ("minutes", "cost")
+QUANTILES = (0.1, 0.5, 0.9)  # 80%置信区间的下界、中位数、上界
+
+# 天安门，用于描述起终点所处的环线位置
+CITY_CENTER = (116.3975, 39.9087)
+
+# 北京各区政府驻地 (名称, lng, lat, 圈层)；圈层 0: 首都功能核心区, 1: 城六区其余, 2: 近郊, 3: 远郊。
+# 任意坐标不带行政区划（景点库只有经纬度），按最近的区驻地归区，足以区分跨区/同区出行
+BEIJING_DISTRICTS = (
+    ("东城区", 116.416, 39.928, 0), ("西城区", 116.366, 39.912, 0),
+    ("朝阳区", 116.443, 39.921, 1), ("海淀区", 116.298, 39.959, 1),
+    ("丰台区", 116.287, 39.858, 1), ("石景山区", 116.223, 39.906, 1),
+    ("门头沟区", 116.102, 39.940, 2), ("房山区", 116.143, 39.748, 2),
+    ("通州区", 116.657, 39.910, 2), ("顺义区", 116.655, 40.130, 2),
+    ("昌平区", 116.231, 40.221, 2), ("大兴区", 116.341, 39.727, 2),
+    ("怀柔区", 116.632, 40.316, 3), ("平谷区", 117.121, 40.141, 3),
+    ("密云区", 116.843, 40.377, 3), ("延庆区", 115.975, 40.457, 3),
+)
+_DISTRICT_LNG = np.array([district[1] for district in BEIJING_DISTRICTS])
+_DISTRICT_LAT = np.array([district[2] for district in BEIJING_DISTRICTS])
+DISTRICT_RINGS = 4
+
+# 特征定义变化时递增，旧版本保存的模型不再加载
+FEATURE_VERSION = 2
+
+
+def district_of(lng: float, lat: float) -> int:
+    """坐标所属的区（BEIJING_DISTRICTS 的下标，按最近的区驻地判断）"""
+    return int(np.argmin(haversine_km(lat, lng, _DISTRICT_LAT, _DISTRICT_LNG)))
+
+
+def _district_pair(origin: Tuple[float, float], destination: Tuple[float, float]) -> List[float]:
+    """区对编码：起终点所在圈层、圈层对（起点圈层×4+终点圈层）、是否同区"""
+    origin_district = district_of(*origin)
+    destination_district = district_of(*destination)
+    origin_ring = BEIJING_DISTRICTS[origin_district][3]
+    destination_ring = BEIJING_DISTRICTS[destination_district][3]
+    return [
+        float(origin_ring),
+        float(destination_ring),
+        float(origin_ring * DISTRICT_RINGS + destination_ring),
+        float(origin_district == destination_district),
+    ]
+
+
+def _features(origin: Tuple[float, float], destination: Tuple[float, float]) -> List[float]:
+    """
+    构造特征：直线/路网距离、离线地铁估算、起终点到市中心的距离、区对编码、起终点到最近地铁站的步行距离
+    """
+    (lng1, lat1), (lng2, lat2) = origin, destination
+    estimate = estimate_route(origin, destination)
+    network = get_subway_network()
+
+    def _access_km(lat, lng):
+        stations = network.access_stations(lat, lng)
+        return min((km for _, km in stations), default=MAX_ACCESS_WALK_KM * 2)
+
+    return [
+        float(haversine_km(lat1, lng1, lat2, lng2)),
+        estimate["road_km"],
+        estimate["transit_minutes"],
+        estimate["taxi_minutes"],
+        float(haversine_km(lat1, lng1, CITY_CENTER[1], CITY_CENTER[0])),
+        float(haversine_km(lat2, lng2, CITY_CENTER[1], CITY_CENTER[0])),
+        *_district_pair(origin, destination),
+        _access_km(lat1, lng1),
+        _access_km(lat2, lng2),
+    ]
+
+
+class TravelTimeModel:
+    """
+    路线观测记录与分位数回归预测
+
+    - record(): 记录一次真实的路线查询结果（同时更新内存中的样本计数）
+    - fit()/fit_all(): 离线拟合（每种出行方式的每个目标分别拟合三个分位数模型），完成后整体替换并保存到 model_path
+    - predict()/predict_modes(): 只使用已拟合（或启动时加载）的模型，返回 {"minutes": (下界, 中位数, 上界), "cost": (...)}，
+      没有模型时返回None；预测路径上从不触发拟合
+    """
+
+    def __init__(self, path: str, min_samples: int = 50, model_path: Optional[str] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.min_samples = min_samples
+        self.model_path = model_path
+        self._lock = threading.Lock()
+        self._fit_lock = threading.Lock()  # 同一时间只运行一个拟合任务
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS observations ("
+            "mode TEXT, origin_lng REAL, origin_lat REAL, dest_lng REAL, dest_lat REAL, "
+            "minutes REAL, cost REAL, observed_at REAL)"
+        )
+        self._counts: Dict[str, int] = dict(
+            self._conn.execute("SELECT mode, COUNT(*) FROM observations GROUP BY mode").fetchall()
+        )
+        self._models: Dict[str, Dict[str, list]] = {}
+        self._fitted_counts: Dict[str, int] = {}
+        self._load_models()
+
+    def _load_models(self) -> None:
+        """加载离线任务保存的模型；文件不存在、损坏或特征版本不一致时忽略"""
+        if not self.model_path or not os.path.exists(self.model_path):
+            return
+        try:
+            with open(self.model_path, "rb") as f:
+                saved = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ 路线预测模型加载失败: {e}")
+            return
+        if saved.get("feature_version") == FEATURE_VERSION:
+            self._models = saved["models"]
+            self._fitted_counts = saved["fitted_counts"]
+
+    def _save_models(self) -> None:
+        """保存当前模型（先写临时文件再替换，读取方不会看到写了一半的文件）"""
+        if not self.model_path:
+            return
+        with self._lock:
+            saved = {"feature_version": FEATURE_VERSION, "models": self._models, "fitted_counts": self._fitted_counts}
+        temp_path = f"{self.model_path}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(saved, f)
+        os.replace(temp_path, self.model_path)
+
+    def record(self, mode: str, origin: Tuple[float, float], destination: Tuple[float, float],
+               minutes: float, cost: float) -> None:
+        """记录一次观测"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (mode, origin[0], origin[1], destination[0], destination[1], minutes, cost, time.time())
+            )
+            self._counts[mode] = self._counts.get(mode, 0) + 1
+
+    def sample_count(self, mode: str) -> int:
+        with self._lock:
+            return self._counts.get(mode, 0)
+
+    def fit(self, mode: str) -> bool:
+        """用该出行方式的全部观测拟合分位数模型（耗时较长，只在离线任务中调用），样本不足时返回False"""
+        from sklearn.ensemble import GradientBoostingRegressor
+
+        with self._fit_lock:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT origin_lng, origin_lat, dest_lng, dest_lat, minutes, cost FROM observations WHERE mode = ?",
+                    (mode,)
+                ).fetchall()
+            if len(rows) < self.min_samples:
+                return False
+
+            X = np.array([_features((r[0], r[1]), (r[2], r[3])) for r in rows])
+            targets = {"minutes": np.array([r[4] for r in rows]), "cost": np.array([r[5] for r in rows])}
+            models = {}
+            for target, y in targets.items():
+                models[target] = [
+                    GradientBoostingRegressor(loss="quantile", alpha=q, n_estimators=100, max_depth=3).fit(X, y)
+                    for q in QUANTILES
+                ]
+            # 整体替换，预测方要么看到旧模型要么看到新模型
+            with self._lock:
+                self._models = {**self._models, mode: models}
+                self._fitted_counts = {**self._fitted_counts, mode: len(rows)}
+            self._save_models()
+            return True
+
+    def fit_all(self) -> Dict[str, bool]:
+        """离线拟合所有出行方式并保存（供预热任务调用）"""
+        return {mode: self.fit(mode) for mode in MODES}
+
+    def predict_modes(self, modes, origin: Tuple[float, float],
+                      destination: Tuple[float, float]) -> Dict[str, Optional[Dict[str, Tuple[float, float, float]]]]:
+        """
+        一次预测多种出行方式（特征只计算一次）
+
+        Returns:
+            {出行方式: {"minutes": (下界, 中位数, 上界), "cost": (...)} 或 None（尚未离线拟合）}
+        """
+        models = self._models
+        if not any(mode in models for mode in modes):
+            return {mode: None for mode in modes}
+        x = np.array([_features(origin, destination)])
+        results = {}
+        for mode in modes:
+            if mode not in models:
+                results[mode] = None
+                continue
+            result = {}
+            for target in TARGETS:
+                low, mid, high = sorted(max(0.0, float(model.predict(x)[0])) for model in models[mode][target])
+                result[target] = (round(low, 1), round(mid, 1), round(high, 1))
+            results[mode] = result
+        return results
+
+    def predict(self, mode: str, origin: Tuple[float, float],
+                destination: Tuple[float, float]) -> Optional[Dict[str, Tuple[float, float, float]]]:
+        """
+        预测出行时间与费用
+
+        Returns:
+            {"minutes": (下界, 中位数, 上界), "cost": (下界, 中位数, 上界)}；尚未离线拟合时返回None
+        """
+        return self.predict_modes((mode,), origin, destination)[mode]
+
+
+_model: Optional[TravelTimeModel] = None
+_model_lock = threading.Lock()
+
+
+def get_travel_time_model() -> TravelTimeModel:
+    """进程内共享的预测模型（观测数据与离线拟合的模型保存在CACHE_DIR）"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = TravelTimeModel(os.path.join(config.CACHE_DIR, "route_observations.sqlite3"),
+                                         min_samples=config.ROUTE_MODEL_MIN_SAMPLES,
+                                         model_path=os.path.join(config.CACHE_DIR, "route_model.pkl"))
+    return _model
+
+
+def _overlaps(a: Tuple[float, float, float], b: Tuple[float, float, float]) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2]
+
+
+def confident_estimate(origin: Tuple[float, float],
+                       destination: Tuple[float, float]) -> Optional[Dict[str, Dict[str, Tuple[float, float, float]]]]:
+    """
+    判断预测是否足以替代真实查询
+
+    只有两种方式的时间区间都足够窄（相对宽度不超过ROUTE_MODEL_MAX_SPREAD），
+    且公共交通与出租车的时间区间、费用区间都不重叠（即"哪种更快/更便宜"不会因误差改变）时，
+    才返回 {"transit": 预测, "driving": 预测}，否则返回None，由调用方查询高德API。
+    """
+    predictions = get_travel_time_model().predict_modes(MODES, origin, destination)
+    for mode, prediction in predictions.items():
+        if prediction is None:
+            return None
+        low, mid, high = prediction["minutes"]
+        if mid <= 0 or (high - low) / mid > config.ROUTE_MODEL_MAX_SPREAD:
+            return None
+
+    transit, driving = predictions["transit"], predictions["driving"]
+    if _overlaps(transit["minutes"], driving["minutes"]) or _overlaps(transit["cost"], driving["cost"]):
+        return None
+    return predictions
@@ -1,34 +1,173 @@
+import asyncio
+import os
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from tools.http_client import get_json
+from tools.kv_store import SQLiteTTLStore
+from tools.route_matrix import get_route_matrix
+from tools.route_model import confident_estimate, get_travel_time_model
+from tools import singleflight
+
+# 高德批量地理编码每次最多10个地址
+GEOCODE_BATCH_SIZE = 10
+
+# 高德距离测量每次最多100个起点（对应1个终点）
+DISTANCE_MAX_ORIGINS = 100
+
+# 距离测量的type参数
+DISTANCE_TYPES = {"straight": 0, "driving": 1, "walking": 3}
+
+
+class RouteQueryError(RuntimeError):
+    """高德路线查询返回错误（与"没有可用方案"区分，结果不缓存）"""
+
+
+_geocode_store = None
+_geocode_store_lock = threading.Lock()
+_route_store = None
+_route_store_lock = threading.Lock()
+
+
+def _get_geocode_store():
+    """地理编码持久化缓存（按规范化地址索引）"""
+    global _geocode_store
+    if _geocode_store is None:
+        with _geocode_store_lock:
+            if _geocode_store is None:
+                _geocode_store = SQLiteTTLStore(os.path.join(config.CACHE_DIR, "geocode.sqlite3"), table="geocode")
+    return _geocode_store
+
+
+def _get_route_store():
+    """路线持久化缓存（按对齐后的起终点坐标 + 出行方式索引，LRU淘汰）"""
+    global _route_store
+    if _route_store is None:
+        with _route_store_lock:
+            if _route_store is None:
+                _route_store = SQLiteTTLStore(os.path.join(config.CACHE_DIR, "routes.sqlite3"), table="routes",
+                                              max_entries=config.ROUTE_CACHE_MAX_ENTRIES)
+    return _route_store
+
+
+def normalize_address(address):
+    """规范化地址作为缓存键：全角转半角、去除空白、英文小写"""
+    return "".join(unicodedata.normalize("NFKC", address).split()).lower()
+
+
+def _parse_location(location):
+    """解析高德返回的 "lon,lat"，批量模式下编码失败的条目可能为空字符串或空列表"""
+    if isinstance(location, str) and "," in location:
+        return tuple(map(float, location.split(",")))
+    return None
+
+
+def geocode_addresses(api_key, addresses):
+    """
+    批量将地址转换为经纬度坐标
+
+    先查本地持久化缓存，未命中的地址按每批10个调用高德批量地理编码。
+    编码成功的结果长期缓存，明确编码失败的地址做负缓存，
+    请求异常等临时错误不写入缓存。
+
+    参数:
+        api_key (str): 高德 API Key
+        addresses (list[str]): 地址列表
+
+    返回:
+        dict: {地址: (lon, lat) 或 None}
+    """
+    store = _get_geocode_store()
+    keys = {address: normalize_address(address) for address in addresses}
+    cached = store.get_many(keys.values())
+
+    misses = list(dict.fromkeys(key for key in keys.values() if key not in cached))
+    resolved = {}
+    url = f"{config.AMAP_API_BASE}/v3/geocode/geo"
+    for start in range(0, len(misses), GEOCODE_BATCH_SIZE):
+        batch = misses[start:start + GEOCODE_BATCH_SIZE]
+        params = {
+            "key": api_key,
+            "address": "|".join(batch),
+            "batch": "true"
+        }
+        res = singleflight.do(f"geocode:{params['address']}", get_json, "amap", url, params=params)
+        geocodes = res.get("geocodes") or []
+        if res.get("status") != "1" or len(geocodes) != len(batch):
+            continue
+        found, failed = {}, {}
+        for key, item in zip(batch, geocodes):
+            coords = _parse_location(item.get("location"))
+            if coords:
+                found[key] = list(coords)
+            else:
+                failed[key] = None
+        store.set_many(found, config.GEOCODE_CACHE_TTL)
+        store.set_many(failed, config.GEOCODE_NEGATIVE_TTL)
+        resolved.update(found)
+        resolved.update(failed)
+
+    result = {}
+    for address, key in keys.items():
+        value = cached[key] if key in cached else resolved.get(key)
+        result[address] = tuple(value) if value else None
+    return result
 
-import requests
 
 def geocode_address(api_key, address):
     """
     将地址转换为经纬度坐标
     """
-    url = "https://restapi.amap.com/v3/geocode/geo"
-    params = {
-        "key": api_key,
-        "address": address
-    }
-    res = requests.get(url, params=params).json()
-    if res.get("status") == "1" and res.get("geocodes"):
-        location = res["geocodes"][0]["location"]  # "lon,lat"
-        return tuple(map(float, location.split(",")))
+    return geocode_addresses(api_key, [address]).get(address)
+
+
+def cached_coordinates(place):
+    """
+    不发请求地确定地点坐标：坐标形式直接返回，普通地址只查本地地理编码缓存
+
+    返回:
+        tuple: (lon, lat)；地址未缓存或编码失败时返回 None
+    """
+    coords = as_coordinates(place)
+    if coords or not isinstance(place, str):
+        return coords
+    found, value = _get_geocode_store().get(normalize_address(place))
+    return tuple(value) if found and value else None
+
+
+def as_coordinates(place):
+    """
+    识别坐标形式的地点，返回 (lon, lat)；普通地址返回 None
+
+    支持 (lon, lat) 元组/列表，以及高德格式的 "lon,lat" 字符串
+    """
+    if isinstance(place, (tuple, list)) and len(place) == 2:
+        return float(place[0]), float(place[1])
+    if isinstance(place, str) and place.count(",") == 1:
+        try:
+            lon, lat = (float(part) for part in place.split(","))
+        except ValueError:
+            return None
+        return lon, lat
     return None
 
 
-def get_route_info(api_key, origin_addr, destination_addr):
+def get_route_info(api_key, origin_addr, destination_addr, origin_name=None, destination_name=None):
     """
-    获取两个地址之间的出行信息（公共交通 & 出租车）
+    获取两个地点之间的出行信息（公共交通 & 出租车）
 
     功能:
-        先将出发地和目的地地址解析为经纬度，再调用高德路线 API
+        地点为坐标时直接使用，为地址时先解析为经纬度，再调用高德路线 API
         获取公共交通最短时间/费用 & 出租车最短时间/费用。
 
     参数:
         api_key (str): 高德 API Key
-        origin_addr (str): 出发地地址
-        destination_addr (str): 目的地地址
+        origin_addr (str | tuple): 出发地地址，或 (lon, lat) / "lon,lat" 坐标
+        destination_addr (str | tuple): 目的地地址，或 (lon, lat) / "lon,lat" 坐标
+        origin_name (str, 可选): 出发地显示名称，默认使用 origin_addr
+        destination_name (str, 可选): 目的地显示名称，默认使用 destination_addr
 
     返回:
         dict: {
@@ -40,56 +179,378 @@ def get_route_info(api_key, origin_addr, destination_addr):
             "出租车费用": str
         }
     """
-    # 1. 地址转经纬度
-    origin_coords = geocode_address(api_key, origin_addr)
-    dest_coords = geocode_address(api_key, destination_addr)
+    # 1. 坐标直接使用，地址转经纬度（一次批量请求，已缓存的地址不再请求）
+    origin_coords, dest_coords = _resolve_endpoints(api_key, origin_addr, destination_addr)
+
+    # 2. 优先使用预计算的路线矩阵；路线缓存都未命中时，预测模型足够可靠则直接使用预测结果
+    shortcut = _route_shortcut(origin_coords, dest_coords)
+    if shortcut:
+        transit, driving, estimated = shortcut
+        return _route_result(origin_addr, destination_addr, origin_coords, dest_coords, origin_name, destination_name,
+                             transit, driving, estimated=estimated)
+
+    # 3. 公共交通 & 出租车方案（优先读取路线缓存）
+    bus_time, bus_cost = _cached_leg("transit", origin_coords, dest_coords,
+                                     lambda: _fetch_transit(api_key, origin_coords, dest_coords))
+    taxi_time, taxi_cost = _cached_leg("driving", origin_coords, dest_coords,
+                                       lambda: _fetch_driving(api_key, origin_coords, dest_coords))
+
+    return _route_result(origin_addr, destination_addr, origin_coords, dest_coords, origin_name, destination_name,
+                         (bus_time, bus_cost), (taxi_time, taxi_cost))
+
+
+def _resolve_endpoints(api_key, origin_addr, destination_addr):
+    """解析起终点坐标：坐标直接使用，地址通过（缓存的）批量地理编码解析"""
+    origin_coords = as_coordinates(origin_addr)
+    dest_coords = as_coordinates(destination_addr)
+    addresses = [place for place, place_coords in ((origin_addr, origin_coords), (destination_addr, dest_coords))
+                 if place_coords is None]
+    if addresses:
+        geocoded = geocode_addresses(api_key, addresses)
+        origin_coords = origin_coords or geocoded.get(origin_addr)
+        dest_coords = dest_coords or geocoded.get(destination_addr)
 
     if not origin_coords or not dest_coords:
         raise ValueError("地理编码失败，请检查输入地址")
+    return origin_coords, dest_coords
 
-    origin = f"{origin_coords[0]},{origin_coords[1]}"
-    destination = f"{dest_coords[0]},{dest_coords[1]}"
 
-    # 2. 公共交通方案
-    bus_url = "https://restapi.amap.com/v3/direction/transit/integrated"
+def _route_result(origin_addr, destination_addr, origin_coords, dest_coords, origin_name, destination_name,
+                  transit, driving, estimated=False):
+    """组装 get_route_info 的返回结构，预测模型给出的结果带 "估算" 标记"""
+    bus_time, bus_cost = transit
+    taxi_time, taxi_cost = driving
+    result = {
+        "出发地": origin_name or (origin_addr if isinstance(origin_addr, str) else _format_coords(origin_coords)),
+        "目的地": destination_name or (destination_addr if isinstance(destination_addr, str) else _format_coords(dest_coords)),
+        "公共交通最短时间": bus_time,
+        "公共交通费用": bus_cost + "元" if bus_cost is not None else None,
+        "出租车最短时间": taxi_time,
+        "出租车费用": taxi_cost + "元" if taxi_cost is not None else None
+    }
+    if estimated:
+        result["估算"] = True
+    return result
+
+
+def _route_shortcut(origin_coords, dest_coords):
+    """
+    无需实时查询的路线结果：先查预计算路线矩阵，再尝试预测模型
+
+    返回:
+        (公交结果, 出租车结果, 是否为估算)；都不可用时返回None
+    """
+    if config.ROUTE_MATRIX_ENABLED:
+        matrix = get_route_matrix()
+        hit = matrix.lookup(origin_coords, dest_coords) if matrix else None
+        if hit:
+            return hit[0], hit[1], False
+    estimated = _model_estimate(origin_coords, dest_coords)
+    if estimated:
+        return estimated[0], estimated[1], True
+    return None
+
+
+def _model_estimate(origin_coords, dest_coords):
+    """
+    路线缓存未命中时尝试使用预测模型
+
+    返回:
+        ((公交分钟, 公交费用), (出租车分钟, 出租车费用))；缓存已有结果、模型未启用或不够可靠时返回None
+    """
+    if not config.ROUTE_MODEL_ENABLED:
+        return None
+    keys = [_route_cache_key(mode, origin_coords, dest_coords) for mode in ("transit", "driving")]
+    if _get_route_store().get_many(keys):
+        return None  # 有真实结果时优先使用缓存
+    prediction = confident_estimate(origin_coords, dest_coords)
+    if prediction is None:
+        return None
+    return tuple(
+        (prediction[mode]["minutes"][1], f"{prediction[mode]['cost'][1]:g}")
+        for mode in ("transit", "driving")
+    )
+
+
+def _format_coords(coords):
+    return f"{coords[0]},{coords[1]}"
+
+
+def _fetch_transit(api_key, origin_coords, dest_coords):
+    """
+    查询公共交通最快方案
+
+    返回:
+        (分钟, 费用字符串) ；高德无可用方案时为 (None, None)，请求失败时返回 None
+    """
+    bus_url = f"{config.AMAP_API_BASE}/v3/direction/transit/integrated"
     bus_params = {
         "key": api_key,
-        "origin": origin,
-        "destination": destination,
+        "origin": _format_coords(origin_coords),
+        "destination": _format_coords(dest_coords),
         "city": "北京",
         "cityd": "北京",
         "strategy": 0  # 0 = 最快捷
     }
-    bus_res = requests.get(bus_url, params=bus_params).json()
+    bus_res = get_json("amap", bus_url, params=bus_params)
+    if bus_res.get("status") != "1":
+        return None
 
-    bus_time = None
-    bus_cost = None
-    if bus_res.get("status") == "1" and bus_res.get("route", {}).get("transits"):
-        fastest_transit = min(bus_res["route"]["transits"], key=lambda x: float(x["duration"]))
-        bus_time = round(float(fastest_transit["duration"]) / 60, 1)
-        bus_cost = fastest_transit.get("cost", "0") + "元"
+    if not bus_res.get("route", {}).get("transits"):
+        return None, None
+    fastest_transit = min(bus_res["route"]["transits"], key=lambda x: float(x["duration"]))
+    bus_cost = fastest_transit.get("cost")
+    return round(float(fastest_transit["duration"]) / 60, 1), bus_cost if isinstance(bus_cost, str) and bus_cost else "0"
 
-    # 3. 出租车方案
-    taxi_url = "https://restapi.amap.com/v3/direction/driving"
+
+def _fetch_driving(api_key, origin_coords, dest_coords):
+    """
+    查询驾车（出租车）最快方案
+
+    返回:
+        (分钟, 费用字符串) ；高德无可用方案时为 (None, None)，请求失败时返回 None
+    """
+    taxi_url = f"{config.AMAP_API_BASE}/v3/direction/driving"
     taxi_params = {
         "key": api_key,
-        "origin": origin,
-        "destination": destination
-    }
-    taxi_res = requests.get(taxi_url, params=taxi_params).json()
-
-    taxi_time = None
-    taxi_cost = None
-    if taxi_res.get("status") == "1" and taxi_res.get("route", {}).get("paths"):
-        fastest_taxi = min(taxi_res["route"]["paths"], key=lambda x: float(x["duration"]))
-        taxi_time = round(float(fastest_taxi["duration"]) / 60, 1)
-        taxi_cost = taxi_res["route"].get("taxi_cost", "0") + "元"
-
-    return {
-        "出发地": origin_addr,
-        "目的地": destination_addr,
-        "公共交通最短时间": bus_time,
-        "公共交通费用": bus_cost,
-        "出租车最短时间": taxi_time,
-        "出租车费用": taxi_cost
+        "origin": _format_coords(origin_coords),
+        "destination": _format_coords(dest_coords)
     }
+    taxi_res = get_json("amap", taxi_url, params=taxi_params)
+    if taxi_res.get("status") != "1":
+        return None
+
+    if not taxi_res.get("route", {}).get("paths"):
+        return None, None
+    fastest_taxi = min(taxi_res["route"]["paths"], key=lambda x: float(x["duration"]))
+    taxi_cost = taxi_res["route"].get("taxi_cost")
+    return round(float(fastest_taxi["duration"]) / 60, 1), taxi_cost if isinstance(taxi_cost, str) and taxi_cost else "0"
+
+
+def _route_cache_key(mode, origin_coords, dest_coords):
+    """路线缓存键：起终点坐标按配置精度对齐到网格，附加出行方式"""
+    digits = config.ROUTE_CACHE_SNAP_DECIMALS
+    snapped = [f"{round(value, digits):.{digits}f}" for value in (*origin_coords, *dest_coords)]
+    return f"{mode}:{snapped[0]},{snapped[1]}>{snapped[2]},{snapped[3]}"
+
+
+def _cached_leg(mode, origin_coords, dest_coords, fetch, reuse_reverse=None, strict=False):
+    """
+    读取或查询单一出行方式的路线
+
+    缓存未命中时，若开启了反向近似（reuse_reverse，默认取 ROUTE_CACHE_REUSE_REVERSE），则用反方向的缓存结果近似；
+    仍未命中再调用 fetch 并写入缓存（同一路段的并发查询合并为一次）。
+    只有高德正常返回（含无可用方案）的结果才会缓存。
+    fetch 返回None（查询失败）时在合并的调用内抛出 RouteQueryError，所有等待同一结果的调用都能得知失败；
+    strict为False时失败返回 (None, None)，为True时抛出该异常。
+    """
+    if reuse_reverse is None:
+        reuse_reverse = config.ROUTE_CACHE_REUSE_REVERSE
+    store = _get_route_store()
+    key = _route_cache_key(mode, origin_coords, dest_coords)
+    found, value = store.get(key)
+    if not found and reuse_reverse:
+        found, value = store.get(_route_cache_key(mode, dest_coords, origin_coords))
+    if found:
+        return tuple(value)
+
+    def _fetch_and_store():
+        fetched = fetch()
+        if fetched is None:
+            raise RouteQueryError(f"高德{mode}路线查询失败")
+        store.set(key, list(fetched), config.ROUTE_CACHE_TTL)
+        if fetched[0] is not None:
+            get_travel_time_model().record(mode, origin_coords, dest_coords, fetched[0], float(fetched[1]))
+        return fetched
+
+    # 并发查询同一路段时只发出一次请求
+    try:
+        return singleflight.do(f"route:{key}", _fetch_and_store)
+    except RouteQueryError:
+        if strict:
+            raise
+        return None, None
+
+
+def get_leg(api_key, mode, origin_coords, dest_coords, before_fetch=None):
+    """
+    查询单一出行方式的路线（读写路线缓存，不使用路线矩阵、预测模型和反方向近似，结果均为实测）
+
+    参数:
+        mode (str): "transit" 或 "driving"
+        before_fetch (callable, 可选): 真正发出请求前调用（如额外的限速），缓存命中时不调用
+
+    返回:
+        (分钟, 费用字符串)；高德没有可用方案时为 (None, None)
+
+    异常:
+        RouteQueryError: 高德返回错误（包括合并到其他调用、由其发出的查询失败）
+    """
+    fetcher = {"transit": _fetch_transit, "driving": _fetch_driving}[mode]
+
+    def _fetch():
+        if before_fetch:
+            before_fetch()
+        return fetcher(api_key, origin_coords, dest_coords)
+
+    return _cached_leg(mode, origin_coords, dest_coords, _fetch, reuse_reverse=False, strict=True)
+
+
+def get_distance_matrix(api_key, origins, destinations, mode="driving"):
+    """
+    批量获取 N×M 的距离/时间矩阵
+
+    功能:
+        使用高德距离测量接口（每次请求最多100个起点对应1个终点），
+        每个终点只需 ceil(N/100) 次请求；已缓存的单元格不再请求。
+        只提供距离与时间，不含费用，适合聚类、排序等只需要路网距离的场景，
+        选定路段后再通过 get_route_info 查询公共交通/出租车详情。
+
+    参数:
+        api_key (str): 高德 API Key
+        origins (list): 起点列表，每项为地址或 (lon, lat) / "lon,lat" 坐标
+        destinations (list): 终点列表，格式同 origins
+        mode (str): "driving"（驾车，默认）、"walking"（步行）或 "straight"（直线）
+
+    返回:
+        dict: {
+            "distance_km": [[float | None]]  # N×M，行对应起点、列对应终点
+            "duration_min": [[float | None]]  # 无法计算的单元格为 None
+        }
+    """
+    if mode not in DISTANCE_TYPES:
+        raise ValueError(f"不支持的距离测量方式: {mode}")
+
+    # 1. 统一解析为坐标（地址一次批量编码）
+    places = list(origins) + list(destinations)
+    coords = [as_coordinates(place) for place in places]
+    addresses = [place for place, place_coords in zip(places, coords) if place_coords is None]
+    if addresses:
+        geocoded = geocode_addresses(api_key, addresses)
+        coords = [place_coords or geocoded.get(place) for place, place_coords in zip(places, coords)]
+    origin_coords = coords[:len(origins)]
+    dest_coords = coords[len(origins):]
+
+    distance_km = [[None] * len(dest_coords) for _ in origin_coords]
+    duration_min = [[None] * len(dest_coords) for _ in origin_coords]
+
+    # 2. 读取缓存，记录每个终点还缺哪些起点
+    store = _get_route_store()
+    cache_mode = f"distance-{mode}"
+    keys = {}
+    for i, o in enumerate(origin_coords):
+        for j, d in enumerate(dest_coords):
+            if o and d:
+                keys[(i, j)] = _route_cache_key(cache_mode, o, d)
+    cached = store.get_many(keys.values())
+
+    missing = {}
+    for (i, j), key in keys.items():
+        if key in cached:
+            distance_km[i][j], duration_min[i][j] = cached[key]
+        else:
+            missing.setdefault(j, []).append(i)
+
+    # 3. 按终点分组请求，起点每100个一批
+    url = f"{config.AMAP_API_BASE}/v3/distance"
+    for j, origin_indexes in missing.items():
+        for start in range(0, len(origin_indexes), DISTANCE_MAX_ORIGINS):
+            batch = origin_indexes[start:start + DISTANCE_MAX_ORIGINS]
+            params = {
+                "key": api_key,
+                "origins": "|".join(_format_coords(origin_coords[i]) for i in batch),
+                "destination": _format_coords(dest_coords[j]),
+                "type": DISTANCE_TYPES[mode]
+            }
+            res = singleflight.do(f"distance:{params['type']}:{params['destination']}:{params['origins']}",
+                                  get_json, "amap", url, params=params)
+            if res.get("status") != "1":
+                continue
+            fresh = {}
+            for item in res.get("results") or []:
+                try:
+                    i = batch[int(item["origin_id"]) - 1]
+                    value = [round(float(item["distance"]) / 1000, 3), round(float(item["duration"]) / 60, 1)]
+                except (KeyError, ValueError, IndexError, TypeError):
+                    continue  # 该起点无法计算（如步行距离超限）
+                distance_km[i][j], duration_min[i][j] = value
+                fresh[keys[(i, j)]] = value
+            store.set_many(fresh, config.ROUTE_CACHE_TTL)
+
+    return {"distance_km": distance_km, "duration_min": duration_min}
+
+_route_executor = None
+_route_executor_lock = threading.Lock()
+
+
+def _get_route_executor():
+    """路线请求线程池，大小与连接池一致；实际发出速率由共享令牌桶按AMAP_QPS控制"""
+    global _route_executor
+    if _route_executor is None:
+        with _route_executor_lock:
+            if _route_executor is None:
+                _route_executor = ThreadPoolExecutor(max_workers=config.HTTP_POOL_SIZE,
+                                                     thread_name_prefix="amap-route")
+    return _route_executor
+
+
+async def get_route_info_async(api_key, origin_addr, destination_addr, origin_name=None, destination_name=None):
+    """
+    get_route_info 的异步版本：同一路段的公共交通与驾车请求并发发出
+
+    参数与返回值同 get_route_info
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_route_executor()
+
+    origin_coords, dest_coords = await loop.run_in_executor(
+        executor, _resolve_endpoints, api_key, origin_addr, destination_addr)
+
+    shortcut = await loop.run_in_executor(executor, _route_shortcut, origin_coords, dest_coords)
+    if shortcut:
+        transit, driving, estimated = shortcut
+        return _route_result(origin_addr, destination_addr, origin_coords, dest_coords, origin_name, destination_name,
+                             transit, driving, estimated=estimated)
+
+    (bus_time, bus_cost), (taxi_time, taxi_cost) = await asyncio.gather(
+        loop.run_in_executor(executor, _cached_leg, "transit", origin_coords, dest_coords,
+                             lambda: _fetch_transit(api_key, origin_coords, dest_coords)),
+        loop.run_in_executor(executor, _cached_leg, "driving", origin_coords, dest_coords,
+                             lambda: _fetch_driving(api_key, origin_coords, dest_coords)),
+    )
+
+    return _route_result(origin_addr, destination_addr, origin_coords, dest_coords, origin_name, destination_name,
+                         (bus_time, bus_cost), (taxi_time, taxi_cost))
+
+
+async def get_routes_async(api_key, legs):
+    """
+    并发查询多条路段
+
+    参数:
+        api_key (str): 高德 API Key
+        legs (list[dict]): 路段列表，每项包含 origin、destination，可选 origin_name、destination_name
+
+    返回:
+        list: 与 legs 顺序一致的结果，查询失败的路段为对应的异常对象
+    """
+    tasks = [
+        get_route_info_async(api_key, leg["origin"], leg["destination"],
+                             leg.get("origin_name"), leg.get("destination_name"))
+        for leg in legs
+    ]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_routes_concurrently(api_key, legs):
+    """
+    同步入口：在事件循环中并发查询所有路段（参数与返回值同 get_routes_async）
+
+    调用方已处于事件循环中时，在独立线程里运行新的事件循环
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(get_routes_async(api_key, legs))
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        return runner.submit(asyncio.run, get_routes_async(api_key, legs)).result()
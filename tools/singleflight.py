@@ -0,0 +1,77 @@
+"""
+请求合并（singleflight）
+同一时刻对同一资源的多个并发请求只真正发出一次，其余请求等待并共享这次调用的结果或异常。
+供路线、地理编码、天气、酒店等外部查询共用，与持久化缓存互补：缓存解决"之后再问"，
+singleflight解决"同时在问"。
+"""
+
+import threading
+from typing import Any, Callable, Dict
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按key合并并发调用（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0  # 实际发出的调用次数
+        self.coalesced = 0  # 搭上已有调用、未单独发出的次数
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        执行 fn(*args, **kwargs)；若相同key的调用正在进行，则等待并返回它的结果
+
+        异常同样共享：进行中的调用抛出异常时，所有等待者都会收到该异常
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+# 各外部查询工具共用的实例，key以 "route:"、"geocode:"、"weather:"、"hotel:" 等前缀区分
+default_group = SingleFlight()
+
+
+def do(key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """在共享实例上合并执行，参见 SingleFlight.do"""
+    return default_group.do(key, fn, *args, **kwargs)
@@ -0,0 +1,339 @@
+"""
+离线出行时间/费用估算
+基于内置的北京地铁线网（data/beijing_subway.json）预先计算全站点最短路径，
+结合步行接驳、公交和出租车计价规则，给出确定性的路线估算。
+用于没有高德API Key或API调用失败时的兜底数据，也可在调用付费API前做快速剪枝。
+"""
+
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_SUBWAY_DATA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "beijing_subway.json"
+)
+
+EARTH_RADIUS_KM = 6371.0
+
+# 直线距离换算为实际路程的绕行系数
+WALK_DETOUR = 1.25
+ROAD_DETOUR = 1.35
+
+WALK_SPEED_KMH = 4.5
+MAX_WALK_ONLY_KM = 1.5  # 不超过该步行路程时直接步行
+MAX_ACCESS_WALK_KM = 2.0  # 步行到地铁站的最大路程
+ACCESS_CANDIDATES = 3  # 每端考虑的最近站点数
+HINT_STATION_MAX_KM = 3.0  # 景点标注的地铁站超过该距离视为标注不可靠
+SUBWAY_WAIT_MINUTES = 3.0
+
+BUS_WAIT_MINUTES = 10.0
+BUS_CITY_SPEED_KMH = 15.0  # 前10公里按市区车速
+BUS_SUBURB_SPEED_KMH = 35.0  # 远郊线路多走高速（如877路）
+
+TAXI_PICKUP_MINUTES = 5.0
+TAXI_CITY_SPEED_KMH = 22.0  # 前10公里按市区车速
+TAXI_SUBURB_SPEED_KMH = 45.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """球面距离（公里），支持numpy数组广播"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def subway_fare(distance_km: float) -> int:
+    """北京地铁票价：6公里内3元，6-12公里4元，12-22公里5元，22-32公里6元，此后每20公里加1元"""
+    if distance_km <= 6:
+        return 3
+    if distance_km <= 12:
+        return 4
+    if distance_km <= 22:
+        return 5
+    if distance_km <= 32:
+        return 6
+    return 6 + math.ceil((distance_km - 32) / 20)
+
+
+def bus_fare(distance_km: float) -> int:
+    """北京公交票价：10公里内2元，此后每5公里加1元"""
+    if distance_km <= 10:
+        return 2
+    return 2 + math.ceil((distance_km - 10) / 5)
+
+
+def taxi_fare(distance_km: float) -> int:
+    """北京出租车计价：3公里起步13元，3-15公里2.3元/公里，超过15公里部分加收50%空驶费"""
+    fare = 13.0
+    if distance_km > 3:
+        fare += (min(distance_km, 15) - 3) * 2.3
+    if distance_km > 15:
+        fare += (distance_km - 15) * 2.3 * 1.5
+    return int(round(fare))
+
+
+def bus_minutes(distance_km):
+    """公交耗时：候车时间 + 前10公里市区车速 + 其余路程郊区车速，支持numpy数组"""
+    city_km = np.minimum(distance_km, 10.0)
+    suburb_km = np.maximum(distance_km - 10.0, 0.0)
+    return BUS_WAIT_MINUTES + city_km / BUS_CITY_SPEED_KMH * 60 + suburb_km / BUS_SUBURB_SPEED_KMH * 60
+
+
+def taxi_minutes(distance_km):
+    """出租车耗时：候车时间 + 前10公里市区车速 + 其余路程郊区车速，支持numpy数组"""
+    city_km = np.minimum(distance_km, 10.0)
+    suburb_km = np.maximum(distance_km - 10.0, 0.0)
+    return TAXI_PICKUP_MINUTES + city_km / TAXI_CITY_SPEED_KMH * 60 + suburb_km / TAXI_SUBURB_SPEED_KMH * 60
+
+
+class SubwayNetwork:
+    """
+    地铁线网及全站点最短路径
+
+    图节点为（站点, 线路），同线相邻站按区间距离和线路速度计时，
+    同名站不同线路之间按换乘时间连接；加载时用Floyd–Warshall一次性算出
+    站点间的最短时间矩阵和对应的乘车距离矩阵（用于计算票价）。
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        transfer = float(data.get("transfer_minutes", 5))
+        dwell = float(data.get("dwell_minutes", 0.5))
+
+        # 1. 建立节点：（站点, 线路）
+        self.station_names: List[str] = []
+        station_index: Dict[str, int] = {}
+        station_coords: List[Tuple[float, float]] = []
+        node_station: List[int] = []
+        edges: List[Tuple[int, int, float, float]] = []  # (节点a, 节点b, 分钟, 公里)
+
+        for line in data["lines"]:
+            speed = float(line.get("speed_kmh", 35))
+            nodes = []
+            for station in line["stations"]:
+                name = station["name"]
+                if name not in station_index:
+                    station_index[name] = len(self.station_names)
+                    self.station_names.append(name)
+                    station_coords.append((float(station["lat"]), float(station["lng"])))
+                nodes.append(len(node_station))
+                node_station.append(station_index[name])
+            pairs = list(zip(nodes, nodes[1:]))
+            if line.get("loop") and len(nodes) > 2:
+                pairs.append((nodes[-1], nodes[0]))
+            for a, b in pairs:
+                (lat1, lng1), (lat2, lng2) = station_coords[node_station[a]], station_coords[node_station[b]]
+                km = float(haversine_km(lat1, lng1, lat2, lng2)) * 1.1  # 轨道线形略长于直线
+                edges.append((a, b, km / speed * 60 + dwell, km))
+
+        node_station_arr = np.array(node_station)
+        n_nodes = len(node_station)
+        self.station_index = station_index
+        self.station_coords = np.array(station_coords)
+
+        # 2. 节点级最短路径（时间为权重，同步记录对应路径的乘车距离）
+        time = np.full((n_nodes, n_nodes), np.inf)
+        dist = np.full((n_nodes, n_nodes), np.inf)
+        np.fill_diagonal(time, 0.0)
+        np.fill_diagonal(dist, 0.0)
+        for a, b, minutes, km in edges:
+            for i, j in ((a, b), (b, a)):
+                if minutes < time[i, j]:
+                    time[i, j], dist[i, j] = minutes, km
+        same_station = node_station_arr[:, None] == node_station_arr[None, :]
+        transfer_mask = same_station & ~np.eye(n_nodes, dtype=bool)
+        time[transfer_mask] = transfer
+        dist[transfer_mask] = 0.0
+
+        for k in range(n_nodes):
+            candidate = time[:, k:k + 1] + time[k:k + 1, :]
+            better = candidate < time
+            time = np.where(better, candidate, time)
+            dist = np.where(better, dist[:, k:k + 1] + dist[k:k + 1, :], dist)
+
+        # 3. 折叠为站点级矩阵：同名站取各线路节点间的最小值
+        n_stations = len(self.station_names)
+        self.time_min = np.full((n_stations, n_stations), np.inf)
+        self.ride_km = np.full((n_stations, n_stations), np.inf)
+        order = np.argsort(time, axis=None)
+        rows, cols = np.unravel_index(order, time.shape)
+        s_rows, s_cols = node_station_arr[rows], node_station_arr[cols]
+        # 按时间升序遍历，每个站点对保留第一次出现（即最短）的值
+        flat = s_rows * n_stations + s_cols
+        _, first = np.unique(flat, return_index=True)
+        self.time_min[s_rows[first], s_cols[first]] = time[rows[first], cols[first]]
+        self.ride_km[s_rows[first], s_cols[first]] = dist[rows[first], cols[first]]
+        np.fill_diagonal(self.time_min, 0.0)
+        np.fill_diagonal(self.ride_km, 0.0)
+
+    def access_stations(self, lat: float, lng: float, hint: Optional[str] = None) -> List[Tuple[int, float]]:
+        """
+        步行可达的候选站点
+
+        Returns:
+            [(站点下标, 步行公里)]，最近的若干站点；景点标注的站点在合理距离内时一并加入
+        """
+        walk_km = haversine_km(lat, lng, self.station_coords[:, 0], self.station_coords[:, 1]) * WALK_DETOUR
+        nearest = np.argsort(walk_km)[:ACCESS_CANDIDATES]
+        candidates = {int(i): float(walk_km[i]) for i in nearest if walk_km[i] <= MAX_ACCESS_WALK_KM}
+        hinted = self._match_station(hint)
+        if hinted is not None and walk_km[hinted] <= HINT_STATION_MAX_KM:
+            candidates[hinted] = float(walk_km[hinted])
+        return list(candidates.items())
+
+    def _match_station(self, hint: Optional[str]) -> Optional[int]:
+        """把景点库中 "天安门东站"、"环球度假区站（7号线/八通线）" 之类的描述匹配到站点"""
+        if not hint:
+            return None
+        name = hint.split("（")[0].split("(")[0].strip()
+        if name.endswith("站"):
+            name = name[:-1]
+        return self.station_index.get(name)
+
+
+_network: Optional[SubwayNetwork] = None
+_network_lock = threading.Lock()
+
+
+def get_subway_network() -> SubwayNetwork:
+    """加载内置线网并预计算最短路径（进程内只计算一次）"""
+    global _network
+    if _network is None:
+        with _network_lock:
+            if _network is None:
+                with open(DEFAULT_SUBWAY_DATA, "r", encoding="utf-8") as f:
+                    _network = SubwayNetwork(json.load(f))
+    return _network
+
+
+def estimate_route(origin: Tuple[float, float], destination: Tuple[float, float],
+                   origin_station: Optional[str] = None, destination_station: Optional[str] = None) -> Dict[str, Any]:
+    """
+    估算两点间的公共交通与出租车出行
+
+    参数:
+        origin (tuple): 出发地坐标 (lng, lat)，与高德坐标顺序一致
+        destination (tuple): 目的地坐标 (lng, lat)
+        origin_station (str, 可选): 出发地附近地铁站描述（如景点库的 nearby_subway）
+        destination_station (str, 可选): 目的地附近地铁站描述
+
+    返回:
+        dict: {
+            "transit_minutes": float, "transit_cost": int, "transit_mode": "步行"/"地铁"/"公交",
+            "taxi_minutes": float, "taxi_cost": int, "road_km": float
+        }
+    """
+    (lng1, lat1), (lng2, lat2) = origin, destination
+    straight_km = float(haversine_km(lat1, lng1, lat2, lng2))
+    road_km = straight_km * ROAD_DETOUR
+    walk_km = straight_km * WALK_DETOUR
+
+    # 公共交通：步行 / 地铁（含两端步行接驳）/ 公交，取最快
+    options = []
+    if walk_km <= MAX_WALK_ONLY_KM:
+        options.append((walk_km / WALK_SPEED_KMH * 60, 0, "步行"))
+
+    network = get_subway_network()
+    access = network.access_stations(lat1, lng1, origin_station)
+    egress = network.access_stations(lat2, lng2, destination_station)
+    if access and egress:
+        a_idx = np.array([i for i, _ in access])
+        a_walk = np.array([km for _, km in access])
+        e_idx = np.array([i for i, _ in egress])
+        e_walk = np.array([km for _, km in egress])
+        total = (a_walk[:, None] + e_walk[None, :]) / WALK_SPEED_KMH * 60 + network.time_min[np.ix_(a_idx, e_idx)]
+        best = np.unravel_index(np.argmin(total), total.shape)
+        if np.isfinite(total[best]):
+            ride_km = network.ride_km[a_idx[best[0]], e_idx[best[1]]]
+            options.append((float(total[best]) + SUBWAY_WAIT_MINUTES, subway_fare(ride_km), "地铁"))
+
+    options.append((float(bus_minutes(road_km)), bus_fare(road_km), "公交"))
+    transit_minutes, transit_cost, transit_mode = min(options, key=lambda option: option[0])
+
+    return {
+        "transit_minutes": round(transit_minutes, 1),
+        "transit_cost": transit_cost,
+        "transit_mode": transit_mode,
+        "taxi_minutes": round(float(taxi_minutes(road_km)), 1),
+        "taxi_cost": taxi_fare(road_km),
+        "road_km": round(road_km, 2),
+    }
+
+
+def _access_arrays(network: SubwayNetwork, points: np.ndarray,
+                   stations: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    各点的候选站点，补齐为定长数组
+
+    Returns:
+        (站点下标, 步行公里)，形状均为 (点数, ACCESS_CANDIDATES + 1)；空位的步行公里为inf
+    """
+    index = np.zeros((len(points), ACCESS_CANDIDATES + 1), dtype=int)
+    walk = np.full((len(points), ACCESS_CANDIDATES + 1), np.inf)
+    for row, ((lng, lat), hint) in enumerate(zip(points, stations)):
+        for col, (station, km) in enumerate(network.access_stations(lat, lng, hint)):
+            index[row, col], walk[row, col] = station, km
+    return index, walk
+
+
+def estimate_route_matrix(origins: List[Tuple[float, float]], destinations: List[Tuple[float, float]],
+                          origin_stations: Optional[List[Optional[str]]] = None,
+                          destination_stations: Optional[List[Optional[str]]] = None) -> Dict[str, np.ndarray]:
+    """
+    estimate_route 的批量版本：所有起点×所有终点的出行时间
+
+    每个点只求一次候选站点，站点间耗时直接索引全站点最短时间矩阵，
+    结果与逐对调用 estimate_route 一致
+
+    参数:
+        origins (list): 出发地坐标 (lng, lat) 列表
+        destinations (list): 目的地坐标 (lng, lat) 列表
+        origin_stations (list, 可选): 与 origins 一一对应的附近地铁站描述
+        destination_stations (list, 可选): 与 destinations 一一对应的附近地铁站描述
+
+    返回:
+        dict: {"transit_minutes": 分钟, "walk_only": 公共交通是否为步行, "taxi_minutes": 分钟}，
+              形状均为 (起点数, 终点数)
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    destinations = np.asarray(destinations, dtype=float).reshape(-1, 2)
+    straight_km = haversine_km(origins[:, None, 1], origins[:, None, 0], destinations[None, :, 1], destinations[None, :, 0])
+    road_km = straight_km * ROAD_DETOUR
+    walk_km = straight_km * WALK_DETOUR
+
+    walk_minutes = np.where(walk_km <= MAX_WALK_ONLY_KM, walk_km / WALK_SPEED_KMH * 60, np.inf)
+
+    network = get_subway_network()
+    a_idx, a_walk = _access_arrays(network, origins, origin_stations or [None] * len(origins))
+    e_idx, e_walk = _access_arrays(network, destinations, destination_stations or [None] * len(destinations))
+    # 维度：(起点, 起点候选站, 终点, 终点候选站)
+    total = ((a_walk[:, :, None, None] + e_walk[None, None, :, :]) / WALK_SPEED_KMH * 60
+             + network.time_min[a_idx[:, :, None, None], e_idx[None, None, :, :]])
+    subway_minutes = total.min(axis=(1, 3)) + SUBWAY_WAIT_MINUTES
+
+    # 与 estimate_route 相同：步行、地铁、公交依次比较，相同时取靠前的方式
+    transit_minutes = np.minimum(np.minimum(walk_minutes, subway_minutes), bus_minutes(road_km))
+    return {
+        "transit_minutes": np.round(transit_minutes, 1),
+        "walk_only": walk_minutes <= transit_minutes,
+        "taxi_minutes": np.round(taxi_minutes(road_km), 1),
+    }
+
+
+def estimate_route_info(origin: Tuple[float, float], destination: Tuple[float, float],
+                        origin_name: str, destination_name: str,
+                        origin_station: Optional[str] = None, destination_station: Optional[str] = None) -> Dict[str, Any]:
+    """估算结果转换为与 tools.routeinf.get_route_info 相同的结构"""
+    estimate = estimate_route(origin, destination, origin_station, destination_station)
+    return {
+        "出发地": origin_name,
+        "目的地": destination_name,
+        "公共交通最短时间": estimate["transit_minutes"],
+        "公共交通费用": f"{estimate['transit_cost']}元",
+        "出租车最短时间": estimate["taxi_minutes"],
+        "出租车费用": f"{estimate['taxi_cost']}元",
+        "估算": True
+    }
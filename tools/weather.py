@@ -1,8 +1,10 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
 
+from tools import singleflight
+from tools.http_client import request_get
 
 
-def get_weather_7d(location_code, api_host,api_key):
+def get_weather_7d(location_code, api_host, api_key, timeout=None):
     # 注意：免费用户使用开发环境API
     url = f"https://{api_host}/v7/weather/7d"
 
@@ -11,9 +13,68 @@ def get_weather_7d(location_code, api_host,api_key):
         'key': api_key  # 关键修改：API Key作为查询参数传递
     }
 
-    response = requests.get(
+    response = request_get(
+        "qweather",
         url,
         params=params,
-        headers={'Accept-Encoding': 'gzip, deflate'}  # 保持压缩支持
+        timeout=timeout
     )
     return response
+
+
+def get_weather_7d_multi(location_codes, api_host, api_key, timeout=None, max_workers=None):
+    """
+    并发获取多个地点的7天天气预报
+
+    功能:
+        每个LocationID一个请求，全部并发发出并共享同一个连接池，
+        总耗时取决于最慢的一次请求，而不是所有请求耗时之和。
+
+    参数:
+        location_codes (list[str]): 和风天气LocationID列表
+        api_host (str): 和风天气API Host
+        api_key (str): 和风天气API Key
+        timeout (tuple, 可选): 单个请求的(连接超时, 读取超时)，默认取config
+        max_workers (int, 可选): 最大并发数，默认与地点数相同
+
+    返回:
+        dict: {
+            "daily": {日期: {LocationID: 当日天气}},
+            "locations": 成功获取的LocationID列表,
+            "errors": {LocationID: 错误信息}
+        }
+    """
+    codes = list(dict.fromkeys(location_codes))  # 去重并保持顺序
+    merged = {"daily": {}, "locations": [], "errors": {}}
+    if not codes:
+        return merged
+
+    def _fetch(code):
+        try:
+            response = get_weather_7d(code, api_host, api_key, timeout=timeout)
+            if response.status_code != 200:
+                return code, None, f"HTTP {response.status_code}"
+            data = response.json()
+            if data.get("code") != "200":
+                return code, None, f"API code {data.get('code')}"
+            return code, data.get("daily", []), None
+        except Exception as e:
+            return code, None, str(e)
+
+    def _fetch_shared(code):
+        # 其他会话正在查询同一地点时直接共享其结果
+        return singleflight.do(f"weather:{api_host}:{code}", _fetch, code)
+
+    workers = max_workers or len(codes)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_fetch_shared, codes))
+
+    for code, daily, error in results:
+        if error is not None:
+            merged["errors"][code] = error
+            continue
+        merged["locations"].append(code)
+        for item in daily:
+            merged["daily"].setdefault(item["fxDate"], {})[code] = item
+
+    return merged